@@ -0,0 +1,82 @@
+"""Side by side comparison of the distribution engines - throughput, fairness and invariants.
+
+runs every engine registered in locates_harness on a synthetic market scale book (approved at 63%, so
+rounding_chunks runs on every symbol) for the throughput, and on a few hundred small random books for the
+invariants - the counts are summed over the books. exits with 1 when an engine breaks a promise it made
+(see locates_harness.failures), so a faster engine is only accepted on evidence.
+usage: python benchmarks/bench_engines.py --clients 20000 --symbols 2000 --books 300 [--engines legacy exact]
+"""
+from sys import path as sys_path
+from os import path as os_path
+sys_path.append(os_path.abspath(os_path.join(os_path.dirname(__file__), '..', 'src')))
+
+import argparse
+import json
+import random
+import sys
+
+from locates_harness import ENGINES, Book, failures, random_rows, run_engines
+from locates_task import KERNEL_COMPILED
+from synthetic import generate_requests
+
+COUNTS = ('over_requested', 'over_approved', 'lot_violations', 'drift_symbols', 'drift', 'unexpected_cells',
+          'differences')
+
+
+def random_books_report(books: int, seed: int, engines: list[str]) -> dict[str, dict]:
+    """returns the run_engines counts and fairness summed over random small books."""
+    rng = random.Random(seed)
+    totals: dict[str, dict] = {name: {} for name in engines}
+    for _ in range(books):
+        book = Book.from_rows(random_rows(rng, clients=rng.randint(1, 40), symbols=rng.randint(1, 15),
+                                          requests=rng.randint(1, 200)), rng=rng)
+        for name, result in run_engines(book, engines).items():
+            for key in COUNTS + ('fairness',):
+                if key in result:
+                    totals[name][key] = totals[name].get(key, 0) + result[key]
+    return totals
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=20_000)
+    parser.add_argument('--symbols', type=int, default=2_000)
+    parser.add_argument('--requests-per-client', type=int, default=4)
+    parser.add_argument('--skew', type=float, default=1.1, help="Zipf exponent of the symbol popularity")
+    parser.add_argument('--books', type=int, default=300, help="random small books for the invariants")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--engines', nargs='+', choices=list(ENGINES), default=list(ENGINES))
+    parser.add_argument('--output', help="path of the JSON results")
+    args = parser.parse_args()
+
+    rows = generate_requests(args.clients, args.symbols, args.requests_per_client, args.skew, args.seed)
+    book = Book.from_rows(rows, approved_locates={})
+    book.approved_locates = {symbol: int(total * 0.63) for symbol, total in book.aggregate_symbols.items()}
+    throughput = run_engines(book, args.engines, args.repeat)
+    invariants = random_books_report(args.books, args.seed, args.engines)
+
+    legacy_seconds = throughput['legacy']['seconds'] if 'legacy' in throughput else None
+    print(f"{book.rows} rows, {len(book.approved_locates)} symbols - invariants over {args.books} random books, "
+          f"{'compiled' if KERNEL_COMPILED else 'interpreted'} kernel")
+    print(f"{'engine':>10} {'seconds':>9} {'rows/s':>10} {'speedup':>8} {'fairness':>12} {'drift':>7} "
+          f"{'over appr':>9} {'lots':>5} {'over req':>8} {'diffs':>6}")
+    for name, result in throughput.items():
+        counts = invariants[name]
+        speedup = f"{legacy_seconds / result['seconds']:.2f}x" if legacy_seconds else '-'
+        print(f"{name:>10} {result['seconds']:>9.4f} {result['rows_per_second']:>10.0f} {speedup:>8} "
+              f"{result['fairness']:>12.1f} {counts.get('drift', 0):>7} {counts.get('over_approved', 0):>9} "
+              f"{counts.get('lot_violations', 0):>5} {counts.get('over_requested', 0):>8} "
+              f"{counts.get('differences', '-'):>6}")
+
+    broken = failures(throughput) + failures(invariants)
+    for message in broken:
+        print(f"broken invariant - {message}", file=sys.stderr)
+    if args.output:
+        with open(args.output, 'w') as json_file:
+            json.dump({'throughput': throughput, 'invariants': invariants}, json_file, indent=2)
+    return 1 if broken else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""Benchmark of the locates pipeline stages on synthetic market scale data.
+
+generates a request book (Zipf skewed symbol popularity), then times csv_parser, distribute_locates
+(fully approved - no rounding_chunks, and partially approved - rounding_chunks on every symbol) and
+create_results_csv separately, with the peak memory of each stage (tracemalloc, in a separate run so
+it does not slow the timings down). results are written as JSON; give --baseline a previous result
+to fail on stages that got slower.
+usage: python benchmarks/bench_pipeline.py --clients 100000 --symbols 8000 --output bench.json
+"""
+from sys import path as sys_path
+from os import path as os_path
+sys_path.append(os_path.abspath(os_path.join(os_path.dirname(__file__), '..', 'src')))
+
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable
+
+from locates_task import csv_parser, distribute_locates, create_results_csv
+from synthetic import generate_requests, write_requests_csv
+
+
+def measure(stage: Callable[[], object], repeat: int, memory: bool) -> dict[str, float]:
+    """Runs a stage a few times.
+    returns {'seconds': best time, 'peak_bytes': peak traced memory of one more run (if memory)}
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        stage()
+        best = min(best, time.perf_counter() - start)
+    result = {'seconds': best}
+    if memory:
+        tracemalloc.start()
+        stage()
+        result['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+
+def run(clients: int, symbols: int, requests_per_client: int, skew: float, seed: int, repeat: int,
+        memory: bool) -> dict:
+    """Runs every stage on a generated book.
+    returns the results - {'params': ..., 'environment': ..., 'stages': {stage: {'seconds', 'peak_bytes', ...}}}
+    """
+    rows = generate_requests(clients, symbols, requests_per_client, skew, seed)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        input_path = os_path.join(tmp_dir, 'requests.csv')
+        output_path = os_path.join(tmp_dir, 'results.csv')
+        write_requests_csv(rows, input_path)
+
+        stages = {}
+        parsed = csv_parser(input_path)
+        clients_requests, aggregate_symbols, req_by_symbol_clients_percentage, chunk_pr_symbol = parsed
+        stages['csv_parser'] = measure(lambda: csv_parser(input_path), repeat, memory)
+
+        # approving everything never rounds, approving 63% rounds every symbol with more then one client
+        full = dict(aggregate_symbols)
+        partial = {symbol: int(total * 0.63) for symbol, total in aggregate_symbols.items()}
+        for name, approved in (('distribute_no_rounding', full), ('distribute_rounding', partial)):
+            stages[name] = measure(lambda: distribute_locates(clients_requests, approved, req_by_symbol_clients_percentage,
+                                                              chunk_pr_symbol), repeat, memory)
+
+        distributed = distribute_locates(clients_requests, partial, req_by_symbol_clients_percentage, chunk_pr_symbol)
+        stages['create_results_csv'] = measure(lambda: create_results_csv(distributed, output_path), repeat, memory)
+
+    # every stage goes over all the (client, symbol) rows once
+    for result in stages.values():
+        result['rows_per_second'] = len(rows) / result['seconds']
+
+    return {
+        'params': {'clients': clients, 'symbols': symbols, 'requests_per_client': requests_per_client,
+                   'skew': skew, 'seed': seed, 'repeat': repeat, 'rows': len(rows)},
+        'environment': {'python': sys.version.split()[0], 'platform': platform.platform(),
+                        'time': datetime.now(timezone.utc).isoformat()},
+        'stages': stages,
+    }
+
+
+def regressions(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Compares the stage times with a baseline run.
+    returns a message for every stage slower then the baseline by more then tolerance (0.1 is 10%).
+    """
+    messages = []
+    for stage, result in results['stages'].items():
+        previous = baseline['stages'].get(stage)
+        if previous and result['seconds'] > previous['seconds'] * (1 + tolerance):
+            messages.append(f"{stage}: {previous['seconds']:.4f}s -> {result['seconds']:.4f}s")
+    return messages
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=20_000)
+    parser.add_argument('--symbols', type=int, default=2_000)
+    parser.add_argument('--requests-per-client', type=int, default=4)
+    parser.add_argument('--skew', type=float, default=1.1, help="Zipf exponent of the symbol popularity")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-memory', action='store_true', help="skip the peak memory runs")
+    parser.add_argument('--output', help="path of the JSON results (stdout if not given)")
+    parser.add_argument('--baseline', help="JSON results of a previous run to compare with")
+    parser.add_argument('--tolerance', type=float, default=0.1)
+    args = parser.parse_args()
+
+    results = run(args.clients, args.symbols, args.requests_per_client, args.skew, args.seed, args.repeat,
+                  not args.no_memory)
+    if args.output:
+        with open(args.output, 'w') as json_file:
+            json.dump(results, json_file, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+    if args.baseline:
+        with open(args.baseline) as json_file:
+            slower = regressions(results, json.load(json_file), args.tolerance)
+        for message in slower:
+            print(f"regression - {message}", file=sys.stderr)
+        return 1 if slower else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
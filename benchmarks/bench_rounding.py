@@ -0,0 +1,62 @@
+"""Benchmark of the two orderings of rounding_chunks - sort vs counting sort (bucketed).
+
+runs rounding_chunks on a single symbol with 100 to 1M clients for a few lot sizes,
+prints the time of each path and the first size from which the counting sort wins.
+usage: python benchmarks/bench_rounding.py [--repeat N] [--seed N]
+"""
+from sys import path as sys_path
+from os import path as os_path
+sys_path.append(os_path.abspath(os_path.join(os_path.dirname(__file__), '..', 'src')))
+
+import argparse
+import random
+import time
+
+from locates_task import rounding_chunks
+
+CLIENTS = [100, 300, 1_000, 3_000, 10_000, 20_000, 50_000, 100_000, 200_000, 500_000, 1_000_000]
+LOT_SIZES = [100, 1000]
+
+
+def symbol_amounts(rng: random.Random, clients: int, round_lot_size: int) -> dict[str, int]:
+    """Builds the proportional (not rounded) amounts of a single symbol approved at ~63%."""
+    requested = [round_lot_size * rng.randint(1, 30) for _ in range(clients)]
+    total_requested = sum(requested)
+    approved = int(total_requested * 0.63)
+    return {f"Client{i}": int(req / total_requested * approved + 0.5) for i, req in enumerate(requested)}
+
+
+def best_time(amounts: dict[str, int], round_lot_size: int, bucketed: bool, repeat: int) -> float:
+    """returns the best time of a few rounding_chunks runs."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rounding_chunks(amounts, round_lot_size, bucketed)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    print(f"{'lot':>6} {'clients':>10} {'sort (s)':>10} {'buckets (s)':>12} {'speedup':>8}")
+    for round_lot_size in LOT_SIZES:
+        crossover = None
+        for clients in CLIENTS:
+            amounts = symbol_amounts(rng, clients, round_lot_size)
+            # both paths must give the same allocation
+            assert rounding_chunks(amounts, round_lot_size, False) == rounding_chunks(amounts, round_lot_size, True)
+            sort_time = best_time(amounts, round_lot_size, False, args.repeat)
+            bucket_time = best_time(amounts, round_lot_size, True, args.repeat)
+            if crossover is None and bucket_time < sort_time:
+                crossover = clients
+            print(f"{round_lot_size:>6} {clients:>10} {sort_time:>10.4f} {bucket_time:>12.4f} {sort_time / bucket_time:>7.2f}x")
+        print(f"lot {round_lot_size}: counting sort wins from {crossover} clients\n")
+
+
+if __name__ == '__main__':
+    main()
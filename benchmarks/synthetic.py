@@ -0,0 +1,50 @@
+"""Synthetic locate request books for the benchmarks.
+
+symbol popularity follows a Zipf distribution - a few symbols (think AAPL) are requested by most
+clients while the long tail gets a handful of requests each.
+"""
+import random
+
+
+def zipf_weights(symbols: int, skew: float) -> list[float]:
+    """returns the cumulative Zipf weights 1 / rank^skew of the symbols."""
+    cumulative = []
+    total = 0.0
+    for rank in range(1, symbols + 1):
+        total += 1 / rank ** skew
+        cumulative.append(total)
+    return cumulative
+
+
+def generate_requests(clients: int, symbols: int, requests_per_client: int = 4, skew: float = 1.1,
+                      seed: int = 0) -> list[tuple[str, str, int, int]]:
+    """Generates a request book.
+    input:
+    - clients: number of clients.
+    - symbols: number of symbols.
+    - requests_per_client: average number of symbols a client asks for.
+    - skew: the Zipf exponent of the symbol popularity (0 is uniform).
+    - seed: random seed - the same arguments always give the same book.
+    returns a list of (client_name, symbol, number_of_locates_requested, round_lot_size) rows.
+    """
+    rng = random.Random(seed)
+    cumulative = zipf_weights(symbols, skew)
+    # most symbols trade in lots of 100, a few in 10 or 1
+    round_lots = [rng.choices((100, 10, 1), weights=(90, 7, 3))[0] for _ in range(symbols)]
+    rows = []
+    for client in range(clients):
+        wanted = min(symbols, max(1, int(rng.expovariate(1 / requests_per_client))))
+        picked = set(rng.choices(range(symbols), cum_weights=cumulative, k=wanted))
+        for symbol in picked:
+            round_lot_size = round_lots[symbol]
+            rows.append((f"Client{client}", f"SYM{symbol}", round_lot_size * rng.randint(1, 50), round_lot_size))
+    rng.shuffle(rows)
+    return rows
+
+
+def write_requests_csv(rows: list[tuple[str, str, int, int]], file_path: str) -> None:
+    """Writes a request book in the input format - the leading space style of the test data."""
+    with open(file_path, 'w', newline='') as csv_file:
+        csv_file.write("client_name, symbol, number_of_locates_requested, round_lot_size\n")
+        for client, symbol, requested, round_lot_size in rows:
+            csv_file.write(f"{client}, {symbol}, {requested}, {round_lot_size}\n")
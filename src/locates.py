@@ -0,0 +1,251 @@
+"""Command line of the locates distribution.
+
+reads the requests CSV, takes the approvals from a file (or the simulated broker) and writes the
+distributed locates:
+
+    python -m locates requests.csv results.csv --approvals approved.json
+    cat requests.csv | python -m locates - - --approvals approved.csv --stream | loader
+
+(run from src/, or with src/ on PYTHONPATH). '-' reads the requests from stdin / writes the results to
+stdout. --stream writes the rows of every symbol as soon as it is distributed (symbol by symbol instead
+of client by client), so a downstream loader can start before the whole book is done.
+--memory-budget spills the book to temporary files and distributes it a part at a time (see
+locates_external) - for books that don't fit in memory, the rows come out symbol by symbol as well. it
+needs a file path - the partitions are sized from the file size.
+--pushdown scans only the symbol totals for the approvals, then parses the rows of the approved symbols
+(see locates_scan).
+--journal checkpoints the parsed requests, the approvals and every distributed symbol to a journal file -
+running again with the same journal resumes where it stopped, without parsing (see locates_journal).
+approvals files are JSON ({symbol: num_of_locates_approved}) or CSV with a symbol and a
+number_of_locates_approved column.
+"""
+import argparse
+import csv
+import io
+import os
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Iterator, TextIO
+
+from locates_task import (OUTPUT_FORMATS, RESULTS_FIELDNAMES, csv_parser_streaming, distribute_locates,
+                          iter_distribute_locates, create_results_csv, request_locates)
+
+
+def load_approvals(file_path: str) -> dict[str, int]:
+    """Reads an approvals file - .json ({symbol: num_of_locates_approved}) or .csv
+    (symbol, number_of_locates_approved columns).
+    returns approved_locates - {symbol: num_of_locates_approved}, in the file order.
+    raises ValueError on a file that is not in one of these formats.
+    """
+    _, extension = os.path.splitext(file_path)
+    extension = extension.lower()
+    if extension == '.json':
+        import json
+        with open(file_path) as json_file:
+            approvals = json.load(json_file)
+        if not isinstance(approvals, dict):
+            raise ValueError(f"approvals JSON should be an object of symbol: number: {file_path}")
+        rows = approvals.items()
+    elif extension == '.csv':
+        with open(file_path, newline='') as csv_file:
+            reader = csv.DictReader(csv_file, skipinitialspace=True)
+            if reader.fieldnames is None or not {'symbol', 'number_of_locates_approved'} <= set(reader.fieldnames):
+                raise ValueError(f"approvals CSV needs symbol and number_of_locates_approved columns: {file_path}")
+            rows = [(row['symbol'], row['number_of_locates_approved']) for row in reader]
+    else:
+        raise ValueError(f"approvals should be a .json or .csv file: {file_path}")
+
+    approved_locates: dict[str, int] = {}
+    for symbol, approved in rows:
+        try:
+            approved = int(approved)
+        except (TypeError, ValueError):
+            raise ValueError(f"invalid number of approved locates for {symbol}: {approved}")
+        if approved < 0:
+            raise ValueError(f"invalid number of approved locates for {symbol}: {approved}")
+        approved_locates[symbol] = approved
+    return approved_locates
+
+
+@contextmanager
+def open_text(file_path: str, mode: str) -> Iterator[TextIO]:
+    """Opens a CSV file for reading ('r') or writing ('w') - '-' is stdin / stdout, which stay open after."""
+    if file_path != '-':
+        with open(file_path, mode, newline='') as text_file:
+            yield text_file
+        return
+    stream = sys.stdin if mode == 'r' else sys.stdout
+    # newline='' like the files - the csv module handles the line endings
+    text_file = io.TextIOWrapper(stream.buffer, newline='')
+    try:
+        yield text_file
+    finally:
+        if mode == 'w':
+            text_file.flush()
+        # let go of the buffer without closing stdin / stdout
+        text_file.detach()
+
+
+def write_symbol_rows(writer, symbol: str, distributed: dict[str, int]) -> None:
+    """Writes the rows of a single distributed symbol, in the create_results_csv row format."""
+    writer.writerows((client, f" {symbol}", f" {num_of_locates}") for client, num_of_locates in distributed.items())
+
+
+def get_approvals(args: argparse.Namespace, aggregate_symbols: dict[str, int], metrics=None) -> dict[str, int]:
+    """returns the approved locates of the command line (file or simulated broker), without the symbols
+    nobody requested - those are reported on stderr."""
+    start = time.perf_counter()
+    if args.simulate:
+        approved_locates = request_locates(aggregate_symbols)
+    else:
+        approved_locates = load_approvals(args.approvals)
+    if metrics is not None:
+        metrics.add_stage('approvals', time.perf_counter() - start, len(approved_locates))
+    # approvals of symbols nobody asked for have no one to go to
+    unknown = [symbol for symbol in approved_locates if symbol not in aggregate_symbols]
+    if unknown:
+        print(f"locates: skipping {len(unknown)} approved symbols without requests: {', '.join(unknown[:10])}",
+              file=sys.stderr)
+        approved_locates = {symbol: total for symbol, total in approved_locates.items() if symbol in aggregate_symbols}
+    return approved_locates
+
+
+def run_external(args: argparse.Namespace, metrics=None) -> None:
+    """Runs the distribution out of core - --memory-budget (locates_external)."""
+    from locates_external import PartitionedBook, distribute_external
+    # a path - the partitions are sized from the file size
+    book = PartitionedBook.from_csv(args.input, args.memory_budget << 20, spill_dir=args.spill_dir, metrics=metrics)
+    with book:
+        approved_locates = get_approvals(args, book.aggregate_symbols, metrics)
+        with open_text(args.output, 'w') as csv_file:
+            distribute_external(book, approved_locates, csv_file, metrics)
+
+
+def run_journal(args: argparse.Namespace, metrics=None) -> None:
+    """Runs the distribution with a checkpoint journal - --journal (locates_journal), resumes the journal's run."""
+    from locates_journal import run_checkpointed
+
+    def approvals(aggregate_symbols: dict[str, int]) -> dict[str, int]:
+        # a resumed run keeps the approvals of the journal
+        return get_approvals(args, aggregate_symbols, metrics)
+
+    # the requests are not read if the journal has them
+    with (open_text(args.input, 'r') if args.input == '-' else nullcontext(args.input)) as requests_file:
+        distributed = run_checkpointed(requests_file, args.journal, approvals, args.workers, metrics)
+    if args.format == 'csv':
+        with open_text(args.output, 'w') as csv_file:
+            create_results_csv(distributed, csv_file, metrics=metrics)
+    else:
+        create_results_csv(distributed, args.output, args.format, metrics)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='locates', description=__doc__.splitlines()[0])
+    parser.add_argument('input', help="requests CSV file, '-' for stdin")
+    parser.add_argument('output', nargs='?', default='-',
+                        help="results CSV file ('-' for stdout, the default), a directory for --format npy")
+    approvals = parser.add_mutually_exclusive_group(required=True)
+    approvals.add_argument('--approvals', help="approved locates - a .json or .csv file")
+    approvals.add_argument('--simulate', action='store_true', help="approve with the simulated broker (request_locates)")
+    parser.add_argument('--workers', type=int, default=1, help="distribution processes (default 1)")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='csv', help="output format (default csv)")
+    parser.add_argument('--stream', action='store_true', help="write every symbol as soon as it is distributed")
+    parser.add_argument('--memory-budget', type=int, metavar='MB',
+                        help="keep about this many MB of requests in memory, spill the rest to temporary files")
+    parser.add_argument('--spill-dir', help="directory for the --memory-budget temporary files")
+    parser.add_argument('--journal', help="checkpoint journal - resumes the run it has, creates it if missing")
+    parser.add_argument('--pushdown', action='store_true',
+                        help="scan the symbol totals first and parse only the approved symbols' rows")
+    parser.add_argument('--metrics', help="write the pipeline metrics as JSON to this file ('-' for stderr)")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error("--workers should be at least 1")
+    if args.format == 'npy' and (args.output == '-' or args.stream):
+        parser.error("--format npy writes a directory of files - give an output directory and no --stream")
+    if args.memory_budget is not None:
+        if args.memory_budget < 1:
+            parser.error("--memory-budget should be at least 1 MB")
+        if args.format != 'csv' or args.workers != 1:
+            parser.error("--memory-budget writes CSV with a single worker")
+        if args.input == '-':
+            # a stream gets a fixed number of partitions, the budget wouldn't hold
+            parser.error("--memory-budget sizes the partitions from the requests file - give a file path")
+    if args.pushdown and (args.input == '-' or args.memory_budget is not None):
+        parser.error("--pushdown reads the requests file twice - give a file path and no --memory-budget")
+    if args.journal and (args.stream or args.pushdown or args.memory_budget is not None):
+        parser.error("--journal doesn't go with --stream, --pushdown or --memory-budget")
+
+    metrics = None
+    if args.metrics:
+        from locates_metrics import Metrics, JsonSink
+        metrics = Metrics(sinks=[JsonSink(sys.stderr if args.metrics == '-' else args.metrics)])
+
+    try:
+        if args.memory_budget is not None:
+            run_external(args, metrics)
+            if metrics is not None:
+                metrics.flush()
+            return 0
+        if args.journal:
+            run_journal(args, metrics)
+            if metrics is not None:
+                metrics.flush()
+            return 0
+        if args.pushdown:
+            # only the approved symbols are parsed (locates_scan)
+            from locates_scan import scan_requests
+            index = scan_requests(args.input, metrics=metrics)
+            approved_locates = get_approvals(args, index.aggregate_symbols, metrics)
+            clients_requests, aggregate_symbols, req_by_symbol_clients_percentage, chunk_pr_symbol = \
+                index.materialize(approved_locates, metrics)
+        else:
+            with open_text(args.input, 'r') as requests_file:
+                clients_requests, aggregate_symbols, req_by_symbol_clients_percentage, chunk_pr_symbol = \
+                    csv_parser_streaming(requests_file, metrics=metrics)
+            approved_locates = get_approvals(args, aggregate_symbols, metrics)
+
+        if args.stream:
+            start = time.perf_counter()
+            rows = 0
+            with open_text(args.output, 'w') as csv_file:
+                writer = csv.writer(csv_file)
+                writer.writerow(RESULTS_FIELDNAMES)
+                for symbol, distributed in iter_distribute_locates(clients_requests, approved_locates,
+                                                                   req_by_symbol_clients_percentage, chunk_pr_symbol,
+                                                                   args.workers, metrics):
+                    write_symbol_rows(writer, symbol, distributed)
+                    # the reader gets the symbol now, not when a buffer fills up
+                    csv_file.flush()
+                    rows += len(distributed)
+            # distribution and writing are interleaved - a single stage
+            if metrics is not None:
+                metrics.add_stage('distribute_and_write', time.perf_counter() - start, rows)
+        else:
+            distributed = distribute_locates(clients_requests, approved_locates, req_by_symbol_clients_percentage,
+                                             chunk_pr_symbol, args.workers, metrics)
+            if args.format == 'csv':
+                with open_text(args.output, 'w') as csv_file:
+                    create_results_csv(distributed, csv_file, metrics=metrics)
+            else:
+                create_results_csv(distributed, args.output, args.format, metrics)
+    except Exception as e:
+        if isinstance(e, BrokenPipeError) or isinstance(e.__cause__, BrokenPipeError):
+            # the reader went away (e.g. | head) - don't complain about stdout on exit
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            return 1
+        print(f"locates: {e}", file=sys.stderr)
+        return 1
+
+    if metrics is not None:
+        metrics.flush()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""Incremental distribution of locates for approvals that arrive symbol by symbol.
+
+The allocator keeps the current distribution and, on every approval, recomputes only the
+approved symbol. Changed (client, symbol) cells are collected so downstream systems
+only get the deltas. Single client requests can be added or cancelled on the way, which
+recomputes their symbol only as well.
+"""
+from locates_task import distribute_symbol, validate_req
+
+
+class LocatesAllocator:
+    """Keeps the distributed locates of a request book while the approvals arrive.
+    built from the csv_parser output, approve symbols with update(symbol, approved).
+    add_request and cancel_request change the dictionaries it was built with.
+    """
+
+    def __init__(self, clients_requests: dict[str, dict[str, int]],
+                 req_by_symbol_clients_percentage: dict[str, dict[str, float]], chunk_pr_symbol: dict[str, int],
+                 aggregate_symbols: dict[str, int] | None = None) -> None:
+        """input:
+        - clients_requests: {client_name: {symbol: num_of_locates_requested}}
+        - req_by_symbol_clients_percentage: {symbol: {client_name: percentage_of_requests}}
+        - chunk_pr_symbol: {symbol: round_lot_size}
+        - aggregate_symbols: {symbol: total_num_of_locates_requested}, only needed to add or cancel requests -
+          if not given it is the sum of the clients requests.
+        """
+        self.clients_requests = clients_requests
+        self.req_by_symbol_clients_percentage = req_by_symbol_clients_percentage
+        self.chunk_pr_symbol = chunk_pr_symbol
+        if aggregate_symbols is None:
+            aggregate_symbols = {symbol: sum(clients_requests[client][symbol] for client in clients_percentage)
+                                 for symbol, clients_percentage in req_by_symbol_clients_percentage.items()}
+        self.aggregate_symbols = aggregate_symbols
+        self.approved_locates: dict[str, int] = {}
+        # client : {symbol : num}
+        self._distributed_locates: dict[str, dict[str, int]] = {client: {} for client in clients_requests.keys()}
+        # changed cells since the last changes() call - (client, symbol) : (published value, current value)
+        self._pending: dict[tuple[str, str], tuple[int | None, int]] = {}
+
+    @property
+    def allocations(self) -> dict[str, dict[str, int]]:
+        """The current distribution - {client_name: {symbol: num_of_locates_distributed}}, same as
+        distribute_locates over the approvals so far. it is the allocator's own dictionary, don't change it.
+        """
+        return self._distributed_locates
+
+    def update(self, symbol: str, approved: int) -> dict[tuple[str, str], int]:
+        """Approves (or re-approves) a symbol and recomputes its distribution only.
+        input: the symbol and its num_of_locates_approved.
+        returns the cells this update changed: {(client_name, symbol): num_of_locates_distributed}
+        """
+        clients_percentage = self.req_by_symbol_clients_percentage[symbol]
+        clients_requested = {client: self.clients_requests[client][symbol] for client in clients_percentage}
+        distributed = distribute_symbol(clients_percentage, clients_requested, approved, self.chunk_pr_symbol.get(symbol))
+        self.approved_locates[symbol] = approved
+
+        changed: dict[tuple[str, str], int] = {}
+        for client, value in distributed.items():
+            self._set_cell(client, symbol, value, changed)
+        return changed
+
+    def add_request(self, client: str, symbol: str, num_of_locates_req: int,
+                    round_lot_size: int | None = None) -> dict[tuple[str, str], int]:
+        """Adds a client request - a request the client already has for the symbol is replaced.
+        the symbol's percentages are recomputed and, if it is approved, its distribution.
+        input: the request fields, round_lot_size is only needed for a new symbol (the first one stays).
+        returns the cells this changed: {(client_name, symbol): num_of_locates_distributed}
+        raises ValueError on a request csv_parser would reject (the message is the validate_req reason).
+        """
+        round_lot_size = self.chunk_pr_symbol.get(symbol, round_lot_size)
+        result, reason = validate_req({'client_name': client, 'symbol': symbol,
+                                       'number_of_locates_requested': num_of_locates_req, 'round_lot_size': round_lot_size})
+        if result is None:
+            raise ValueError(reason)
+        # the validated fields - num_of_locates_req might have come in as a string
+        client, symbol, num_of_locates_req, round_lot_size = result
+
+        client_requests = self.clients_requests.setdefault(client, {})
+        self._distributed_locates.setdefault(client, {})
+        previous = client_requests.get(symbol, 0)
+        client_requests[symbol] = num_of_locates_req
+        self.chunk_pr_symbol.setdefault(symbol, round_lot_size)
+        self.aggregate_symbols[symbol] = self.aggregate_symbols.get(symbol, 0) - previous + num_of_locates_req
+        clients_percentage = self.req_by_symbol_clients_percentage.setdefault(symbol, {})
+        clients_percentage[client] = 0.0
+        return self._requests_changed(symbol)
+
+    def cancel_request(self, client: str, symbol: str) -> dict[tuple[str, str], int]:
+        """Cancels a client request - the symbol's percentages and distribution are recomputed.
+        returns the cells this changed: {(client_name, symbol): num_of_locates_distributed}, the cancelled cell is 0.
+        raises KeyError if the client has no request for the symbol.
+        """
+        num_of_locates_req = self.clients_requests.get(client, {}).pop(symbol)
+        del self.req_by_symbol_clients_percentage[symbol][client]
+        self.aggregate_symbols[symbol] -= num_of_locates_req
+
+        changed: dict[tuple[str, str], int] = {}
+        if symbol in self._distributed_locates[client]:
+            self._set_cell(client, symbol, None, changed)
+        # nobody asks for the symbol anymore
+        if not self.req_by_symbol_clients_percentage[symbol]:
+            del self.req_by_symbol_clients_percentage[symbol]
+            del self.aggregate_symbols[symbol]
+            del self.chunk_pr_symbol[symbol]
+            self.approved_locates.pop(symbol, None)
+            return changed
+        changed.update(self._requests_changed(symbol))
+        return changed
+
+    def _requests_changed(self, symbol: str) -> dict[tuple[str, str], int]:
+        """Recomputes the percentages of a symbol after its requests changed, and its distribution if approved."""
+        total_requested = self.aggregate_symbols[symbol]
+        clients_percentage = self.req_by_symbol_clients_percentage[symbol]
+        for client in clients_percentage:
+            clients_percentage[client] = self.clients_requests[client][symbol] / total_requested
+        if symbol not in self.approved_locates:
+            return {}
+        return self.update(symbol, self.approved_locates[symbol])
+
+    def _set_cell(self, client: str, symbol: str, value: int | None, changed: dict[tuple[str, str], int]) -> None:
+        """Sets a distributed cell (None removes it - reported as 0) and tracks the change."""
+        client_locates = self._distributed_locates[client]
+        previous = client_locates.get(symbol)
+        if previous == value and (value is None or symbol in client_locates):
+            return
+        if value is None:
+            del client_locates[symbol]
+            value = 0
+        else:
+            client_locates[symbol] = value
+        changed[(client, symbol)] = value
+
+        # keep the value downstream knows about - drop cells that went back to it
+        published, _ = self._pending.get((client, symbol), (previous, value))
+        if published == value:
+            del self._pending[(client, symbol)]
+        else:
+            self._pending[(client, symbol)] = (published, value)
+
+    def changes(self) -> dict[tuple[str, str], int]:
+        """Returns the cells changed since the last call (or since the allocator was built) and clears them.
+        returns {(client_name, symbol): num_of_locates_distributed}
+        """
+        changes = {cell: value for cell, (_, value) in self._pending.items()}
+        self._pending.clear()
+        return changes
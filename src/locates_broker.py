@@ -0,0 +1,126 @@
+"""Approval requests to the broker - batched, concurrent and retried.
+
+The broker takes a limited number of symbols per request and answers after some latency.
+request_approvals splits the aggregate requests into batches, keeps a bounded number of them in flight,
+retries failed batches and hands every approval to a callback as soon as it lands, so distribution
+(e.g. LocatesAllocator.update) can start per symbol without waiting for the whole round.
+
+SimulatedBroker is a local stand in for the broker API, with configurable latency, approval rates
+and failures - request_locates uses it with no latency.
+"""
+import random
+from typing import Callable
+
+
+class BrokerError(Exception):
+    """A request the broker failed (or refused) to answer."""
+
+
+class SimulatedBroker:
+    """Local stand in for the broker's locate approval API.
+    every symbol is approved with approve_probability, for a random portion (between min_portion and 1)
+    of min(requested, approve_cap). requests with more then max_symbols symbols are refused and
+    failure_rate of the requests fail, after the latency in both cases.
+    """
+
+    def __init__(self, latency: float = 0.05, approve_probability: float = 0.7, approve_cap: int = 1000,
+                 min_portion: float = 0.5, max_symbols: int = 300, failure_rate: float = 0.0,
+                 seed: int | None = None) -> None:
+        self.latency = latency
+        self.approve_probability = approve_probability
+        self.approve_cap = approve_cap
+        self.min_portion = min_portion
+        self.max_symbols = max_symbols
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        # stats for tests
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def approve(self, requested_locates: dict[str, int]) -> dict[str, int]:
+        """Approves locates right away - no latency, limits or failures.
+        input: requested_locates - {symbol: num_of_locates_requested}
+        returns: approved_locates - {symbol: num_of_locates_approved}, not approved symbols are left out.
+        """
+        approved_locates = {}
+        for symbol, requested in requested_locates.items():
+            # Simulate partial approval: randomly skip some symbols
+            if self.random.random() < self.approve_probability:
+                # approve a random portion up to min(requested, approve_cap)
+                max_approve = min(requested, self.approve_cap)
+                approved_locates[symbol] = int(max_approve * self.random.uniform(self.min_portion, 1.0))
+        return approved_locates
+
+    async def request(self, requested_locates: dict[str, int]) -> dict[str, int]:
+        """A single API call - approves a batch of symbols after the latency.
+        input: requested_locates - {symbol: num_of_locates_requested}
+        returns: approved_locates - {symbol: num_of_locates_approved}
+        raises BrokerError if the batch is too big or the call failed.
+        """
+        # asyncio is slow to import - request_locates only needs approve
+        import asyncio
+        self.requests += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            if len(requested_locates) > self.max_symbols:
+                raise BrokerError(f"too many symbols in a request: {len(requested_locates)} > {self.max_symbols}")
+            if self.random.random() < self.failure_rate:
+                raise BrokerError("request failed")
+            return self.approve(requested_locates)
+        finally:
+            self.in_flight -= 1
+
+
+async def request_approvals(aggregate_symbols: dict[str, int], broker: SimulatedBroker, batch_size: int = 300,
+                            max_in_flight: int = 8, retries: int = 3, retry_delay: float = 0.05,
+                            on_approved: Callable[[str, int], None] | None = None) -> dict[str, int]:
+    """Requests approvals for all the symbols, in concurrent batches.
+    input:
+    - aggregate_symbols: {symbol: total_num_of_locates_requested}
+    - broker: the broker to ask - anything with an async request(batch) like SimulatedBroker.
+    - batch_size: max symbols per request.
+    - max_in_flight: max requests waiting for the broker at the same time.
+    - retries: how many times a failed batch is sent again, retry_delay (seconds) doubles every time.
+    - on_approved: called with (symbol, num_of_locates_approved) as soon as a symbol is approved.
+    returns: approved_locates - {symbol: num_of_locates_approved}
+    raises BrokerError naming the symbols of the batches that failed after all the retries
+    (after every other batch is done - their approvals were already handed to on_approved).
+    any other exception of a batch (e.g. from on_approved) is raised as is, once every batch is done.
+    """
+    import asyncio
+    symbols = list(aggregate_symbols)
+    batches = [{symbol: aggregate_symbols[symbol] for symbol in symbols[i:i + batch_size]}
+               for i in range(0, len(symbols), batch_size)]
+    approved_locates: dict[str, int] = {}
+    in_flight = asyncio.Semaphore(max_in_flight)
+
+    async def send(batch: dict[str, int]) -> None:
+        """Sends a single batch, retrying failures."""
+        delay = retry_delay
+        for attempt in range(retries + 1):
+            try:
+                async with in_flight:
+                    approved = await broker.request(batch)
+                break
+            except BrokerError:
+                if attempt == retries:
+                    raise
+                await asyncio.sleep(delay)
+                delay *= 2
+        for symbol, total in approved.items():
+            approved_locates[symbol] = total
+            if on_approved is not None:
+                on_approved(symbol, total)
+
+    results = await asyncio.gather(*(send(batch) for batch in batches), return_exceptions=True)
+    # only a broker failure is a failed batch - anything else (an on_approved bug, a cancel) is raised as is
+    for result in results:
+        if isinstance(result, BaseException) and not isinstance(result, BrokerError):
+            raise result
+    failed = [symbol for batch, result in zip(batches, results) if isinstance(result, BrokerError) for symbol in batch]
+    if failed:
+        raise BrokerError(f"no approvals for {len(failed)} symbols: {', '.join(failed[:10])}")
+    return approved_locates
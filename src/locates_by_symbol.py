@@ -0,0 +1,157 @@
+"""Symbol major parsing and distribution.
+
+distribute_locates runs symbol by symbol but reads and writes client major dictionaries - every cell
+costs clients_requests[client][symbol] and distributed_locates[client][symbol], two levels of hash
+lookups each. here everything stays symbol major:
+- csv_parser_by_symbol builds {symbol: {client_name: num_of_locates_requested}} (and the clients in order)
+  straight from the file - no clients_requests and no percentages dictionaries.
+- distribute_locates_by_symbol returns {symbol: {client_name: num_of_locates_distributed}}. proportions are
+  computed on the fly, the same float operations as to_percentages, so the results are the same.
+- ClientLocates is the client major {client_name: {symbol: num_of_locates_distributed}} of that, transposed
+  on first use - consumers of the per symbol results never pay for it.
+"""
+import time
+from collections.abc import ItemsView, Iterator, Mapping, ValuesView
+
+from locates_kernel import distribute_proportional
+from locates_task import STREAM_CHUNK_SIZE, stream_requests
+
+
+def csv_parser_by_symbol(file_path: str, chunk_size: int = STREAM_CHUNK_SIZE, metrics=None,
+                         rejected: list | None = None) -> tuple[dict[str, dict[str, int]], dict[str, int], dict[str, int], dict[str, None]]:
+    """Parses the CSV file into symbol major data structures - validation, duplicates and exceptions
+    are the same as csv_parser.
+    input: same as csv_parser_streaming (without percentages).
+    returns: a tuple of
+    - a dictionary of requests by symbol: {symbol: {client_name: num_of_locates_requested}}
+    - a dictionary of aggregate symbols requests: {symbol: total_num_of_locates_requested}
+    - a dictionary of chunk sizes by symbol: {symbol: round_size}
+    - the clients in the order they first appear: {client_name: None}
+    """
+    start = time.perf_counter()
+    requests_by_symbol: dict[str, dict[str, int]] = {}
+    aggregate_symbols: dict[str, int] = {}
+    chunk_pr_symbol: dict[str, int] = {}
+    clients: dict[str, None] = {}
+
+    def add_request(client: str, symbol: str, num_of_locates_req: int, round_size: int) -> None:
+        """Adds a single valid request."""
+        symbol_clients = requests_by_symbol.get(symbol)
+        if symbol_clients is None:
+            symbol_clients = requests_by_symbol[symbol] = {}
+            # track chunk sizes - only the first one matters
+            chunk_pr_symbol[symbol] = round_size
+            aggregate_symbols[symbol] = 0
+        symbol_clients[client] = num_of_locates_req
+        aggregate_symbols[symbol] += num_of_locates_req
+        if client not in clients:
+            clients[client] = None
+
+    rows = stream_requests(file_path, add_request, chunk_size, metrics, rejected)
+    if metrics is not None:
+        metrics.add_stage('parse', time.perf_counter() - start, rows)
+    return requests_by_symbol, aggregate_symbols, chunk_pr_symbol, clients
+
+
+def distribute_symbol_requests(clients_requested: dict[str, int], total: int, total_requested: int,
+                               round_lot_size: int | None, metrics=None) -> dict[str, int]:
+    """Same as locates_task.distribute_symbol, with the proportions computed from the requests on the fly.
+    input:
+    - clients_requested: {client_name: num_of_locates_requested} of the symbol
+    - total: num_of_locates_approved for the symbol
+    - total_requested: the symbol's aggregate request
+    - round_lot_size: the symbol's round lot size (only used if rounding is needed)
+    - metrics: optional locates_metrics.Metrics, gets the rounding_chunks counts.
+    returns a dictionary of distributed locates: {client_name: num_of_locates_distributed}
+    """
+    requested = list(clients_requested.values())
+    # the same percentages as to_percentages
+    distributed, iterations = distribute_proportional([num / total_requested for num in requested], requested,
+                                                      total, round_lot_size)
+    if metrics is not None and iterations >= 0:
+        metrics.add_rounding(iterations)
+    return dict(zip(clients_requested, distributed))
+
+
+def distribute_locates_by_symbol(requests_by_symbol: dict[str, dict[str, int]], approved_locates: dict[str, int],
+                                 aggregate_symbols: dict[str, int], chunk_pr_symbol: dict[str, int],
+                                 metrics=None) -> dict[str, dict[str, int]]:
+    """Distributes the approved locates among clients requests proportionally, symbol major.
+    input:
+    - requests_by_symbol: {symbol: {client_name: num_of_locates_requested}}
+    - approved_locates: {symbol: num_of_locates_approved}
+    - aggregate_symbols: {symbol: total_num_of_locates_requested}
+    - chunk_pr_symbol: {symbol: round_lot_size}
+    - metrics: same as distribute_locates.
+    returns a dictionary of distributed locates by symbol: {symbol: {client_name: num_of_locates_distributed}},
+    in the approved order - ClientLocates gives the distribute_locates form.
+    """
+    start = time.perf_counter()
+    distributed_by_symbol: dict[str, dict[str, int]] = {}
+    rows = 0
+    for symbol, total in approved_locates.items():
+        symbol_start = time.perf_counter()
+        distributed = distribute_symbol_requests(requests_by_symbol[symbol], total, aggregate_symbols[symbol],
+                                                 chunk_pr_symbol.get(symbol), metrics)
+        distributed_by_symbol[symbol] = distributed
+        rows += len(distributed)
+        if metrics is not None:
+            metrics.add_symbol(symbol, time.perf_counter() - symbol_start, len(distributed))
+
+    if metrics is not None:
+        metrics.add_stage('distribute', time.perf_counter() - start, rows)
+    return distributed_by_symbol
+
+
+def transpose_locates(distributed_by_symbol: dict[str, dict[str, int]],
+                      clients: Mapping[str, object]) -> dict[str, dict[str, int]]:
+    """returns the client major form of symbol major results - {client_name: {symbol: num_of_locates_distributed}}
+    with every client (even without locates) and every client's symbols in the symbols order,
+    exactly like distribute_locates returns them.
+    """
+    distributed_locates: dict[str, dict[str, int]] = {client: {} for client in clients}
+    for symbol, distributed in distributed_by_symbol.items():
+        for client, value in distributed.items():
+            distributed_locates[client][symbol] = value
+    return distributed_locates
+
+
+class ClientLocates(Mapping):
+    """Read only client major view of symbol major results - {client_name: {symbol: num_of_locates_distributed}}.
+    the transpose (transpose_locates) runs on first use only, so it can be handed to create_results_csv
+    (or anything expecting distribute_locates results) without paying for it up front.
+    """
+
+    def __init__(self, distributed_by_symbol: dict[str, dict[str, int]], clients: Mapping[str, object]) -> None:
+        self.distributed_by_symbol = distributed_by_symbol
+        self.clients = clients
+        self._transposed: dict[str, dict[str, int]] | None = None
+
+    @property
+    def transposed(self) -> bool:
+        """True once the transpose ran."""
+        return self._transposed is not None
+
+    def to_dict(self) -> dict[str, dict[str, int]]:
+        """returns the client major dictionary, transposing on the first call."""
+        if self._transposed is None:
+            self._transposed = transpose_locates(self.distributed_by_symbol, self.clients)
+        return self._transposed
+
+    def __getitem__(self, client: str) -> dict[str, int]:
+        return self.to_dict()[client]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.clients)
+
+    def __len__(self) -> int:
+        return len(self.clients)
+
+    def items(self) -> ItemsView:
+        return self.to_dict().items()
+
+    def values(self) -> ValuesView:
+        return self.to_dict().values()
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
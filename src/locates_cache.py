@@ -0,0 +1,129 @@
+"""On disk cache of parsed request files.
+
+Re-running distribution on the same request file with other approvals shouldn't pay for csv parsing
+every time. Entries are keyed by the file path, size, mtime and a hash of its content, and stored with
+pickle (the highest protocol) - a hit loads the parsed structures without touching the CSV parser.
+The cache is bounded by size with LRU eviction (a hit refreshes the entry's mtime) and can be
+invalidated per file or as a whole.
+"""
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+from typing import Callable
+
+from locates_task import csv_parser_streaming
+
+# bump when the cached structures change
+CACHE_VERSION = 1
+ENTRY_SUFFIX = '.pickle'
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def file_digest(file_path: str) -> str:
+    """returns a hash of the file content."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ParseCache:
+    """Size bounded cache of csv_parser results, in a directory.
+    an entry is named <path hash>-<p or r>-<content key>.pickle (p for percentages, r for requested amounts),
+    so all the entries of a file are easy to find.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 1 << 30) -> None:
+        """input:
+        - cache_dir: directory of the cache entries, created if needed.
+        - max_bytes: max total size of the entries - least recently used ones are evicted.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path_prefix(self, file_path: str) -> str:
+        """returns the entry name prefix of a request file."""
+        return hashlib.blake2b(os.path.realpath(file_path).encode(), digest_size=8).hexdigest()
+
+    def entry_path(self, file_path: str, percentages: bool = True) -> str:
+        """returns the path of the entry of the current content of a request file."""
+        stat = os.stat(file_path)
+        key = hashlib.blake2b(digest_size=16)
+        for part in (CACHE_VERSION, sys.version_info[:2], percentages, stat.st_size, stat.st_mtime_ns,
+                     file_digest(file_path)):
+            key.update(repr(part).encode())
+        kind = 'p' if percentages else 'r'
+        return os.path.join(self.cache_dir, f"{self._path_prefix(file_path)}-{kind}-{key.hexdigest()}{ENTRY_SUFFIX}")
+
+    def parse(self, file_path: str, percentages: bool = True,
+              parser: Callable[..., tuple] = csv_parser_streaming) -> tuple:
+        """Parses a request file, or loads it from the cache.
+        input:
+        - file_path: path to the CSV file.
+        - percentages: same as csv_parser.
+        - parser: the parser to run on a miss (csv_parser_streaming by default).
+        returns: the same tuple as csv_parser.
+        """
+        try:
+            entry = self.entry_path(file_path, percentages)
+        except FileNotFoundError:
+            # let the parser raise its usual error
+            return parser(file_path, percentages=percentages)
+
+        try:
+            with open(entry, 'rb') as f:
+                parsed = pickle.load(f)
+            # recently used
+            os.utime(entry)
+            return parsed
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            pass
+
+        parsed = parser(file_path, percentages=percentages)
+        self.store(entry, parsed)
+        return parsed
+
+    def store(self, entry: str, parsed: tuple) -> None:
+        """Writes an entry (replacing older entries of the same file and kind) and evicts entries over max_bytes."""
+        prefix = os.path.basename(entry).rsplit('-', 1)[0] + '-'
+        for name in os.listdir(self.cache_dir):
+            if name.startswith(prefix) and name.endswith(ENTRY_SUFFIX):
+                os.remove(os.path.join(self.cache_dir, name))
+
+        # write then rename, a reader never sees half an entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(parsed, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, entry)
+        self.evict()
+
+    def entries(self) -> list[tuple[str, int, float]]:
+        """returns the cache entries as (path, size, last used time), least recently used first."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(ENTRY_SUFFIX):
+                path = os.path.join(self.cache_dir, name)
+                stat = os.stat(path)
+                entries.append((path, stat.st_size, stat.st_mtime))
+        return sorted(entries, key=lambda entry: entry[2])
+
+    def evict(self) -> None:
+        """Removes least recently used entries until the cache fits in max_bytes."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    def invalidate(self, file_path: str | None = None) -> None:
+        """Removes the entries of a request file, or every entry if no file is given."""
+        prefix = None if file_path is None else self._path_prefix(file_path) + '-'
+        for path, _, _ in self.entries():
+            if prefix is None or os.path.basename(path).startswith(prefix):
+                os.remove(path)
@@ -0,0 +1,157 @@
+"""Columnar (NumPy) engine for distributing locates.
+
+The requests are kept as flat arrays grouped by symbol - symbol id, client id, requested amount,
+percentage and the symbol's lot size - so the proportional split, the half up rounding, the clamp
+to the requested amount and the lot size remainders are computed for all the symbols at once.
+Only symbols that really need rounding_chunks go through a (vectorized) per symbol loop.
+The results are identical to locates_task.distribute_locates.
+
+NumPy is an optional dependency - it is only needed for this module.
+"""
+import numpy as np
+
+
+class ColumnarRequests:
+    """Requests stored as columnar arrays, built once and reused for every approval round.
+    rows are grouped by symbol (in the order of req_by_symbol_clients_percentage) and kept
+    in the clients order of each symbol, rows of symbol i are in the range offsets[i]:offsets[i + 1].
+    """
+
+    def __init__(self, clients_requests: dict[str, dict[str, int]],
+                 req_by_symbol_clients_percentage: dict[str, dict[str, float]], chunk_pr_symbol: dict[str, int]) -> None:
+        """input:
+        - clients_requests: {client_name: {symbol: num_of_locates_requested}}
+        - req_by_symbol_clients_percentage: {symbol: {client_name: percentage_of_requests}}
+        - chunk_pr_symbol: {symbol: round_lot_size}
+        """
+        self.clients: list[str] = list(clients_requests)
+        self.symbols: list[str] = list(req_by_symbol_clients_percentage)
+        self.symbol_ids: dict[str, int] = {symbol: i for i, symbol in enumerate(self.symbols)}
+        client_ids = {client: i for i, client in enumerate(self.clients)}
+
+        rows = sum(len(clients) for clients in req_by_symbol_clients_percentage.values())
+        self.client_id = np.empty(rows, dtype=np.int64)
+        self.requested = np.empty(rows, dtype=np.int64)
+        self.percentage = np.empty(rows, dtype=np.float64)
+        self.offsets = np.zeros(len(self.symbols) + 1, dtype=np.int64)
+        # 0 marks a symbol without a known lot size
+        self.lot = np.array([chunk_pr_symbol.get(symbol, 0) for symbol in self.symbols], dtype=np.int64)
+
+        row = 0
+        for i, (symbol, clients_percentage) in enumerate(req_by_symbol_clients_percentage.items()):
+            for client, percentage in clients_percentage.items():
+                self.client_id[row] = client_ids[client]
+                self.requested[row] = clients_requests[client][symbol]
+                self.percentage[row] = percentage
+                row += 1
+            self.offsets[i + 1] = row
+        self.symbol_id = np.repeat(np.arange(len(self.symbols), dtype=np.int64), np.diff(self.offsets))
+
+    def allocate(self, approved_locates: dict[str, int]) -> np.ndarray:
+        """Computes the distributed locates of every row.
+        input: approved_locates - {symbol: num_of_locates_approved}
+        returns an array of distributed locates per row (rows of not approved symbols are meaningless).
+        """
+        totals = np.zeros(len(self.symbols), dtype=np.int64)
+        approved = np.zeros(len(self.symbols), dtype=bool)
+        for symbol, total in approved_locates.items():
+            totals[self.symbol_ids[symbol]] = total
+            approved[self.symbol_ids[symbol]] = True
+
+        # find portion by number, rounding half up
+        amount = self.percentage * totals[self.symbol_id]
+        converted = amount.astype(np.int64)
+        amount = converted + (amount - converted > 0.5)
+
+        # client can't get more then requested
+        allocated = np.minimum(amount, self.requested)
+
+        # symbols with a client that got less then requested need rounding
+        short = np.cumsum(np.concatenate(([0], allocated != self.requested)))
+        rounding = approved & ((short[self.offsets[1:]] - short[self.offsets[:-1]]) > 0)
+
+        # sum of reminders by symbol - symbols that can't fill a single lot are left as is
+        lot = np.where(self.lot > 0, self.lot, 1)
+        reminders = amount % lot[self.symbol_id]
+        summed = np.cumsum(np.concatenate(([0], reminders)))
+        times = (summed[self.offsets[1:]] - summed[self.offsets[:-1]]) // lot
+        for i in np.flatnonzero(rounding & (times > 0)):
+            if not self.lot[i]:
+                raise KeyError(self.symbols[i])
+            start, end = self.offsets[i], self.offsets[i + 1]
+            symbol_reminders = reminders[start:end]
+            # order by the min change in order to get to a multiple of the lot size
+            filtered = np.flatnonzero(symbol_reminders)
+            order = start + filtered[np.argsort(-symbol_reminders[filtered], kind='stable')]
+            allocated[order] = redistribute(amount[order], reminders[order], int(times[i]), int(self.lot[i]))
+        return allocated
+
+    def distribute(self, approved_locates: dict[str, int]) -> dict[str, dict[str, int]]:
+        """Distributes the approved locates among clients requests proportionally.
+        input: approved_locates - {symbol: num_of_locates_approved}
+        returns a dictionary of distributed locates: {client_name: {symbol: num_of_locates_distributed}}
+        """
+        allocated = self.allocate(approved_locates)
+        distributed_locates: dict[str, dict[str, int]] = {client: {} for client in self.clients}
+        clients = self.clients
+        for symbol in approved_locates:
+            i = self.symbol_ids[symbol]
+            start, end = self.offsets[i], self.offsets[i + 1]
+            for client_id, value in zip(self.client_id[start:end].tolist(), allocated[start:end].tolist()):
+                distributed_locates[clients[client_id]][symbol] = value
+        return distributed_locates
+
+
+def redistribute(values: np.ndarray, reminders: np.ndarray, times: int, round_lot_size: int) -> np.ndarray:
+    """Vectorized rounding_chunks for a single symbol.
+    input:
+    - values: distributed locates of the clients that are not a multiple of round_lot_size,
+      ordered by their reminder (highest first).
+    - reminders: values % round_lot_size in the same order.
+    - times: how many clients are rounded up - sum of reminders // round_lot_size.
+    returns the rounded values in the same order.
+    """
+    values = values.copy()
+    # round up the top ones
+    missing = round_lot_size - reminders[:times]
+    values[:times] += missing
+    grab_for_distribution = int(missing.sum())
+
+    # reminders left to the donors, they stay ordered from the highest to the lowest
+    donors = reminders[times:].copy()
+    relevants = len(donors)
+    while grab_for_distribution > 0:
+        # rounding_chunks takes everything from the lowest donor while it has less then the chunk to take -
+        # find at once how many of the lowest donors are emptied before a full chunk can be taken from all
+        lowest = donors[:relevants][::-1]
+        taken = np.concatenate(([0], np.cumsum(lowest)[:-1]))
+        chunks = (grab_for_distribution - taken) // np.arange(relevants, 0, -1)
+        emptied = int(np.argmax(lowest >= chunks))
+        if emptied:
+            donors[relevants - emptied:relevants] = 0
+            grab_for_distribution -= int(taken[emptied])
+            relevants -= emptied
+        chunk_to_redistribute = int(chunks[emptied])
+
+        # if we can't take a full chunk from each client - take 1 from the lowest ones
+        if not chunk_to_redistribute:
+            donors[relevants - grab_for_distribution:relevants] -= 1
+            break
+
+        # take the same chunk from every donor left
+        donors[:relevants] -= chunk_to_redistribute
+        grab_for_distribution -= chunk_to_redistribute * relevants
+        relevants -= int(np.count_nonzero(donors[:relevants] == 0))
+
+    values[times:] -= reminders[times:] - donors
+    return values
+
+
+def distribute_locates_columnar(clients_requests: dict[str, dict[str, int]], approved_locates: dict[str, int],
+                                req_by_symbol_clients_percentage: dict[str, dict[str, float]],
+                                chunk_pr_symbol: dict[str, int]) -> dict[str, dict[str, int]]:
+    """Same as locates_task.distribute_locates, computed with the columnar engine.
+    when distributing a few approval rounds of the same requests, build ColumnarRequests once instead.
+    """
+    requests = ColumnarRequests(clients_requests, req_by_symbol_clients_percentage, chunk_pr_symbol)
+    return requests.distribute(approved_locates)
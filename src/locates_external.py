@@ -0,0 +1,212 @@
+"""Out of core distribution for request books bigger than memory.
+
+csv_parser keeps every (client, symbol) request in memory. here the book is read once and its rows are
+spilled to temporary partition files, by a hash of the symbol (crc32), whenever the buffered rows reach
+the memory budget - only the per symbol totals and lot sizes stay in memory. the approvals need just
+those totals. then every partition is loaded, distributed and written on its own, so the peak memory is
+about the budget plus the biggest partition (a symbol is never split - the biggest symbol has to fit).
+
+    with PartitionedBook.from_csv(csv_path, memory_budget=512 << 20) as book:
+        approved = request_locates(book.aggregate_symbols)
+        distribute_external(book, approved, output_path)
+
+the results are the same as distribute_locates + create_results_csv, the rows are ordered by partition
+and symbol instead of by client.
+"""
+import csv
+import io
+import os
+import pickle
+import shutil
+import tempfile
+import time
+import zlib
+from contextlib import nullcontext
+from typing import Iterator, TextIO
+
+from locates_by_symbol import distribute_symbol_requests
+from locates_task import STREAM_CHUNK_SIZE, RESULTS_FIELDNAMES, WRITE_BUFFER_SIZE, stream_requests
+
+DEFAULT_MEMORY_BUDGET = 256 << 20
+# rough memory of a request held in the parsed dictionaries (or a spill buffer) - strings, ints and dict slots
+ROW_MEMORY_BYTES = 250
+# the file size is a lower bound of the rows count - a row is at least this many bytes of text
+MIN_ROW_TEXT_BYTES = 16
+# partitions of a stream input - its size is not known up front
+STREAM_PARTITIONS = 64
+
+
+def symbol_partition(symbol: str, partitions: int) -> int:
+    """returns the partition of a symbol - stable between runs (unlike hash())."""
+    return zlib.crc32(symbol.encode()) % partitions
+
+
+class PartitionedBook:
+    """A request book spilled to symbol partitioned temporary files, see the module docs.
+    build it with from_csv, close it (or use it as a context manager) to remove the files.
+    """
+
+    def __init__(self, partitions: int, spill_dir: str | None = None) -> None:
+        """input:
+        - partitions: number of partition files.
+        - spill_dir: where the temporary directory of the partitions goes (the system default if None).
+        """
+        self.partitions = partitions
+        self.directory = tempfile.mkdtemp(prefix='locates-', dir=spill_dir)
+        self.paths = [os.path.join(self.directory, f"partition-{i}.pickle") for i in range(partitions)]
+        self.aggregate_symbols: dict[str, int] = {}
+        self.chunk_pr_symbol: dict[str, int] = {}
+        self.rows = 0
+        self.spills = 0
+
+    @classmethod
+    def from_csv(cls, file_path: str, memory_budget: int = DEFAULT_MEMORY_BUDGET, partitions: int | None = None,
+                 spill_dir: str | None = None, chunk_size: int = STREAM_CHUNK_SIZE, metrics=None,
+                 rejected: list | None = None) -> 'PartitionedBook':
+        """Reads a CSV file into partitions - validation and exceptions are the same as csv_parser.
+        input:
+        - file_path: path to the CSV file (or an open text stream, see stream_requests).
+        - memory_budget: bytes of buffered rows before they are spilled, and the partition size to aim for.
+        - partitions: number of partitions, None picks enough for the file size to fit the budget
+          (STREAM_PARTITIONS for a stream - its partitions are not sized to the budget, pass partitions).
+        - spill_dir, chunk_size, metrics, rejected: see PartitionedBook, csv_parser_streaming.
+        returns the book.
+        """
+        if partitions is None:
+            partitions = STREAM_PARTITIONS
+            if isinstance(file_path, str) and os.path.exists(file_path):
+                most_rows = os.path.getsize(file_path) // MIN_ROW_TEXT_BYTES
+                partitions = max(1, -(-most_rows * ROW_MEMORY_BYTES // memory_budget))
+        book = cls(partitions, spill_dir)
+        start = time.perf_counter()
+        buffers: list[list[tuple[str, str, int, int]]] = [[] for _ in range(partitions)]
+        max_buffered = max(1, memory_budget // ROW_MEMORY_BYTES)
+        buffered = 0
+        aggregate_symbols, chunk_pr_symbol = book.aggregate_symbols, book.chunk_pr_symbol
+        # the partition of every symbol - computed once per symbol
+        symbol_partitions: dict[str, list] = {}
+
+        def add_request(client: str, symbol: str, num_of_locates_req: int, round_size: int) -> None:
+            """Buffers a single valid request, spills the buffers at the budget."""
+            nonlocal buffered
+            buffer = symbol_partitions.get(symbol)
+            if buffer is None:
+                buffer = symbol_partitions[symbol] = buffers[symbol_partition(symbol, partitions)]
+                # track chunk sizes - only the first one matters
+                chunk_pr_symbol[symbol] = round_size
+                aggregate_symbols[symbol] = 0
+            aggregate_symbols[symbol] += num_of_locates_req
+            buffer.append((client, symbol, num_of_locates_req, round_size))
+            buffered += 1
+            if buffered >= max_buffered:
+                book.spill(buffers)
+                buffered = 0
+
+        try:
+            book.rows = stream_requests(file_path, add_request, chunk_size, metrics, rejected)
+            book.spill(buffers)
+        except BaseException:
+            book.close()
+            raise
+        if metrics is not None:
+            metrics.add_stage('parse', time.perf_counter() - start, book.rows)
+        return book
+
+    def spill(self, buffers: list[list[tuple[str, str, int, int]]]) -> None:
+        """Appends the buffered rows to their partition files and empties the buffers (in place)."""
+        for path, buffer in zip(self.paths, buffers):
+            if buffer:
+                with open(path, 'ab') as partition_file:
+                    pickle.dump(buffer, partition_file, protocol=pickle.HIGHEST_PROTOCOL)
+                # the add_request closure holds these lists - clear, don't replace
+                buffer.clear()
+        self.spills += 1
+
+    def iter_partition(self, partition: int) -> Iterator[tuple[str, str, int, int]]:
+        """yields the rows of a partition - (client_name, symbol, number_of_locates_requested, round_lot_size),
+        in the file order."""
+        if not os.path.exists(self.paths[partition]):
+            return
+        with open(self.paths[partition], 'rb') as partition_file:
+            while True:
+                try:
+                    rows = pickle.load(partition_file)
+                except EOFError:
+                    return
+                yield from rows
+
+    def load_partition(self, partition: int) -> dict[str, dict[str, int]]:
+        """returns the requests of a partition by symbol - {symbol: {client_name: num_of_locates_requested}},
+        duplicates resolved like csv_parser (the last request is kept)."""
+        requests_by_symbol: dict[str, dict[str, int]] = {}
+        for client, symbol, num_of_locates_req, _ in self.iter_partition(partition):
+            symbol_clients = requests_by_symbol.get(symbol)
+            if symbol_clients is None:
+                symbol_clients = requests_by_symbol[symbol] = {}
+            symbol_clients[client] = num_of_locates_req
+        return requests_by_symbol
+
+    def close(self) -> None:
+        """Removes the partition files."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def __enter__(self) -> 'PartitionedBook':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def iter_distribute_external(book: PartitionedBook, approved_locates: dict[str, int],
+                             metrics=None) -> Iterator[tuple[str, dict[str, int]]]:
+    """Distributes a partitioned book one partition at a time.
+    input: the book and approved_locates - {symbol: num_of_locates_approved}, metrics as in distribute_locates.
+    yields (symbol, {client_name: num_of_locates_distributed}) - by partition, in the approved order inside one.
+    """
+    approved_by_partition: list[list[str]] = [[] for _ in range(book.partitions)]
+    for symbol in approved_locates:
+        approved_by_partition[symbol_partition(symbol, book.partitions)].append(symbol)
+
+    for partition, symbols in enumerate(approved_by_partition):
+        if not symbols:
+            continue
+        requests_by_symbol = book.load_partition(partition)
+        for symbol in symbols:
+            symbol_start = time.perf_counter()
+            distributed = distribute_symbol_requests(requests_by_symbol[symbol], approved_locates[symbol],
+                                                     book.aggregate_symbols[symbol], book.chunk_pr_symbol.get(symbol),
+                                                     metrics)
+            if metrics is not None:
+                metrics.add_symbol(symbol, time.perf_counter() - symbol_start, len(distributed))
+            yield symbol, distributed
+        # let go of the partition before loading the next one
+        del requests_by_symbol
+
+
+def distribute_external(book: PartitionedBook, approved_locates: dict[str, int], output_path: str | TextIO,
+                        metrics=None) -> int:
+    """Distributes a partitioned book and writes the results CSV (the create_results_csv format),
+    one partition in memory at a time.
+    input: the book, approved_locates - {symbol: num_of_locates_approved}, the output CSV path (or an open
+           text stream) and optional metrics (a 'distribute_and_write' stage, the symbols and rounding counts).
+    returns the number of rows written.
+    """
+    start = time.perf_counter()
+    rows = 0
+    try:
+        if isinstance(output_path, io.TextIOBase):
+            csv_file_context = nullcontext(output_path)
+        else:
+            csv_file_context = open(output_path, 'w', newline='', buffering=WRITE_BUFFER_SIZE)
+        with csv_file_context as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(RESULTS_FIELDNAMES)
+            for symbol, distributed in iter_distribute_external(book, approved_locates, metrics):
+                writer.writerows((client, f" {symbol}", f" {num_of_locates}")
+                                 for client, num_of_locates in distributed.items())
+                rows += len(distributed)
+    except OSError as e:
+        raise Exception(f"Failed to write results CSV: {e}") from e
+    if metrics is not None:
+        metrics.add_stage('distribute_and_write', time.perf_counter() - start, rows)
+    return rows
@@ -0,0 +1,281 @@
+"""Fairness, invariants and throughput of the distribution engines, side by side.
+
+every way to distribute locates is registered here as an engine - a function of a Book returning
+{client_name: {symbol: num_of_locates_distributed}}. the harness runs them on the same books and checks:
+- over allocation: no client gets more then requested (or less then 0), no symbol more then approved.
+- lot sizes: the parts of lots a symbol's clients hold add up to less then a lot - every lot that could
+  be given whole was (the leftovers are spread by fairness, as the notes describe).
+- conservation: a symbol distributes min(approved, requested) - the difference is the drift. engines
+  registered with conserves=False (the legacy float algorithm, its half up rounding can go over the
+  approved amount) get their drift and over approved symbols reported, not failed.
+- fairness: the notes objective, the sum over all cells of |deserved - allocated| where the deserved
+  portion is requested / total_requested * min(approved, total_requested). lower is fairer.
+- reference: an engine registered with reference='legacy' promises the exact legacy results - a faster
+  engine is accepted when its differences are 0 (or, for a new algorithm, its fairness is as good).
+
+    book = Book.from_rows(random_rows(rng), approvals)
+    report = run_engines(book)        # {engine: {'seconds', 'rows_per_second', 'fairness', ...}}
+
+tests/test_engines.py runs this on random books, benchmarks/bench_engines.py prints the comparison.
+"""
+import io
+import random
+import time
+from typing import Callable
+
+from locates_task import csv_parser_streaming, distribute_locates, distribute_locates_exact
+
+HEADER = "client_name, symbol, number_of_locates_requested, round_lot_size\n"
+
+
+class Book:
+    """A parsed request book with its approvals - the input of every engine."""
+
+    def __init__(self, clients_requests: dict[str, dict[str, int]], aggregate_symbols: dict[str, int],
+                 req_by_symbol_clients_percentage: dict[str, dict[str, float]], chunk_pr_symbol: dict[str, int],
+                 approved_locates: dict[str, int]) -> None:
+        """input: the csv_parser output and approved_locates - {symbol: num_of_locates_approved}."""
+        self.clients_requests = clients_requests
+        self.aggregate_symbols = aggregate_symbols
+        self.req_by_symbol_clients_percentage = req_by_symbol_clients_percentage
+        self.chunk_pr_symbol = chunk_pr_symbol
+        self.approved_locates = approved_locates
+        # {symbol: {client_name: num_of_locates_requested}}
+        self.requests_by_symbol = {symbol: {client: clients_requests[client][symbol] for client in clients_percentage}
+                                   for symbol, clients_percentage in req_by_symbol_clients_percentage.items()}
+
+    @classmethod
+    def from_rows(cls, rows: list[tuple[str, str, int, int]], approved_locates: dict[str, int] | None = None,
+                  rng: random.Random | None = None) -> 'Book':
+        """Builds a book from request rows, through the CSV parser.
+        input: rows of (client_name, symbol, number_of_locates_requested, round_lot_size), the approvals -
+               random_approvals (with rng) if not given.
+        """
+        text = HEADER + ''.join(f"{client}, {symbol}, {requested}, {lot}\n" for client, symbol, requested, lot in rows)
+        clients_requests, aggregate_symbols, req_by_symbol_clients_percentage, chunk_pr_symbol = \
+            csv_parser_streaming(io.StringIO(text))
+        if approved_locates is None:
+            approved_locates = random_approvals(rng or random.Random(0), aggregate_symbols)
+        return cls(clients_requests, aggregate_symbols, req_by_symbol_clients_percentage, chunk_pr_symbol,
+                   approved_locates)
+
+    @property
+    def rows(self) -> int:
+        """number of (client, symbol) requests of the approved symbols - what the engines go over."""
+        return sum(len(self.requests_by_symbol[symbol]) for symbol in self.approved_locates)
+
+
+class Engine:
+    """A registered distribution engine, see register_engine."""
+
+    def __init__(self, name: str, run: Callable[[Book], dict[str, dict[str, int]]], conserves: bool,
+                 reference: str | None) -> None:
+        self.name = name
+        self.run = run
+        self.conserves = conserves
+        self.reference = reference
+
+
+ENGINES: dict[str, Engine] = {}
+
+
+def register_engine(name: str, conserves: bool = True, reference: str | None = None) -> Callable:
+    """Decorator registering an engine - a function of a Book returning {client_name: {symbol: n}}.
+    input:
+    - name: the engine name in the reports.
+    - conserves: the engine always distributes min(approved, requested) - drift fails the tests.
+    - reference: the name of an engine this one must give exactly the same results as.
+    """
+    def register(run: Callable[[Book], dict[str, dict[str, int]]]) -> Callable[[Book], dict[str, dict[str, int]]]:
+        ENGINES[name] = Engine(name, run, conserves, reference)
+        return run
+    return register
+
+
+@register_engine('legacy', conserves=False)
+def legacy_engine(book: Book) -> dict[str, dict[str, int]]:
+    return distribute_locates(book.clients_requests, book.approved_locates, book.req_by_symbol_clients_percentage,
+                              book.chunk_pr_symbol)
+
+
+@register_engine('exact')
+def exact_engine(book: Book) -> dict[str, dict[str, int]]:
+    return distribute_locates_exact(book.clients_requests, book.approved_locates, book.requests_by_symbol,
+                                    book.aggregate_symbols, book.chunk_pr_symbol)
+
+
+@register_engine('by_symbol', conserves=False, reference='legacy')
+def by_symbol_engine(book: Book) -> dict[str, dict[str, int]]:
+    from locates_by_symbol import distribute_locates_by_symbol, transpose_locates
+    distributed_by_symbol = distribute_locates_by_symbol(book.requests_by_symbol, book.approved_locates,
+                                                         book.aggregate_symbols, book.chunk_pr_symbol)
+    return transpose_locates(distributed_by_symbol, book.clients_requests)
+
+
+@register_engine('allocator', conserves=False, reference='legacy')
+def allocator_engine(book: Book) -> dict[str, dict[str, int]]:
+    from locates_allocator import LocatesAllocator
+    allocator = LocatesAllocator(book.clients_requests, book.req_by_symbol_clients_percentage, book.chunk_pr_symbol,
+                                 book.aggregate_symbols)
+    for symbol, approved in book.approved_locates.items():
+        allocator.update(symbol, approved)
+    return allocator.allocations
+
+
+@register_engine('scenarios', conserves=False, reference='legacy')
+def scenarios_engine(book: Book) -> dict[str, dict[str, int]]:
+    from locates_scenarios import ScenarioBook
+    scenario_book = ScenarioBook(book.clients_requests, book.aggregate_symbols, book.req_by_symbol_clients_percentage,
+                                 book.chunk_pr_symbol)
+    return scenario_book.evaluate({'book': book.approved_locates})['book'].to_dict()
+
+
+@register_engine('parallel', conserves=False, reference='legacy')
+def parallel_engine(book: Book) -> dict[str, dict[str, int]]:
+    return distribute_locates(book.clients_requests, book.approved_locates, book.req_by_symbol_clients_percentage,
+                              book.chunk_pr_symbol, workers=2)
+
+
+try:
+    from locates_columnar import distribute_locates_columnar
+except ImportError:
+    # no numpy - no columnar engine
+    pass
+else:
+    @register_engine('columnar', conserves=False, reference='legacy')
+    def columnar_engine(book: Book) -> dict[str, dict[str, int]]:
+        return distribute_locates_columnar(book.clients_requests, book.approved_locates,
+                                           book.req_by_symbol_clients_percentage, book.chunk_pr_symbol)
+
+
+def random_rows(rng: random.Random, clients: int = 30, symbols: int = 10, requests: int = 100,
+                lots: tuple[int, ...] = (100, 10, 1)) -> list[tuple[str, str, int, int]]:
+    """Generates random request rows - a client asks for a symbol once, every symbol has a single lot size.
+    returns a list of (client_name, symbol, number_of_locates_requested, round_lot_size).
+    """
+    symbol_lots = [rng.choice(lots) for _ in range(symbols)]
+    rows = {}
+    for _ in range(requests):
+        client, symbol = rng.randrange(clients), rng.randrange(symbols)
+        lot = symbol_lots[symbol]
+        # mostly a few lots, sometimes a big request next to small ones
+        lots_requested = rng.randint(1, 20) if rng.random() < 0.9 else rng.randint(100, 10_000)
+        rows[(client, symbol)] = (f"Client{client}", f"SYM{symbol}", lot * lots_requested, lot)
+    return list(rows.values())
+
+
+def random_approvals(rng: random.Random, aggregate_symbols: dict[str, int]) -> dict[str, int]:
+    """Approves random amounts - nothing, a part, everything or more then requested, for most symbols."""
+    approved_locates = {}
+    for symbol, total in aggregate_symbols.items():
+        kind = rng.random()
+        if kind < 0.1:
+            continue
+        if kind < 0.2:
+            approved_locates[symbol] = 0
+        elif kind < 0.8:
+            approved_locates[symbol] = rng.randint(1, total)
+        elif kind < 0.9:
+            approved_locates[symbol] = total
+        else:
+            approved_locates[symbol] = total + rng.randint(1, total)
+    return approved_locates
+
+
+def check_invariants(book: Book, distributed_locates: dict[str, dict[str, int]]) -> dict[str, int]:
+    """Checks an engine's results, see the module docs.
+    returns violation counts - {'over_requested': cells, 'over_approved': symbols, 'lot_violations': symbols,
+    'drift_symbols': symbols, 'drift': sum of |distributed - min(approved, requested)|, 'unexpected_cells':
+    cells of symbols that were not approved or clients that did not request them}.
+    """
+    report = dict.fromkeys(('over_requested', 'over_approved', 'lot_violations', 'drift_symbols', 'drift',
+                            'unexpected_cells'), 0)
+    symbol_totals: dict[str, int] = {}
+    symbol_partial_lots: dict[str, int] = {}
+    for client, symbols in distributed_locates.items():
+        for symbol, value in symbols.items():
+            requested = book.requests_by_symbol.get(symbol, {}).get(client)
+            if requested is None or symbol not in book.approved_locates:
+                report['unexpected_cells'] += 1
+                continue
+            if value < 0 or value > requested:
+                report['over_requested'] += 1
+            symbol_totals[symbol] = symbol_totals.get(symbol, 0) + value
+            lot = book.chunk_pr_symbol.get(symbol)
+            if lot:
+                symbol_partial_lots[symbol] = symbol_partial_lots.get(symbol, 0) + value % lot
+
+    for symbol, approved in book.approved_locates.items():
+        total = symbol_totals.get(symbol, 0)
+        if total > approved:
+            report['over_approved'] += 1
+        drift = abs(total - min(approved, book.aggregate_symbols[symbol]))
+        if drift:
+            report['drift_symbols'] += 1
+            report['drift'] += drift
+        if symbol_partial_lots.get(symbol, 0) >= (book.chunk_pr_symbol.get(symbol) or 1):
+            report['lot_violations'] += 1
+    return report
+
+
+def fairness(book: Book, distributed_locates: dict[str, dict[str, int]]) -> float:
+    """returns the sum over the approved cells of |deserved portion - allocated| (the notes objective)."""
+    unfairness = 0.0
+    for symbol, approved in book.approved_locates.items():
+        total_requested = book.aggregate_symbols[symbol]
+        granted = min(approved, total_requested)
+        for client, requested in book.requests_by_symbol[symbol].items():
+            allocated = distributed_locates.get(client, {}).get(symbol, 0)
+            unfairness += abs(requested / total_requested * granted - allocated)
+    return unfairness
+
+
+def differences(distributed_locates: dict[str, dict[str, int]], reference: dict[str, dict[str, int]]) -> int:
+    """returns the number of (client, symbol) cells that differ between two results."""
+    cells = {(client, symbol) for results in (distributed_locates, reference)
+             for client, symbols in results.items() for symbol in symbols}
+    return sum(distributed_locates.get(client, {}).get(symbol) != reference.get(client, {}).get(symbol)
+               for client, symbol in cells)
+
+
+def run_engines(book: Book, engines: list[str] | None = None, repeat: int = 1) -> dict[str, dict]:
+    """Runs engines on a book.
+    input: the book, the engine names (all registered engines if None), runs per engine (the best time is kept).
+    returns {engine: {'seconds', 'rows_per_second', 'fairness', 'differences' (from its reference, if it has one)
+    and the check_invariants counts}}
+    """
+    names = list(ENGINES) if engines is None else engines
+    results: dict[str, dict[str, dict[str, int]]] = {}
+    report: dict[str, dict] = {}
+    rows = book.rows
+    for name in names:
+        engine = ENGINES[name]
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            distributed_locates = engine.run(book)
+            best = min(best, time.perf_counter() - start)
+        results[name] = distributed_locates
+        report[name] = {'seconds': best, 'rows_per_second': rows / best if best else 0.0,
+                        'fairness': fairness(book, distributed_locates),
+                        **check_invariants(book, distributed_locates)}
+    for name in names:
+        reference = ENGINES[name].reference
+        if reference is not None:
+            if reference not in results:
+                results[reference] = ENGINES[reference].run(book)
+            report[name]['differences'] = differences(results[name], results[reference])
+    return report
+
+
+def failures(report: dict[str, dict]) -> list[str]:
+    """returns a message for every broken promise in a run_engines report - over requested cells, lot sizes,
+    unexpected cells, differences from the reference and, for the engines that conserve, drift and
+    over approved symbols."""
+    messages = []
+    for name, result in report.items():
+        checks = ['over_requested', 'lot_violations', 'unexpected_cells', 'differences']
+        if ENGINES[name].conserves:
+            checks += ['over_approved', 'drift']
+        messages.extend(f"{name}: {check} {result[check]}" for check in checks if result.get(check))
+    return messages
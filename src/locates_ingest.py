@@ -0,0 +1,94 @@
+"""Ingestion of many request files at once - a list of files, a directory or a glob.
+
+Every file is parsed in its own worker process (csv_parser_streaming) and the partial results are
+merged in the file order:
+- clients requests: a client asking for the same symbol in a few files is resolved by the duplicates rule -
+  'sum' (default, every desk file is a separate request), 'last' (the latest file replaces the request)
+  or 'error'. duplicates inside a single file are handled by the parser as usual.
+- symbols totals: the sum of the files totals (adjusted to the duplicates rule).
+- lot size: the first one seen, in the file order.
+"""
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from locates_task import csv_parser_streaming, to_percentages
+
+DUPLICATE_RULES = ('sum', 'last', 'error')
+
+
+def resolve_paths(source: str | list[str]) -> list[str]:
+    """Finds the request files of a source.
+    input: a list of paths (kept in its order), a directory (its .csv files) or a glob pattern (sorted by name).
+    returns the list of paths, raises FileExistsError if there are none.
+    """
+    if isinstance(source, (list, tuple)):
+        paths = list(source)
+    elif os.path.isdir(source):
+        paths = sorted(os.path.join(source, name) for name in os.listdir(source) if name.lower().endswith('.csv'))
+    else:
+        paths = sorted(glob.glob(source))
+    if not paths:
+        raise FileExistsError(f"no request files found: {source}")
+    return paths
+
+
+def parse_file(file_path: str) -> tuple[dict[str, dict[str, int]], dict[str, int], dict[str, dict[str, int]], dict[str, int]]:
+    """Parses a single file without percentages - runs in a worker process."""
+    return csv_parser_streaming(file_path, percentages=False)
+
+
+def parse_many(source: str | list[str], workers: int = 1, duplicates: str = 'sum',
+               percentages: bool = True) -> tuple[dict[str, dict[str, int]], dict[str, int], dict[str, dict[str, float]], dict[str, int]]:
+    """Parses and merges many request files.
+    input:
+    - source: a list of paths, a directory or a glob pattern (see resolve_paths).
+    - workers: number of processes parsing files in parallel (1 parses in this process).
+    - duplicates: how to merge a client's requests for the same symbol in a few files - 'sum', 'last' or 'error'.
+    - percentages: same as csv_parser.
+    returns: the same tuple as csv_parser, for all the files together.
+    """
+    if duplicates not in DUPLICATE_RULES:
+        raise ValueError(f"unknown duplicates rule: {duplicates}")
+    paths = resolve_paths(source)
+
+    if workers > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as executor:
+            parsed_files = list(executor.map(parse_file, paths))
+    else:
+        parsed_files = [parse_file(path) for path in paths]
+
+    clients_requests: dict[str, dict[str, int]] = {}
+    aggregate_symbols: dict[str, int] = {}
+    req_by_symbol_clients: dict[str, dict[str, int]] = {}
+    chunk_pr_symbol: dict[str, int] = {}
+    for path, (file_clients, file_aggregate, file_by_symbol, file_chunks) in zip(paths, parsed_files):
+        # the first lot size seen wins
+        for symbol, round_size in file_chunks.items():
+            chunk_pr_symbol.setdefault(symbol, round_size)
+        for symbol, total in file_aggregate.items():
+            aggregate_symbols[symbol] = aggregate_symbols.get(symbol, 0) + total
+
+        for symbol, symbol_clients in file_by_symbol.items():
+            merged_clients = req_by_symbol_clients.setdefault(symbol, {})
+            for client, requested in symbol_clients.items():
+                previous = merged_clients.get(client)
+                if previous is not None:
+                    if duplicates == 'error':
+                        raise ValueError(f"{client} requested {symbol} again in {path}")
+                    if duplicates == 'sum':
+                        requested += previous
+                    else:
+                        # the latest file replaces the request - take the old one out of the total
+                        aggregate_symbols[symbol] -= previous
+                merged_clients[client] = requested
+        # the clients (and their symbols) in the file order, like csv_parser - not in the symbols order
+        for client, symbols in file_clients.items():
+            client_requests = clients_requests.setdefault(client, {})
+            for symbol in symbols:
+                client_requests[symbol] = req_by_symbol_clients[symbol][client]
+
+    # convert per-symbol client requests to percentages
+    if percentages:
+        to_percentages(req_by_symbol_clients, aggregate_symbols)
+    return clients_requests, aggregate_symbols, req_by_symbol_clients, chunk_pr_symbol
@@ -0,0 +1,239 @@
+"""Checkpoint and resume of long distribution runs.
+
+a run that is killed near the end used to start over from csv_parser. run_checkpointed writes its progress
+to an append-only binary journal instead:
+- the parsed requests, once - the requested amounts by symbol (percentages are recomputed on load, the same
+  floats), the totals, lot sizes and the clients order.
+- the approvals, once.
+- every distributed symbol as soon as it is done - its values only, the clients are the symbol's requests.
+a restart with the same journal loads the parsed state from it (no CSV parsing), skips the finished symbols
+and distributes the rest. once every symbol is done, write_journal_results (create_results_csv) writes the
+output straight from the journal:
+
+    distributed = run_checkpointed('requests.csv', 'run.journal', request_locates)
+    create_results_csv(distributed, 'results.csv')
+    ... or later, from another process:
+    write_journal_results('run.journal', 'results.csv')
+
+a record is [kind: 1 byte][payload length: 8 bytes][crc32: 4 bytes][pickled payload]. a record cut by the
+crash (or with a bad crc) ends the journal - it is truncated there and the run goes on from the record before.
+"""
+import os
+import pickle
+import struct
+import time
+import zlib
+from array import array
+from typing import Callable
+
+from locates_by_symbol import ClientLocates
+from locates_task import csv_parser_streaming, create_results_csv, iter_distribute_locates, to_percentages
+
+JOURNAL_MAGIC = b'LOCJ\x01'
+RECORD_HEADER = struct.Struct('<cQI')
+# record kinds
+PARSED, APPROVALS, SYMBOL = b'P', b'A', b'S'
+# distributed symbols between fsyncs - every record is flushed to the OS anyway, this is for power loss
+SYNC_SYMBOLS = 1024
+
+
+class JournalError(Exception):
+    """A journal that doesn't belong to this run - another requests file, other approvals or not a journal."""
+
+
+class Journal:
+    """An open checkpoint journal, see the module docs - loads what an earlier run wrote, appends the rest.
+    use it as a context manager (or close() it).
+    """
+
+    def __init__(self, journal_path: str, sync_symbols: int = SYNC_SYMBOLS) -> None:
+        """input:
+        - journal_path: the journal file, created if needed.
+        - sync_symbols: distributed symbols between fsyncs.
+        raises JournalError if the file is not a journal.
+        """
+        self.journal_path = journal_path
+        self.sync_symbols = sync_symbols
+        # (size, mtime_ns) of the requests file, and the parsed state as csv_parser returns it
+        self.source: tuple[int, int] | None = None
+        self.parsed: tuple | None = None
+        self.approved_locates: dict[str, int] | None = None
+        # symbol: its distributed values, in the order of the symbol's clients
+        self.done: dict[str, array] = {}
+        self._unsynced = 0
+        self._file = open(journal_path, 'a+b')
+        try:
+            self._load()
+        except BaseException:
+            self._file.close()
+            raise
+
+    def _load(self) -> None:
+        """Reads the records of an earlier run and truncates a torn last record."""
+        self._file.seek(0)
+        data = self._file.read()
+        if not data:
+            self._file.write(JOURNAL_MAGIC)
+            self._file.flush()
+            return
+        if not data.startswith(JOURNAL_MAGIC):
+            raise JournalError(f"not a locates journal: {self.journal_path}")
+        position = len(JOURNAL_MAGIC)
+        while position + RECORD_HEADER.size <= len(data):
+            kind, length, crc = RECORD_HEADER.unpack_from(data, position)
+            start = position + RECORD_HEADER.size
+            payload = data[start:start + length]
+            if len(payload) != length or zlib.crc32(payload) != crc:
+                break
+            self._apply(kind, pickle.loads(payload))
+            position = start + length
+        if position < len(data):
+            # the run was killed in the middle of a record
+            self._file.truncate(position)
+        self._file.seek(0, os.SEEK_END)
+
+    def _apply(self, kind: bytes, payload) -> None:
+        """Loads a single record."""
+        if kind == PARSED:
+            self.source, clients, req_by_symbol_clients, aggregate_symbols, chunk_pr_symbol = payload
+            # clients_requests in the csv_parser clients order
+            clients_requests: dict[str, dict[str, int]] = {client: {} for client in clients}
+            for symbol, symbol_clients in req_by_symbol_clients.items():
+                for client, num_of_locates_req in symbol_clients.items():
+                    clients_requests[client][symbol] = num_of_locates_req
+            to_percentages(req_by_symbol_clients, aggregate_symbols)
+            self.parsed = (clients_requests, aggregate_symbols, req_by_symbol_clients, chunk_pr_symbol)
+        elif kind == APPROVALS:
+            self.approved_locates = payload
+        elif kind == SYMBOL:
+            symbol, values = payload
+            self.done[symbol] = values
+
+    def _append(self, kind: bytes, payload) -> None:
+        """Appends a record and flushes it."""
+        data = pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+        self._file.write(RECORD_HEADER.pack(kind, len(data), zlib.crc32(data)) + data)
+        self._file.flush()
+
+    def write_parsed(self, parsed: tuple, source: tuple[int, int] | None = None) -> None:
+        """Journals the parsed requests - then converts them to percentages in place, like a restart loads them.
+        input: parsed - csv_parser(file_path, percentages=False), source - (size, mtime_ns) of the file.
+        """
+        clients_requests, aggregate_symbols, req_by_symbol_clients, chunk_pr_symbol = parsed
+        self._append(PARSED, (source, list(clients_requests), req_by_symbol_clients, aggregate_symbols, chunk_pr_symbol))
+        self.sync()
+        self.source = source
+        to_percentages(req_by_symbol_clients, aggregate_symbols)
+        self.parsed = parsed
+
+    def write_approvals(self, approved_locates: dict[str, int]) -> None:
+        """Journals the approvals - {symbol: num_of_locates_approved}."""
+        self._append(APPROVALS, dict(approved_locates))
+        self.sync()
+        self.approved_locates = dict(approved_locates)
+
+    def write_symbol(self, symbol: str, distributed: dict[str, int]) -> None:
+        """Journals a distributed symbol - {client_name: num_of_locates_distributed}, in the symbol's clients order."""
+        values = array('q', distributed.values())
+        self._append(SYMBOL, (symbol, values))
+        self.done[symbol] = values
+        self._unsynced += 1
+        if self._unsynced >= self.sync_symbols:
+            self.sync()
+
+    def sync(self) -> None:
+        """Makes the records so far durable."""
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    @property
+    def complete(self) -> bool:
+        """True once every approved symbol is distributed."""
+        return self.approved_locates is not None and all(symbol in self.done for symbol in self.approved_locates)
+
+    def results(self) -> ClientLocates:
+        """returns the distributed locates: {client_name: {symbol: num_of_locates_distributed}}, the same
+        (and in the same order) as distribute_locates - a ClientLocates view, create_results_csv takes it.
+        raises JournalError if the run is not complete.
+        """
+        if self.parsed is None or not self.complete:
+            raise JournalError(f"the journal run is not complete: {self.journal_path}")
+        clients_requests, _, req_by_symbol_clients_percentage, _ = self.parsed
+        distributed_by_symbol = {symbol: dict(zip(req_by_symbol_clients_percentage[symbol], self.done[symbol]))
+                                 for symbol in self.approved_locates}
+        return ClientLocates(distributed_by_symbol, clients_requests)
+
+    def close(self) -> None:
+        if not self._file.closed:
+            if self._unsynced:
+                self.sync()
+            self._file.close()
+
+    def __enter__(self) -> 'Journal':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def file_source(file_path) -> tuple[int, int] | None:
+    """returns the (size, mtime_ns) of a requests file, None for a stream."""
+    if not isinstance(file_path, str):
+        return None
+    stat = os.stat(file_path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def run_checkpointed(file_path, journal_path: str, approvals: dict[str, int] | Callable[[dict[str, int]], dict[str, int]],
+                     workers: int = 1, metrics=None, sync_symbols: int = SYNC_SYMBOLS) -> ClientLocates:
+    """Parses, approves and distributes with a checkpoint journal - resumes the run the journal has.
+    input:
+    - file_path: path to the CSV file (or an open text stream) - not read if the journal has the parsed state.
+    - journal_path: the journal file, created if needed.
+    - approvals: approved_locates - {symbol: num_of_locates_approved}, or a function from aggregate_symbols to
+      them (e.g. request_locates) - not called if the journal has the approvals. symbols nobody requested are
+      left out.
+    - workers, metrics: same as distribute_locates.
+    - sync_symbols: see Journal.
+    returns the distributed locates, same as distribute_locates (see Journal.results).
+    raises JournalError if the journal is of another requests file or other approvals (remove it to start over),
+    and the csv_parser exceptions.
+    """
+    with Journal(journal_path, sync_symbols) as journal:
+        if journal.parsed is None:
+            source = file_source(file_path)
+            journal.write_parsed(csv_parser_streaming(file_path, percentages=False, metrics=metrics), source)
+        elif isinstance(file_path, str) and os.path.exists(file_path) and journal.source != file_source(file_path):
+            raise JournalError(f"the requests file changed since the journal was written: {journal_path}")
+        clients_requests, aggregate_symbols, req_by_symbol_clients_percentage, chunk_pr_symbol = journal.parsed
+
+        if journal.approved_locates is None:
+            approved_locates = approvals(aggregate_symbols) if callable(approvals) else approvals
+            journal.write_approvals({symbol: total for symbol, total in approved_locates.items()
+                                     if symbol in aggregate_symbols})
+        elif not callable(approvals) and {symbol: total for symbol, total in approvals.items()
+                                          if symbol in aggregate_symbols} != journal.approved_locates:
+            raise JournalError(f"the journal run has other approvals: {journal_path}")
+
+        start = time.perf_counter()
+        remaining = {symbol: total for symbol, total in journal.approved_locates.items() if symbol not in journal.done}
+        rows = 0
+        for symbol, distributed in iter_distribute_locates(clients_requests, remaining, req_by_symbol_clients_percentage,
+                                                           chunk_pr_symbol, workers, metrics):
+            journal.write_symbol(symbol, distributed)
+            rows += len(distributed)
+        if metrics is not None:
+            metrics.add_stage('distribute', time.perf_counter() - start, rows)
+        return journal.results()
+
+
+def write_journal_results(journal_path: str, output_path, output_format: str = 'csv', metrics=None) -> None:
+    """Writes the results of a complete journal run - create_results_csv without the run.
+    input: the journal, output_path, output_format and metrics as in create_results_csv.
+    raises JournalError if the run is not complete.
+    """
+    if not os.path.exists(journal_path):
+        raise JournalError(f"no such journal: {journal_path}")
+    with Journal(journal_path) as journal:
+        distributed = journal.results()
+    create_results_csv(distributed, output_path, output_format, metrics)
@@ -0,0 +1,162 @@
+"""Allocation kernel - the proportional split and the rounding_chunks redistribution loop over plain lists.
+
+the symbol's clients are positions in lists (percentages, requests, values), no client names and no
+dictionaries, so the module compiles with mypyc into an extension that Python imports instead of this file:
+
+    cd src && mypyc locates_kernel.py
+
+without the extension this file runs interpreted - the same operations in the same order, the same
+results (locates_task.KERNEL_COMPILED tells which one is loaded).
+"""
+
+# clients in a symbol from which the reminders are ordered with a counting sort
+BUCKET_SORT_MIN_CLIENTS = 1_000
+
+
+def bucket_sort_picked(size: int, round_lot_size: int) -> bool:
+    """returns True if order_by_reminder picks the counting sort for a symbol of size values - a big symbol
+    with no more buckets (round_lot_size) than values."""
+    return BUCKET_SORT_MIN_CLIENTS <= size and round_lot_size <= size
+
+
+def order_by_reminder(values: list[int], round_lot_size: int, bucketed: bool | None = None) -> tuple[list[int], int]:
+    """Orders the positions of the values that are not on a multiple of round_lot_size by the min change
+    in order to get to a multiple of round_lot_size (highest reminder first, ties keep their order).
+    input: values - the symbol's amounts, bucketed - force the counting sort (True) or the sort (False),
+           None picks by the symbol size (both give the same order).
+    returns a tuple of the ordered positions and the sum of their reminders.
+    """
+    size = len(values)
+    if bucketed is None:
+        bucketed = bucket_sort_picked(size, round_lot_size)
+
+    if not bucketed:
+        positions = [i for i in range(size) if values[i] % round_lot_size != 0]
+        positions.sort(key=lambda i: values[i] % round_lot_size, reverse=True)
+        total_to_distribute = 0
+        for i in positions:
+            total_to_distribute += values[i] % round_lot_size
+        return positions, total_to_distribute
+
+    # one bucket per reminder, positions keep their order inside a bucket
+    buckets: list[list[int]] = [[] for _ in range(round_lot_size)]
+    for i in range(size):
+        buckets[values[i] % round_lot_size].append(i)
+    ordered: list[int] = []
+    total_to_distribute = 0
+    # bucket 0 is already on a multiple of round_lot_size
+    for reminder in range(round_lot_size - 1, 0, -1):
+        bucket = buckets[reminder]
+        if bucket:
+            total_to_distribute += reminder * len(bucket)
+            ordered.extend(bucket)
+    return ordered, total_to_distribute
+
+
+def redistribute(values: list[int], round_lot_size: int, total_to_distribute: int) -> int:
+    """The rounding_chunks redistribution - rounds the top values up to round_lot_size, taking the locates
+    from the lowest ones. works in place.
+    input: values - the reminder ordered values (order_by_reminder), total_to_distribute - the sum of their reminders.
+    returns the number of redistribution loop iterations, -1 if the reminders are less then a lot (nothing done).
+    """
+    times = int(total_to_distribute / round_lot_size)
+    # if sum of reminders is less than round_lot_size no need to distribute
+    if not times:
+        return -1
+
+    # figure how much we need of rounding the cloesest to it.
+    grab_for_distribution = 0
+    for i in range(times):
+        missing = round_lot_size - values[i] % round_lot_size
+        grab_for_distribution += missing
+        # act like we rounded them already
+        values[i] += missing
+
+    emptied_clients = 0
+    iterations = 0
+    # grab from the lowest ones to distribute to the top ones
+    while grab_for_distribution > 0:
+        iterations += 1
+        size_of_relevants = len(values) - (emptied_clients + times)  # of clients that can give locates
+        chunk_to_redistribute = int(grab_for_distribution / size_of_relevants)  # how much to take from each client
+
+        # if we can't take a full chunk from each client - take 1 from the lowest ones
+        if not chunk_to_redistribute:
+            for i in range(grab_for_distribution):
+                values[size_of_relevants + times - 1 - i % size_of_relevants] -= 1
+            grab_for_distribution = 0
+            break
+
+        # from the lowest to the highest that gave locates
+        for i in range(size_of_relevants + times - 1, times - 1, -1):
+            reminder = values[i] % round_lot_size
+            # if we can take the full amount
+            if reminder - chunk_to_redistribute >= 0:
+                values[i] -= chunk_to_redistribute
+                grab_for_distribution -= chunk_to_redistribute
+                # if we emptied this client
+                if values[i] % round_lot_size == 0:
+                    emptied_clients += 1
+            # else if we can't take the full amount
+            else:
+                chunk_to_redistribute = reminder
+                values[i] -= chunk_to_redistribute
+                emptied_clients += 1
+                grab_for_distribution -= chunk_to_redistribute
+                break
+    return iterations
+
+
+def round_lots(values: list[int], round_lot_size: int,
+               bucketed: bool | None = None) -> tuple[list[int] | None, list[int], int]:
+    """rounding_chunks over a list - the positions it changes and their values.
+    returns a tuple of the ordered positions (None if no rounding needed), their rounded values and the
+    redistribution loop iterations.
+    """
+    positions, total_to_distribute = order_by_reminder(values, round_lot_size, bucketed)
+    ordered = [values[i] for i in positions]
+    iterations = redistribute(ordered, round_lot_size, total_to_distribute)
+    if iterations < 0:
+        return None, ordered, 0
+    return positions, ordered, iterations
+
+
+def distribute_proportional(percentages: list[float], requested: list[int], total: int,
+                            round_lot_size: int) -> tuple[list[int], int]:
+    """Distributes a symbol's approved locates by the clients percentages - locates_task.distribute_symbol
+    over lists.
+    input: the clients percentages and requests (same positions), num_of_locates_approved and the round lot size
+           (only used if rounding is needed).
+    returns a tuple of the distributed values (same positions) and the rounding_chunks loop iterations,
+    -1 if rounding_chunks didn't run.
+    """
+    size = len(percentages)
+    by_proportion = [0] * size
+    distributed = [0] * size
+    rounding = False
+    for i in range(size):
+        # find portion by number
+        amount = percentages[i] * total
+
+        # make sure to distribute the whole approved number
+        converted = int(amount)
+        if amount - converted > 0.5:
+            converted += 1
+        by_proportion[i] = converted
+
+        # client can't get more then requested
+        if converted < requested[i]:
+            distributed[i] = converted
+            # client got by proportion - rounding is needed
+            rounding = True
+        else:
+            distributed[i] = requested[i]
+    if not rounding:
+        return distributed, -1
+
+    # try to redistribute leftovers
+    positions, rounded, iterations = round_lots(by_proportion, round_lot_size)
+    if positions is not None:
+        for j in range(len(positions)):
+            distributed[positions[j]] = rounded[j]
+    return distributed, iterations
@@ -0,0 +1,220 @@
+"""Opt-in metrics of the locates pipeline - parse, approvals, distribute and write.
+
+give a Metrics to csv_parser / csv_parser_streaming, distribute_locates (or distribute_locates_exact) and
+create_results_csv and it collects:
+- wall time and rows per second of every stage (stages called a few times add up).
+- the rows the parsers rejected, by reason (see locates_task.REJECT_REASONS).
+- the distribution time and number of clients of every symbol - the slow symbols.
+- how many times rounding_chunks ran and the iterations of its redistribution loop.
+the approvals are a black box call, time them with the stage context manager:
+
+    metrics = Metrics(sinks=[LogSink(), PrometheusSink('locates.prom')])
+    parsed = csv_parser(csv_path, metrics=metrics)
+    with metrics.stage('approvals') as stage:
+        approved = request_locates(parsed[1])
+        stage.rows = len(approved)
+    ...
+    metrics.flush()
+
+sinks are anything with an emit(metrics) method - LogSink, JsonSink and PrometheusSink (text format,
+e.g. for the node exporter textfile collector) are here.
+"""
+import json
+import logging
+import os
+import tempfile
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Iterator, TextIO
+
+# slowest symbols exported by the log and Prometheus sinks
+TOP_SYMBOLS = 10
+
+
+class StageTimer:
+    """A stage measured by Metrics.stage - set rows to the number of rows the stage handled."""
+
+    def __init__(self) -> None:
+        self.rows = 0
+
+
+class Metrics:
+    """Collects the pipeline metrics, see the module docs."""
+
+    def __init__(self, sinks: list | None = None) -> None:
+        """input: sinks - where flush sends the metrics, anything with an emit(metrics) method."""
+        self.sinks = list(sinks) if sinks else []
+        # stage: [seconds, rows]
+        self.stages: dict[str, list] = {}
+        self.rejected: Counter = Counter()
+        # symbol: [seconds, clients]
+        self.symbols: dict[str, list] = {}
+        self.rounding_calls = 0
+        self.rounding_iterations = 0
+
+    def add_stage(self, name: str, seconds: float, rows: int) -> None:
+        """Adds the wall time and rows of a stage run."""
+        stage = self.stages.get(name)
+        if stage is None:
+            self.stages[name] = [seconds, rows]
+        else:
+            stage[0] += seconds
+            stage[1] += rows
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StageTimer]:
+        """Times the code inside the with block as a stage, yields a StageTimer to set the rows on."""
+        timer = StageTimer()
+        start = time.perf_counter()
+        try:
+            yield timer
+        finally:
+            self.add_stage(name, time.perf_counter() - start, timer.rows)
+
+    def reject(self, reason: str) -> None:
+        """Counts a rejected row."""
+        self.rejected[reason] += 1
+
+    def add_symbol(self, symbol: str, seconds: float, clients: int) -> None:
+        """Adds the distribution time of a symbol."""
+        timing = self.symbols.get(symbol)
+        if timing is None:
+            self.symbols[symbol] = [seconds, clients]
+        else:
+            timing[0] += seconds
+            timing[1] = clients
+
+    def add_rounding(self, iterations: int) -> None:
+        """Counts a rounding_chunks call and its redistribution loop iterations."""
+        self.rounding_calls += 1
+        self.rounding_iterations += iterations
+
+    def slowest_symbols(self, count: int = TOP_SYMBOLS) -> list[tuple[str, float, int]]:
+        """returns the (symbol, seconds, clients) of the symbols that took longest to distribute, slowest first."""
+        slowest = sorted(self.symbols.items(), key=lambda item: item[1][0], reverse=True)[:count]
+        return [(symbol, seconds, clients) for symbol, (seconds, clients) in slowest]
+
+    def snapshot(self, top_symbols: int | None = None) -> dict:
+        """returns the metrics as plain dictionaries (JSON friendly).
+        input: top_symbols - keep only the slowest symbols, None keeps all of them.
+        """
+        symbols = self.slowest_symbols(len(self.symbols) if top_symbols is None else top_symbols)
+        return {
+            'stages': {name: {'seconds': seconds, 'rows': rows, 'rows_per_second': rows / seconds if seconds else 0.0}
+                       for name, (seconds, rows) in self.stages.items()},
+            'rejected': dict(self.rejected),
+            'rounding_chunks': {'calls': self.rounding_calls, 'iterations': self.rounding_iterations},
+            'symbols': {symbol: {'seconds': seconds, 'clients': clients} for symbol, seconds, clients in symbols},
+        }
+
+    def flush(self) -> None:
+        """Sends the metrics to every sink."""
+        for sink in self.sinks:
+            sink.emit(self)
+
+    def reset(self) -> None:
+        """Forgets everything collected so far (the sinks are kept)."""
+        self.__init__(self.sinks)
+
+
+class LogSink:
+    """Logs a summary - the stages, rejected rows, rounding counts and the slowest symbols."""
+
+    def __init__(self, logger: logging.Logger | None = None, level: int = logging.INFO,
+                 top_symbols: int = TOP_SYMBOLS) -> None:
+        self.logger = logger or logging.getLogger('locates')
+        self.level = level
+        self.top_symbols = top_symbols
+
+    def emit(self, metrics: Metrics) -> None:
+        snapshot = metrics.snapshot(self.top_symbols)
+        for name, stage in snapshot['stages'].items():
+            self.logger.log(self.level, "stage %s: %.4fs, %d rows, %.0f rows/s",
+                            name, stage['seconds'], stage['rows'], stage['rows_per_second'])
+        if snapshot['rejected']:
+            self.logger.log(self.level, "rejected rows: %s",
+                            ', '.join(f"{reason}={count}" for reason, count in snapshot['rejected'].items()))
+        self.logger.log(self.level, "rounding_chunks: %d calls, %d iterations",
+                        metrics.rounding_calls, metrics.rounding_iterations)
+        for symbol, timing in snapshot['symbols'].items():
+            self.logger.log(self.level, "slow symbol %s: %.4fs, %d clients", symbol, timing['seconds'], timing['clients'])
+
+
+class JsonSink:
+    """Writes Metrics.snapshot as JSON, to a file path (replaced on every emit) or an open text stream."""
+
+    def __init__(self, target: str | TextIO, top_symbols: int | None = None) -> None:
+        self.target = target
+        self.top_symbols = top_symbols
+
+    def emit(self, metrics: Metrics) -> None:
+        text = json.dumps(metrics.snapshot(self.top_symbols), indent=2)
+        if isinstance(self.target, str):
+            write_replacing(self.target, text + '\n')
+        else:
+            self.target.write(text + '\n')
+
+
+class PrometheusSink:
+    """Writes the metrics in the Prometheus text format (see render_prometheus), to a file path
+    (replaced on every emit, as the textfile collector expects) or an open text stream."""
+
+    def __init__(self, target: str | TextIO, prefix: str = 'locates', top_symbols: int = TOP_SYMBOLS) -> None:
+        self.target = target
+        self.prefix = prefix
+        self.top_symbols = top_symbols
+
+    def emit(self, metrics: Metrics) -> None:
+        text = render_prometheus(metrics, self.prefix, self.top_symbols)
+        if isinstance(self.target, str):
+            write_replacing(self.target, text)
+        else:
+            self.target.write(text)
+
+
+def escape_label(value: str) -> str:
+    """returns a Prometheus label value with backslashes, quotes and new lines escaped."""
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_prometheus(metrics: Metrics, prefix: str = 'locates', top_symbols: int = TOP_SYMBOLS) -> str:
+    """returns the metrics in the Prometheus text exposition format.
+    only the top_symbols slowest symbols are exported - a series per symbol of the whole book is too much.
+    """
+    lines = []
+
+    def family(name: str, kind: str, help_text: str, samples: list[tuple[str, float]]) -> None:
+        """Adds a metric family - samples are (labels, value), labels already formatted."""
+        lines.append(f"# HELP {prefix}_{name} {help_text}")
+        lines.append(f"# TYPE {prefix}_{name} {kind}")
+        for labels, value in samples:
+            lines.append(f"{prefix}_{name}{labels} {value}")
+
+    snapshot = metrics.snapshot(top_symbols)
+    stages = snapshot['stages']
+    family('stage_seconds', 'gauge', "Wall time of a pipeline stage.",
+           [(f'{{stage="{escape_label(name)}"}}', stage['seconds']) for name, stage in stages.items()])
+    family('stage_rows', 'gauge', "Rows handled by a pipeline stage.",
+           [(f'{{stage="{escape_label(name)}"}}', stage['rows']) for name, stage in stages.items()])
+    family('stage_rows_per_second', 'gauge', "Rows per second of a pipeline stage.",
+           [(f'{{stage="{escape_label(name)}"}}', stage['rows_per_second']) for name, stage in stages.items()])
+    family('rejected_rows_total', 'counter', "Request rows rejected by the parser, by reason.",
+           [(f'{{reason="{escape_label(reason)}"}}', count) for reason, count in snapshot['rejected'].items()])
+    family('rounding_chunks_calls_total', 'counter', "Calls of rounding_chunks.", [('', metrics.rounding_calls)])
+    family('rounding_chunks_iterations_total', 'counter', "Iterations of the rounding_chunks redistribution loop.",
+           [('', metrics.rounding_iterations)])
+    family('symbol_distribute_seconds', 'gauge', "Distribution time of the slowest symbols.",
+           [(f'{{symbol="{escape_label(symbol)}"}}', timing['seconds']) for symbol, timing in snapshot['symbols'].items()])
+    family('symbol_clients', 'gauge', "Clients of the slowest symbols.",
+           [(f'{{symbol="{escape_label(symbol)}"}}', timing['clients']) for symbol, timing in snapshot['symbols'].items()])
+    return '\n'.join(lines) + '\n'
+
+
+def write_replacing(file_path: str, text: str) -> None:
+    """Writes a file through a temporary file and a rename - readers never see half of it."""
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, file_path)
@@ -0,0 +1,90 @@
+"""Process pool distribution of locates, sharded by symbol.
+
+Every symbol is distributed independently, so the approved symbols are split into shards balanced
+by their number of clients (a few symbols carry most of the rows) and each shard is distributed
+in its own process. Workers only get a compact per symbol form of their shard, never the whole
+clients_requests dictionary, and send back the distributed values only.
+"""
+import heapq
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Iterator
+
+from locates_task import distribute_symbol
+
+# shards per worker when streaming - smaller shards come back sooner
+STREAM_SHARDS_PER_WORKER = 4
+
+# (symbol, total approved, round lot size, clients, percentages, requested) - clients in the percentages order
+SymbolRequests = tuple[str, int, int | None, tuple[str, ...], tuple[float, ...], tuple[int, ...]]
+
+
+def make_shards(clients_requests: dict[str, dict[str, int]], approved_locates: dict[str, int],
+                req_by_symbol_clients_percentage: dict[str, dict[str, float]], chunk_pr_symbol: dict[str, int],
+                shards: int) -> list[list[SymbolRequests]]:
+    """Splits the approved symbols into shards with about the same number of clients.
+    biggest symbols first, each one goes to the shard with the least clients so far.
+    input: the distribute_locates inputs and the number of shards.
+    returns a list of shards - lists of the compact symbol requests, empty shards are dropped.
+    """
+    symbols = sorted(approved_locates, key=lambda symbol: len(req_by_symbol_clients_percentage[symbol]), reverse=True)
+    # (clients so far, shard index)
+    loads = [(0, i) for i in range(shards)]
+    result: list[list[SymbolRequests]] = [[] for _ in range(shards)]
+    for symbol in symbols:
+        clients_percentage = req_by_symbol_clients_percentage[symbol]
+        clients = tuple(clients_percentage)
+        load, i = heapq.heappop(loads)
+        result[i].append((symbol, approved_locates[symbol], chunk_pr_symbol.get(symbol), clients,
+                          tuple(clients_percentage.values()),
+                          tuple(clients_requests[client][symbol] for client in clients)))
+        heapq.heappush(loads, (load + len(clients), i))
+    return [shard for shard in result if shard]
+
+
+def distribute_shard(shard: list[SymbolRequests]) -> list[tuple[str, list[int]]]:
+    """Distributes every symbol of a shard - runs in a worker process.
+    returns a list of (symbol, distributed locates) with the values in the symbol's clients order.
+    """
+    result = []
+    for symbol, total, round_lot_size, clients, percentages, requested in shard:
+        distributed = distribute_symbol(dict(zip(clients, percentages)), dict(zip(clients, requested)),
+                                        total, round_lot_size)
+        result.append((symbol, list(distributed.values())))
+    return result
+
+
+def distribute_locates_parallel(clients_requests: dict[str, dict[str, int]], approved_locates: dict[str, int],
+                                req_by_symbol_clients_percentage: dict[str, dict[str, float]],
+                                chunk_pr_symbol: dict[str, int], workers: int) -> dict[str, dict[str, int]]:
+    """Same as locates_task.distribute_locates, with the symbols distributed by a pool of worker processes.
+    input: the distribute_locates inputs and the number of worker processes.
+    returns a dictionary of distributed locates: {client_name: {symbol: num_of_locates_distributed}}
+    """
+    shards = make_shards(clients_requests, approved_locates, req_by_symbol_clients_percentage, chunk_pr_symbol, workers)
+    by_symbol: dict[str, list[int]] = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for shard_result in executor.map(distribute_shard, shards):
+            by_symbol.update(shard_result)
+
+    # merge in the approved order so the output is the same as the single process one
+    distributed_locates: dict[str, dict[str, int]] = {client: {} for client in clients_requests.keys()}
+    for symbol in approved_locates:
+        for client, value in zip(req_by_symbol_clients_percentage[symbol], by_symbol[symbol]):
+            distributed_locates[client][symbol] = value
+    return distributed_locates
+
+
+def iter_distribute_parallel(clients_requests: dict[str, dict[str, int]], approved_locates: dict[str, int],
+                             req_by_symbol_clients_percentage: dict[str, dict[str, float]],
+                             chunk_pr_symbol: dict[str, int], workers: int) -> Iterator[tuple[str, dict[str, int]]]:
+    """Same as locates_task.iter_distribute_locates with a pool of worker processes.
+    the symbols are split into a few shards per worker and every shard is yielded as soon as it is done.
+    yields (symbol, {client_name: num_of_locates_distributed}) in the order the shards finish.
+    """
+    shards = make_shards(clients_requests, approved_locates, req_by_symbol_clients_percentage, chunk_pr_symbol,
+                         workers * STREAM_SHARDS_PER_WORKER)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(distribute_shard, shard) for shard in shards]
+        for future in as_completed(futures):
+            for symbol, values in future.result():
+                yield symbol, dict(zip(req_by_symbol_clients_percentage[symbol], values))
@@ -0,0 +1,160 @@
+"""What-if distribution of many approval scenarios at once.
+
+previewing allocations under a few hundred approval vectors (50%, 75%, capped at the broker's 1000, ...)
+used to be a distribute_locates call per scenario - every one rebuilding the clients dictionaries and
+walking every client again. ScenarioBook builds the per symbol structures once (clients, percentages and
+requests as lists, for the allocation kernel) and goes over the scenarios symbol by symbol:
+- scenarios that approve a symbol the same amount share the distribution (and its dictionary).
+- approving everything needs no kernel call at all.
+- statistics only sums the allocations per client - no nested results are built.
+
+    book = ScenarioBook.from_csv(csv_path)
+    scenarios = portion_scenarios(book.aggregate_symbols, [0.5, 0.75]) | {'capped': capped_scenario(book.aggregate_symbols, 1000)}
+    results = book.evaluate(scenarios)        # {scenario: client major results, same as distribute_locates}
+    stats = book.statistics(scenarios)        # {scenario: {'allocated', 'fill_rate', 'clients': {client: fill_rate}, ...}}
+"""
+from typing import Iterator
+
+from locates_by_symbol import ClientLocates
+from locates_kernel import distribute_proportional
+from locates_task import csv_parser_streaming
+
+
+def portion_scenarios(aggregate_symbols: dict[str, int], portions: list[float]) -> dict[str, dict[str, int]]:
+    """returns a scenario per portion of the aggregate requests - {'50%': {symbol: int(total * 0.5)}, ...}."""
+    return {f"{portion:.0%}": {symbol: int(total * portion) for symbol, total in aggregate_symbols.items()}
+            for portion in portions}
+
+
+def capped_scenario(aggregate_symbols: dict[str, int], cap: int) -> dict[str, int]:
+    """returns the approvals of a broker capping every symbol at cap (as SimulatedBroker's approve_cap)."""
+    return {symbol: min(total, cap) for symbol, total in aggregate_symbols.items()}
+
+
+class ScenarioBook:
+    """A request book prepared for distributing many approval scenarios, see the module docs."""
+
+    def __init__(self, clients_requests: dict[str, dict[str, int]], aggregate_symbols: dict[str, int],
+                 req_by_symbol_clients_percentage: dict[str, dict[str, float]], chunk_pr_symbol: dict[str, int]) -> None:
+        """input: the csv_parser output - ScenarioBook(*csv_parser(file_path))."""
+        self.clients_requests = clients_requests
+        self.aggregate_symbols = aggregate_symbols
+        self.chunk_pr_symbol = chunk_pr_symbol
+        client_ids = {client: i for i, client in enumerate(clients_requests)}
+        # symbol: (clients, client ids, percentages, requests) - in the percentages order, as distribute_symbol
+        self.symbols: dict[str, tuple[tuple[str, ...], list[int], list[float], list[int]]] = {}
+        for symbol, clients_percentage in req_by_symbol_clients_percentage.items():
+            clients = tuple(clients_percentage)
+            requested = [clients_requests[client][symbol] for client in clients]
+            self.symbols[symbol] = (clients, [client_ids[client] for client in clients],
+                                    list(clients_percentage.values()), requested)
+        # every client's total request
+        self.client_requested = [sum(symbols.values()) for symbols in clients_requests.values()]
+
+    @classmethod
+    def from_csv(cls, file_path: str) -> 'ScenarioBook':
+        """Parses a request book (csv_parser_streaming) into a ScenarioBook."""
+        return cls(*csv_parser_streaming(file_path))
+
+    def iter_symbols(self, scenarios: dict[str, dict[str, int]]) -> Iterator[tuple[str, list[tuple[int, int, list[int]]]]]:
+        """Distributes the scenarios symbol by symbol.
+        input: scenarios - {scenario: {symbol: num_of_locates_approved}}
+        yields (symbol, [(scenario index, num_of_locates_approved, distributed values in the symbol's clients order)])
+        for every symbol some scenario approves - scenarios with the same approved amount share the values list.
+        raises ValueError on approved symbols nobody requested.
+        """
+        approvals = list(scenarios.values())
+        unknown = {symbol for approved_locates in approvals for symbol in approved_locates} - self.symbols.keys()
+        if unknown:
+            raise ValueError(f"approved symbols without requests: {', '.join(sorted(unknown)[:10])}")
+
+        for symbol, (_, _, percentages, requested) in self.symbols.items():
+            total_requested = self.aggregate_symbols[symbol]
+            # num_of_locates_approved: distributed values
+            distributions: dict[int, list[int]] = {}
+            symbol_results = []
+            for k, approved_locates in enumerate(approvals):
+                total = approved_locates.get(symbol)
+                if total is None:
+                    continue
+                values = distributions.get(total)
+                if values is None:
+                    if total >= total_requested:
+                        # everybody gets the request, no rounding - the same as distribute_symbol
+                        # (the aggregate counts duplicate rows too, so the percentages add up to 1 at most)
+                        values = requested
+                    else:
+                        values, _ = distribute_proportional(percentages, requested, total,
+                                                            self.chunk_pr_symbol.get(symbol))
+                    distributions[total] = values
+                symbol_results.append((k, total, values))
+            if symbol_results:
+                yield symbol, symbol_results
+
+    def evaluate(self, scenarios: dict[str, dict[str, int]]) -> dict[str, ClientLocates]:
+        """Distributes every scenario.
+        input: scenarios - {scenario: {symbol: num_of_locates_approved}}
+        returns {scenario: ClientLocates} - each the same as distribute_locates on the scenario's approvals
+        (client major on first use, .distributed_by_symbol is the symbol major form). scenarios with the same
+        approved amount of a symbol share its dictionary - treat the results as read only.
+        """
+        names = list(scenarios)
+        by_symbol: list[dict[str, dict[str, int]]] = [{} for _ in names]
+        for symbol, symbol_results in self.iter_symbols(scenarios):
+            clients = self.symbols[symbol][0]
+            shared: dict[int, dict[str, int]] = {}
+            for k, _, values in symbol_results:
+                distributed = shared.get(id(values))
+                if distributed is None:
+                    distributed = shared[id(values)] = dict(zip(clients, values))
+                by_symbol[k][symbol] = distributed
+
+        results = {}
+        for k, (name, approved_locates) in enumerate(scenarios.items()):
+            # the approved order - every client's symbols come out in it, like distribute_locates
+            distributed_by_symbol = {symbol: by_symbol[k][symbol] for symbol in approved_locates}
+            results[name] = ClientLocates(distributed_by_symbol, self.clients_requests)
+        return results
+
+    def statistics(self, scenarios: dict[str, dict[str, int]], per_client: bool = True) -> dict[str, dict]:
+        """Distributes every scenario and keeps only the totals.
+        input: scenarios - {scenario: {symbol: num_of_locates_approved}}
+               per_client - the clients fill rates too, False skips summing every client (much faster).
+        returns {scenario: {'approved': locates approved for requested symbols (up to the request),
+                            'allocated': locates allocated, 'requested': all the requests of the book,
+                            'fill_rate': allocated / requested,
+                            'clients': {client_name: the client's allocated / requested} (if per_client)}}
+        """
+        client_allocated = [[0] * len(self.client_requested) for _ in scenarios] if per_client else []
+        allocated_totals = [0] * len(scenarios)
+        approved = [0] * len(scenarios)
+        for symbol, symbol_results in self.iter_symbols(scenarios):
+            client_ids = self.symbols[symbol][1]
+            total_requested = self.aggregate_symbols[symbol]
+            # values list id: its sum - shared by the scenarios with the same approved amount
+            sums: dict[int, int] = {}
+            for k, total, values in symbol_results:
+                if per_client:
+                    allocated = client_allocated[k]
+                    for client_id, value in zip(client_ids, values):
+                        allocated[client_id] += value
+                values_sum = sums.get(id(values))
+                if values_sum is None:
+                    values_sum = sums[id(values)] = sum(values)
+                allocated_totals[k] += values_sum
+                approved[k] += min(total, total_requested)
+
+        requested = sum(self.client_requested)
+        results = {}
+        for k, name in enumerate(scenarios):
+            results[name] = {
+                'approved': approved[k],
+                'allocated': allocated_totals[k],
+                'requested': requested,
+                'fill_rate': allocated_totals[k] / requested if requested else 0.0,
+            }
+            if per_client:
+                results[name]['clients'] = {client: value / client_requested if client_requested else 0.0
+                                            for client, value, client_requested in
+                                            zip(self.clients_requests, client_allocated[k], self.client_requested)}
+        return results
@@ -0,0 +1,274 @@
+"""Local allocation service - a request book loaded once, allocations over HTTP.
+
+every approval round used to be a new process - interpreter start, imports and a full parse of the book.
+the service parses the book once and keeps it in a LocatesAllocator, so an approval only recomputes the
+approved symbols. stdlib only (http.server), JSON in and out, on a TCP port or a Unix socket:
+
+    python locates_service.py requests.csv --port 8080
+    python locates_service.py requests.csv --socket /tmp/locates.sock
+
+endpoints:
+- GET  /health                   {"clients": n, "symbols": n, "approved": n}
+- GET  /allocations              {client_name: {symbol: n}} - ?client=... or ?symbol=... for a single one
+- GET  /changes                  cells changed since the last call (LocatesAllocator.changes)
+- POST /approvals                {symbol: num_of_locates_approved} - returns the approved symbols allocations,
+                                 the changed cells and the symbols without requests (skipped)
+- POST /requests                 {client_name, symbol, number_of_locates_requested, round_lot_size} - adds
+                                 (or replaces) a client request, round_lot_size is only needed for a new symbol
+- POST /requests/cancel          {client_name, symbol} - cancels a client request
+the request endpoints return the changed cells as well. cells are
+{"client_name", "symbol", "number_of_locates_allocated"} objects, a cancelled request's cell is 0.
+"""
+import argparse
+import json
+import os
+import socketserver
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from locates_allocator import LocatesAllocator
+from locates_task import RESULTS_FIELDNAMES, csv_parser_streaming
+
+# biggest request body accepted
+MAX_BODY_BYTES = 64 << 20
+
+
+class ServiceError(Exception):
+    """A request the service can't handle - sent back with its HTTP status."""
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+def changed_cells(changed: dict[tuple[str, str], int]) -> list[dict[str, str | int]]:
+    """returns changed cells in the JSON form - a list of {client_name, symbol, number_of_locates_allocated}."""
+    return [dict(zip(RESULTS_FIELDNAMES, (client, symbol, value))) for (client, symbol), value in changed.items()]
+
+
+class LocatesService:
+    """The service state and operations, without the HTTP part - a LocatesAllocator behind a lock."""
+
+    def __init__(self, allocator: LocatesAllocator) -> None:
+        self.allocator = allocator
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_csv(cls, file_path: str) -> 'LocatesService':
+        """Loads a request book (csv_parser_streaming) into a new service."""
+        clients_requests, aggregate_symbols, req_by_symbol_clients_percentage, chunk_pr_symbol = csv_parser_streaming(file_path)
+        return cls(LocatesAllocator(clients_requests, req_by_symbol_clients_percentage, chunk_pr_symbol, aggregate_symbols))
+
+    def health(self) -> dict[str, int]:
+        with self.lock:
+            return {'clients': len(self.allocator.clients_requests), 'symbols': len(self.allocator.aggregate_symbols),
+                    'approved': len(self.allocator.approved_locates)}
+
+    def allocations(self, client: str | None = None, symbol: str | None = None) -> dict:
+        """returns {client_name: {symbol: n}}, a single client's {symbol: n} or a single symbol's {client_name: n}."""
+        with self.lock:
+            allocations = self.allocator.allocations
+            if client is not None:
+                if client not in allocations:
+                    raise ServiceError(404, f"unknown client: {client}")
+                return dict(allocations[client])
+            if symbol is not None:
+                if symbol not in self.allocator.aggregate_symbols:
+                    raise ServiceError(404, f"unknown symbol: {symbol}")
+                return {client: symbols[symbol] for client, symbols in allocations.items() if symbol in symbols}
+            return {client: dict(symbols) for client, symbols in allocations.items()}
+
+    def changes(self) -> list[dict[str, str | int]]:
+        with self.lock:
+            return changed_cells(self.allocator.changes())
+
+    def approve(self, approved_locates: dict) -> dict:
+        """Approves symbols - {symbol: num_of_locates_approved}.
+        returns {'allocations': {symbol: {client_name: n}}, 'changed': [cells], 'skipped': [symbols without requests]}
+        """
+        if not isinstance(approved_locates, dict):
+            raise ServiceError(400, "approvals should be an object of symbol: number")
+        for symbol, approved in approved_locates.items():
+            if not isinstance(approved, int) or isinstance(approved, bool) or approved < 0:
+                raise ServiceError(400, f"invalid number of approved locates for {symbol}: {approved}")
+
+        with self.lock:
+            changed: dict[tuple[str, str], int] = {}
+            allocations: dict[str, dict[str, int]] = {}
+            skipped = []
+            for symbol, approved in approved_locates.items():
+                if symbol not in self.allocator.aggregate_symbols:
+                    skipped.append(symbol)
+                    continue
+                changed.update(self.allocator.update(symbol, approved))
+                allocations[symbol] = {client: self.allocator.allocations[client][symbol]
+                                       for client in self.allocator.req_by_symbol_clients_percentage[symbol]}
+            return {'allocations': allocations, 'changed': changed_cells(changed), 'skipped': skipped}
+
+    def add_request(self, request: dict) -> dict:
+        """Adds a client request - {client_name, symbol, number_of_locates_requested, round_lot_size (optional)}.
+        returns {'changed': [cells]}
+        """
+        client, symbol = self._request_key(request)
+        num_of_locates_req = request.get('number_of_locates_requested')
+        round_lot_size = request.get('round_lot_size')
+        for name, value in (('number_of_locates_requested', num_of_locates_req), ('round_lot_size', round_lot_size)):
+            if value is not None and (not isinstance(value, int) or isinstance(value, bool)):
+                raise ServiceError(400, f"{name} should be an integer")
+        with self.lock:
+            try:
+                changed = self.allocator.add_request(client, symbol, num_of_locates_req, round_lot_size)
+            except ValueError as e:
+                raise ServiceError(400, f"invalid request: {e}")
+            return {'changed': changed_cells(changed)}
+
+    def cancel_request(self, request: dict) -> dict:
+        """Cancels a client request - {client_name, symbol}.
+        returns {'changed': [cells]}
+        """
+        client, symbol = self._request_key(request)
+        with self.lock:
+            try:
+                changed = self.allocator.cancel_request(client, symbol)
+            except KeyError:
+                raise ServiceError(404, f"{client} has no request for {symbol}")
+            return {'changed': changed_cells(changed)}
+
+    def _request_key(self, request: dict) -> tuple[str, str]:
+        """returns the (client_name, symbol) of a request payload."""
+        if not isinstance(request, dict):
+            raise ServiceError(400, "the request should be a JSON object")
+        client, symbol = request.get('client_name'), request.get('symbol')
+        if not isinstance(client, str) or not isinstance(symbol, str):
+            raise ServiceError(400, "client_name and symbol should be strings")
+        return client, symbol
+
+
+class LocatesHandler(BaseHTTPRequestHandler):
+    """JSON over HTTP for a LocatesService - the server has it as server.service."""
+
+    server_version = 'locates/1'
+    # keep the connection for the next round
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        routes = {
+            '/health': lambda: self.server.service.health(),
+            '/allocations': lambda: self.server.service.allocations(query.get('client'), query.get('symbol')),
+            '/changes': lambda: self.server.service.changes(),
+        }
+        self._handle(routes.get(url.path))
+
+    def do_POST(self) -> None:
+        routes = {
+            '/approvals': self.server.service.approve,
+            '/requests': self.server.service.add_request,
+            '/requests/cancel': self.server.service.cancel_request,
+        }
+        route = routes.get(urlsplit(self.path).path)
+        self._handle(route and (lambda: route(self._read_json())))
+
+    def _read_json(self) -> object:
+        """returns the JSON body of the request."""
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+        # a negative length would read until the client closes the connection
+        if length < 0:
+            raise ServiceError(400, "invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise ServiceError(413, "request body too large")
+        try:
+            return json.loads(self.rfile.read(length) or b'null')
+        except ValueError:
+            raise ServiceError(400, "invalid JSON body")
+
+    def _handle(self, route) -> None:
+        """Runs a route and sends its result (or error) as JSON."""
+        if route is None:
+            status, body = 404, {'error': f"no such endpoint: {self.command} {self.path}"}
+        else:
+            try:
+                status, body = 200, route()
+            except ServiceError as e:
+                status, body = e.status, {'error': str(e)}
+        if status != 200:
+            # the body might not be read - don't reuse the connection
+            self.close_connection = True
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def address_string(self) -> str:
+        # Unix socket clients have no address
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def log_message(self, format: str, *args) -> None:
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class LocatesHTTPServer(ThreadingHTTPServer):
+    """HTTP server of a LocatesService on a TCP port."""
+    daemon_threads = True
+
+    def __init__(self, service: LocatesService, host: str = '127.0.0.1', port: int = 0, verbose: bool = False) -> None:
+        self.service = service
+        self.verbose = verbose
+        super().__init__((host, port), LocatesHandler)
+
+
+class LocatesUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """HTTP server of a LocatesService on a Unix socket."""
+    daemon_threads = True
+
+    def __init__(self, service: LocatesService, socket_path: str, verbose: bool = False) -> None:
+        self.service = service
+        self.verbose = verbose
+        # a socket left over by a previous run
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        super().__init__(socket_path, LocatesHandler)
+
+    def server_close(self) -> None:
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('input', help="requests CSV file")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--socket', help="serve on this Unix socket instead of a TCP port")
+    parser.add_argument('--verbose', action='store_true', help="log every request")
+    args = parser.parse_args(argv)
+
+    service = LocatesService.from_csv(args.input)
+    if args.socket:
+        server = LocatesUnixServer(service, args.socket, args.verbose)
+        where = args.socket
+    else:
+        server = LocatesHTTPServer(service, args.host, args.port, args.verbose)
+        where = f"http://{server.server_address[0]}:{server.server_address[1]}"
+    print(f"locates service on {where} - {service.health()}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
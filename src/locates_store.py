@@ -0,0 +1,390 @@
+"""Compact, interned store of locate requests.
+
+csv_parser keeps the same (client, symbol, requested) facts in a few nested dictionaries with a boxed
+float percentage per entry. The store interns client and symbol names to integer ids and keeps the
+quantities in typed arrays, grouped by symbol with per symbol offset ranges (and a client index on top).
+Percentages are not stored - they are computed on access, the same way csv_parser computes them.
+single lookups (clients_requests[client][symbol]) go through sorted id arrays with bisect - O(log n).
+
+as_parsed() gives read only mapping views with the csv_parser return contract, so the store can be
+passed to distribute_locates and friends as is.
+"""
+import sys
+from array import array
+from bisect import bisect_left
+from collections.abc import ItemsView, Iterator, Mapping, ValuesView
+
+from locates_task import STREAM_CHUNK_SIZE, stream_requests
+
+# typecodes - ids and offsets fit in 32 bits, quantities get 64 bits
+ID_TYPE = 'i'
+QUANTITY_TYPE = 'q'
+
+
+class RequestStore:
+    """Requests interned to integer ids, quantities in typed arrays.
+    rows are grouped by symbol (symbols and their clients in the order they first appear), rows of symbol i are
+    in the range symbol_offsets[i]:symbol_offsets[i + 1]. client_rows lists the rows of every client in the same
+    way with client_offsets, in the order the client's requests appear.
+    for lookups every range is also kept sorted by id - client_lookup_symbols (with client_lookup_rows) is
+    client_rows sorted by symbol id, symbol_lookup_clients (with symbol_lookup_rows) a symbol's rows sorted by
+    client id.
+    build it with from_csv or from_parsed.
+    """
+
+    def __init__(self) -> None:
+        self.clients: list[str] = []
+        self.client_ids: dict[str, int] = {}
+        self.symbols: list[str] = []
+        self.symbol_ids: dict[str, int] = {}
+        # per symbol
+        self.aggregate = array(QUANTITY_TYPE)
+        self.round_lot = array(QUANTITY_TYPE)
+        self.symbol_offsets = array(ID_TYPE, [0])
+        # per row
+        self.row_client = array(ID_TYPE)
+        self.row_symbol = array(ID_TYPE)
+        self.row_requested = array(QUANTITY_TYPE)
+        # client index
+        self.client_offsets = array(ID_TYPE, [0])
+        self.client_rows = array(ID_TYPE)
+        # lookup index - the ranges above sorted by id
+        self.client_lookup_symbols = array(ID_TYPE)
+        self.client_lookup_rows = array(ID_TYPE)
+        self.symbol_lookup_clients = array(ID_TYPE)
+        self.symbol_lookup_rows = array(ID_TYPE)
+
+    @classmethod
+    def from_csv(cls, file_path: str, chunk_size: int = STREAM_CHUNK_SIZE) -> 'RequestStore':
+        """Builds the store straight from a CSV file, without the csv_parser dictionaries.
+        validation and exceptions are the same as csv_parser.
+        input: path to the CSV file, number of characters to read at once.
+        returns the store.
+        """
+        store = cls()
+        client_ids, symbol_ids = store.client_ids, store.symbol_ids
+        # rows in the file order
+        arrival_client = array(ID_TYPE)
+        arrival_symbol = array(ID_TYPE)
+        arrival_requested = array(QUANTITY_TYPE)
+
+        def add_request(client: str, symbol: str, num_of_locates_req: int, round_size: int) -> None:
+            """Interns a single valid request."""
+            client_id = client_ids.get(client)
+            if client_id is None:
+                client_id = client_ids[client] = len(store.clients)
+                store.clients.append(client)
+            symbol_id = symbol_ids.get(symbol)
+            if symbol_id is None:
+                symbol_id = symbol_ids[symbol] = len(store.symbols)
+                store.symbols.append(symbol)
+                # track chunk sizes - only the first one matters
+                store.round_lot.append(round_size)
+                store.aggregate.append(0)
+            store.aggregate[symbol_id] += num_of_locates_req
+            arrival_client.append(client_id)
+            arrival_symbol.append(symbol_id)
+            arrival_requested.append(num_of_locates_req)
+
+        stream_requests(file_path, add_request, chunk_size)
+
+        # group the rows by symbol - a stable counting sort
+        counts = array(ID_TYPE, bytes(len(store.symbols) * arrival_symbol.itemsize))
+        for symbol_id in arrival_symbol:
+            counts[symbol_id] += 1
+        starts = array(ID_TYPE, [0])
+        for count in counts:
+            starts.append(starts[-1] + count)
+        grouped = array(ID_TYPE, bytes(len(arrival_symbol) * arrival_symbol.itemsize))
+        for arrival, symbol_id in enumerate(arrival_symbol):
+            grouped[starts[symbol_id]] = arrival
+            starts[symbol_id] += 1
+
+        # a client might request a symbol twice - like csv_parser the last amount wins (at the first one's place)
+        first_arrival = array(ID_TYPE)
+        start = 0
+        for count in counts:
+            rows: dict[int, int] = {}
+            for arrival in grouped[start:start + count]:
+                client_id = arrival_client[arrival]
+                row = rows.get(client_id)
+                if row is None:
+                    rows[client_id] = len(store.row_client)
+                    store.row_client.append(client_id)
+                    store.row_symbol.append(arrival_symbol[arrival])
+                    store.row_requested.append(arrival_requested[arrival])
+                    first_arrival.append(arrival)
+                else:
+                    store.row_requested[row] = arrival_requested[arrival]
+            store.symbol_offsets.append(len(store.row_client))
+            start += count
+
+        # rows of each client in the file order
+        by_arrival = array(ID_TYPE, [-1]) * len(arrival_symbol)
+        for row, arrival in enumerate(first_arrival):
+            by_arrival[arrival] = row
+        store._index_clients(row for row in by_arrival if row != -1)
+        return store
+
+    @classmethod
+    def from_parsed(cls, clients_requests: dict[str, dict[str, int]], aggregate_symbols: dict[str, int],
+                    req_by_symbol_clients_percentage: dict[str, dict[str, float]],
+                    chunk_pr_symbol: dict[str, int]) -> 'RequestStore':
+        """Builds the store from the csv_parser output (the percentages only give the order of the rows).
+        returns the store.
+        """
+        store = cls()
+        store.clients = list(clients_requests)
+        store.client_ids = {client: i for i, client in enumerate(store.clients)}
+        store.symbols = list(req_by_symbol_clients_percentage)
+        store.symbol_ids = {symbol: i for i, symbol in enumerate(store.symbols)}
+        rows: dict[tuple[int, int], int] = {}
+        for symbol_id, (symbol, clients_percentage) in enumerate(req_by_symbol_clients_percentage.items()):
+            store.aggregate.append(aggregate_symbols[symbol])
+            store.round_lot.append(chunk_pr_symbol[symbol])
+            for client in clients_percentage:
+                client_id = store.client_ids[client]
+                rows[(client_id, symbol_id)] = len(store.row_client)
+                store.row_client.append(client_id)
+                store.row_symbol.append(symbol_id)
+                store.row_requested.append(clients_requests[client][symbol])
+            store.symbol_offsets.append(len(store.row_client))
+        store._index_clients(rows[(store.client_ids[client], store.symbol_ids[symbol])]
+                             for client, symbols in clients_requests.items() for symbol in symbols)
+        return store
+
+    def _index_clients(self, rows: Iterator[int]) -> None:
+        """Builds the client index - a stable counting sort of the given rows by client."""
+        rows = array(ID_TYPE, rows)
+        counts = array(ID_TYPE, bytes(len(self.clients) * rows.itemsize))
+        for row in rows:
+            counts[self.row_client[row]] += 1
+        starts = array(ID_TYPE, [0])
+        for count in counts:
+            starts.append(starts[-1] + count)
+        self.client_offsets = array(ID_TYPE, starts)
+        self.client_rows = array(ID_TYPE, bytes(len(rows) * rows.itemsize))
+        for row in rows:
+            client_id = self.row_client[row]
+            self.client_rows[starts[client_id]] = row
+            starts[client_id] += 1
+        self._index_lookups()
+
+    def _index_lookups(self) -> None:
+        """Builds the lookup index - every client's rows sorted by symbol id, every symbol's rows by client id."""
+        row_client, row_symbol = self.row_client, self.row_symbol
+        self.client_lookup_symbols, self.client_lookup_rows = array(ID_TYPE), array(ID_TYPE)
+        for client_id in range(len(self.clients)):
+            rows = sorted(self.client_rows[self.client_offsets[client_id]:self.client_offsets[client_id + 1]],
+                          key=row_symbol.__getitem__)
+            self.client_lookup_symbols.extend(row_symbol[row] for row in rows)
+            self.client_lookup_rows.extend(rows)
+        self.symbol_lookup_clients, self.symbol_lookup_rows = array(ID_TYPE), array(ID_TYPE)
+        for symbol_id in range(len(self.symbols)):
+            rows = sorted(range(self.symbol_offsets[symbol_id], self.symbol_offsets[symbol_id + 1]),
+                          key=row_client.__getitem__)
+            self.symbol_lookup_clients.extend(row_client[row] for row in rows)
+            self.symbol_lookup_rows.extend(rows)
+
+    def as_parsed(self) -> tuple['ClientsRequestsView', 'SymbolsMappingView', 'SymbolsClientsView', 'SymbolsMappingView']:
+        """returns mapping views with the csv_parser contract:
+        (clients_requests, aggregate_symbols, req_by_symbol_clients_percentage, chunk_pr_symbol)
+        """
+        return (ClientsRequestsView(self), SymbolsMappingView(self, self.aggregate),
+                SymbolsClientsView(self), SymbolsMappingView(self, self.round_lot))
+
+    def to_dicts(self) -> tuple[dict[str, dict[str, int]], dict[str, int], dict[str, dict[str, float]], dict[str, int]]:
+        """returns the csv_parser dictionaries built from the store."""
+        clients_requests, aggregate_symbols, req_by_symbol_clients_percentage, chunk_pr_symbol = self.as_parsed()
+        return ({client: dict(symbols.items()) for client, symbols in clients_requests.items()},
+                dict(aggregate_symbols.items()),
+                {symbol: dict(clients.items()) for symbol, clients in req_by_symbol_clients_percentage.items()},
+                dict(chunk_pr_symbol.items()))
+
+    def memory_usage(self) -> int:
+        """returns the size in bytes of the store - arrays, id dictionaries and the interned names."""
+        size = sum(sys.getsizeof(obj) for obj in (
+            self.clients, self.client_ids, self.symbols, self.symbol_ids, self.aggregate, self.round_lot,
+            self.symbol_offsets, self.row_client, self.row_symbol, self.row_requested, self.client_offsets,
+            self.client_rows, self.client_lookup_symbols, self.client_lookup_rows, self.symbol_lookup_clients,
+            self.symbol_lookup_rows))
+        return size + sum(sys.getsizeof(name) for name in self.clients) + sum(sys.getsizeof(name) for name in self.symbols)
+
+
+def dicts_memory_usage(*structures: object) -> int:
+    """returns the deep size in bytes of nested dictionaries - every object is counted once."""
+    seen: set[int] = set()
+    size = 0
+    stack = list(structures)
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+    return size
+
+
+def memory_report(store: RequestStore) -> dict[str, int]:
+    """Compares the store with the csv_parser dictionaries holding the same requests.
+    returns {'store': bytes, 'dicts': bytes}
+    """
+    return {'store': store.memory_usage(), 'dicts': dicts_memory_usage(*store.to_dicts())}
+
+
+class _ItemsView(ItemsView):
+    """items() of the views - iterates the arrays directly instead of a lookup per key."""
+
+    def __iter__(self) -> Iterator[tuple[str, object]]:
+        return self._mapping._iter_items()
+
+
+class _ValuesView(ValuesView):
+    """values() of the views - iterates the arrays directly instead of a lookup per key."""
+
+    def __iter__(self) -> Iterator[object]:
+        return (value for _, value in self._mapping._iter_items())
+
+
+class _View(Mapping):
+    """Base of the store's read only views."""
+
+    def items(self) -> _ItemsView:
+        return _ItemsView(self)
+
+    def values(self) -> _ValuesView:
+        return _ValuesView(self)
+
+    def _iter_items(self) -> Iterator[tuple[str, object]]:
+        return ((key, self[key]) for key in self)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self.items())})"
+
+
+class SymbolsMappingView(_View):
+    """{symbol: value} over a per symbol array of the store (aggregate or round lot)."""
+
+    def __init__(self, store: RequestStore, values: array) -> None:
+        self._store = store
+        self._values = values
+
+    def __getitem__(self, symbol: str) -> int:
+        return self._values[self._store.symbol_ids[symbol]]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._store.symbols)
+
+    def __len__(self) -> int:
+        return len(self._store.symbols)
+
+    def _iter_items(self) -> Iterator[tuple[str, int]]:
+        return zip(self._store.symbols, self._values)
+
+
+class SymbolClientsView(_View):
+    """{client_name: num_of_locates_requested} of a single symbol, or the percentages of the symbol's total.
+    looking up a single client is a bisect over the symbol's client ids.
+    """
+
+    def __init__(self, store: RequestStore, symbol_id: int, percentages: bool) -> None:
+        self._store = store
+        self._start = store.symbol_offsets[symbol_id]
+        self._end = store.symbol_offsets[symbol_id + 1]
+        self._total = store.aggregate[symbol_id] if percentages else None
+
+    def __getitem__(self, client: str) -> int | float:
+        client_id = self._store.client_ids.get(client)
+        if client_id is not None:
+            lookup_clients = self._store.symbol_lookup_clients
+            i = bisect_left(lookup_clients, client_id, self._start, self._end)
+            if i < self._end and lookup_clients[i] == client_id:
+                requested = self._store.row_requested[self._store.symbol_lookup_rows[i]]
+                return requested if self._total is None else requested / self._total
+        raise KeyError(client)
+
+    def __iter__(self) -> Iterator[str]:
+        clients = self._store.clients
+        return (clients[client_id] for client_id in self._store.row_client[self._start:self._end])
+
+    def __len__(self) -> int:
+        return self._end - self._start
+
+    def _iter_items(self) -> Iterator[tuple[str, int | float]]:
+        requested = self._store.row_requested[self._start:self._end]
+        if self._total is not None:
+            total = self._total
+            requested = (req / total for req in requested)
+        return zip(self, requested)
+
+
+class SymbolsClientsView(_View):
+    """{symbol: {client_name: percentage_of_requests}} - the percentages are computed on access,
+    or {symbol: {client_name: num_of_locates_requested}} without percentages.
+    """
+
+    def __init__(self, store: RequestStore, percentages: bool = True) -> None:
+        self._store = store
+        self._percentages = percentages
+
+    def __getitem__(self, symbol: str) -> SymbolClientsView:
+        return SymbolClientsView(self._store, self._store.symbol_ids[symbol], self._percentages)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._store.symbols)
+
+    def __len__(self) -> int:
+        return len(self._store.symbols)
+
+
+class ClientSymbolsView(_View):
+    """{symbol: num_of_locates_requested} of a single client - looking up a symbol is a bisect over the
+    client's symbol ids."""
+
+    def __init__(self, store: RequestStore, client_id: int) -> None:
+        self._store = store
+        self._start = store.client_offsets[client_id]
+        self._end = store.client_offsets[client_id + 1]
+
+    def __getitem__(self, symbol: str) -> int:
+        symbol_id = self._store.symbol_ids.get(symbol)
+        if symbol_id is not None:
+            lookup_symbols = self._store.client_lookup_symbols
+            i = bisect_left(lookup_symbols, symbol_id, self._start, self._end)
+            if i < self._end and lookup_symbols[i] == symbol_id:
+                return self._store.row_requested[self._store.client_lookup_rows[i]]
+        raise KeyError(symbol)
+
+    def _rows(self) -> array:
+        return self._store.client_rows[self._start:self._end]
+
+    def __iter__(self) -> Iterator[str]:
+        symbols, row_symbol = self._store.symbols, self._store.row_symbol
+        return (symbols[row_symbol[row]] for row in self._rows())
+
+    def __len__(self) -> int:
+        return self._end - self._start
+
+    def _iter_items(self) -> Iterator[tuple[str, int]]:
+        symbols, row_symbol, row_requested = self._store.symbols, self._store.row_symbol, self._store.row_requested
+        return ((symbols[row_symbol[row]], row_requested[row]) for row in self._rows())
+
+
+class ClientsRequestsView(_View):
+    """{client_name: {symbol: num_of_locates_requested}} - a client's view is built on access, nothing is
+    kept besides the store (memory_usage is all of it)."""
+
+    def __init__(self, store: RequestStore) -> None:
+        self._store = store
+
+    def __getitem__(self, client: str) -> ClientSymbolsView:
+        return ClientSymbolsView(self._store, self._store.client_ids[client])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._store.clients)
+
+    def __len__(self) -> int:
+        return len(self._store.clients)
@@ -1,7 +1,31 @@
-import csv, os
+import csv, io, os, re, time
+from contextlib import nullcontext
+from itertools import islice
+from operator import mod
+from typing import Callable, Iterable, Iterator, TextIO
+
+import locates_kernel
+from locates_kernel import BUCKET_SORT_MIN_CLIENTS, bucket_sort_picked, distribute_proportional, order_by_reminder, round_lots
 
 # Constants
 VALUE_OF_ITEM = 1
+STREAM_CHUNK_SIZE = 1 << 22 # characters per read in the streaming parser
+WRITE_BUFFER_SIZE = 1 << 20 # bytes buffered by the results writer
+VALIDATE_BLOCK_ROWS = 1 << 12 # rows the parsers validate at once
+# spaces at the start of a field - what csv's skipinitialspace drops, for rows split with str.split.
+# after a delimiter, and at the start of a line (unless the line is only spaces - csv reads a field of it)
+INITIAL_SPACES = re.compile(', +')
+LINE_INITIAL_SPACES = re.compile(r'^ +(?=[^ \r\n])', re.M)
+# a quote that opens a quoted field - at the start of a field, after skipinitialspace (other quotes are literal)
+QUOTED_FIELD_START = re.compile(r'(?:^|[,\r]) *"')
+QUOTED_FIELD_START_BYTES = re.compile(rb'(?:^|[,\r]) *"')
+RESULTS_FIELDNAMES = ['client_name', 'symbol', 'number_of_locates_allocated']
+OUTPUT_FORMATS = ('csv', 'npy')
+# the allocation kernel is the mypyc extension, not the interpreted locates_kernel.py
+KERNEL_COMPILED = not locates_kernel.__file__.endswith('.py')
+# why validate_req rejects a row
+REJECT_REASONS = ('missing_field', 'empty_field', 'non_integer_lot', 'non_positive_lot', 'non_integer_quantity',
+                  'non_positive_quantity', 'non_multiple_quantity', 'invalid_row')
 
 def valid_req(row: dict[str, str]) -> None | tuple[str,str,int,int]:
     """Basic validation for a single row.
@@ -9,6 +33,15 @@ def valid_req(row: dict[str, str]) -> None | tuple[str,str,int,int]:
     returns: None on bad input.
              all the valid fields on success - (client_name, symbol, number_of_locates_requested, round_lot_size).
     """
+    return validate_req(row)[0]
+
+
+def validate_req(row: dict[str, str]) -> tuple[None | tuple[str,str,int,int], None | str]:
+    """Same as valid_req, with the reason a row is rejected.
+    input: dictionary representing a CSV row - {client_name, symbol, number_of_locates_requested, round_lot_size}.
+    returns: (None, reason) on bad input - reason is one of REJECT_REASONS.
+             (all the valid fields, None) on success.
+    """
     # read fields by header names
     try:
         client = row.get('client_name')
@@ -17,271 +50,687 @@ def valid_req(row: dict[str, str]) -> None | tuple[str,str,int,int]:
         round_size = row.get("round_lot_size")
         # missing header fields - there might be a fix but I rather to fix the csv file
         if client is None or symbol is None or num_of_locates_req is None or round_size is None:
-            return None
+            return None, 'missing_field'
         # empty strings
         if str(client).strip() == "" or str(symbol).strip() == "":
-            return None
-        
+            return None, 'empty_field'
+
         # invalid number of rounding
-        round_size = int(round_size)
+        try:
+            round_size = int(round_size)
+        except ValueError:
+            return None, 'non_integer_lot'
         if round_size <= 0:
-            return None
+            return None, 'non_positive_lot'
 
-        num_of_locates_req = int(num_of_locates_req)
         # invalid number of locates
-        if num_of_locates_req % round_size != 0 or num_of_locates_req <= 0:
-            return None
-        
-        return client, symbol, num_of_locates_req, round_size
+        try:
+            num_of_locates_req = int(num_of_locates_req)
+        except ValueError:
+            return None, 'non_integer_quantity'
+        if num_of_locates_req <= 0:
+            return None, 'non_positive_quantity'
+        if num_of_locates_req % round_size != 0:
+            return None, 'non_multiple_quantity'
+
+        return (client, symbol, num_of_locates_req, round_size), None
     except Exception as e:
-        return None
+        return None, 'invalid_row'
 
 
-def csv_parser(file_path: str) -> tuple[dict[str, dict[str, int]], dict[str, int], dict[str, dict[str, float]]]:
+def csv_parser(file_path: str, percentages: bool = True, metrics=None,
+               rejected: list | None = None) -> tuple[dict[str, dict[str, int]], dict[str, int], dict[str, dict[str, float]]]:
     """Parses the CSV file into data structures.
     input: path to the CSV file.
+           percentages - False keeps the requested amounts by symbol as is (for distribute_locates_exact).
+           metrics - optional locates_metrics.Metrics, gets the 'parse' stage and the rejected rows by reason.
+           rejected - optional list, gets a (row_number, reason, fields) report of every invalid row (see validate_rows).
     returns: a tuple of three dictionaries:
     - a dictionary of clients requests: {client_name: {symbol: num_of_locates_requested}}
     - a dictionary of aggregate symbols requests: {symbol: total_num_of_locates_requested}
     - a dictionary of requested locates percentages by symbol: {symbol: {client_name: percentage_of_requests}}
+      or without percentages: {symbol: {client_name: num_of_locates_requested}}
     - a dictionary of chunk sizes by symbol: {symbol: round_size}
     """
     clients_requests: dict[str, dict[str, int]] = {}
     aggregate_symbols: dict[str, int] = {}
     req_by_symbol_clients_percentage: dict[str, dict[str, float]] = {}
     chunk_pr_symbol: dict[str, int] = {}
+    start = time.perf_counter()
+    rows = 0
     try:
-        _, extension = os.path.splitext(file_path)
-
-        # Check if the extension is '.csv'
-        if extension.lower() != '.csv':
-            raise ValueError(f"the file is not a .csv file: {file_path}")
+        check_csv_extension(file_path)
         # skipinitialspace=True trims whitespace following the delimiter
         with open(file_path, 'r', newline='') as csv_file:
-            reader = csv.DictReader(csv_file, skipinitialspace=True)
+            reader = csv.reader(csv_file, skipinitialspace=True)
+            fieldnames = next(reader, None)
 
             # validate headers length
-            if reader.fieldnames is None or len(reader.fieldnames) != 4:
+            if fieldnames is None or len(fieldnames) != 4:
                 raise Exception("the csv file is in the wrong format")
+            positions = header_positions(fieldnames)
 
-            for row in reader:
-                result = valid_req(row)
-                if result is None:
-                    # invalid row - skip
-                    continue
-                client, symbol, num_of_locates_req, round_size = result
+            # blank rows are skipped, the rest is validated a block at a time
+            rows_left = (fields for fields in reader if fields)
+            while True:
+                block = list(islice(rows_left, VALIDATE_BLOCK_ROWS))
+                if not block:
+                    break
+                for client, symbol, num_of_locates_req, round_size in validate_rows(block, positions, rows + 1,
+                                                                                     rejected, metrics):
+                    # track chunk sizes - only the first one matters
+                    existing_round_size = chunk_pr_symbol.get(symbol)
+                    if existing_round_size is None:
+                        chunk_pr_symbol[symbol] = round_size
+
+                    # each-client requests
+                    client_reqs = clients_requests.setdefault(client, {})
+                    # each client, symbol appears once so no need to check for existing symbol
+                    client_reqs[symbol] = num_of_locates_req
+
+                    # overall symbol aggregation
+                    aggregate_symbols[symbol] = aggregate_symbols.get(symbol, 0) + num_of_locates_req
+
+                    # track requested locates by symbol (convert to percentages after file read)
+                    symbol_clients = req_by_symbol_clients_percentage.setdefault(symbol, {})
+                    symbol_clients[client] = num_of_locates_req
+                rows += len(block)
 
-                # track chunk sizes - only the first one matters
-                existing_round_size = chunk_pr_symbol.get(symbol)
-                if existing_round_size is None:
-                    chunk_pr_symbol[symbol] = round_size
+            # convert per-symbol client requests to percentages
+            if percentages:
+                to_percentages(req_by_symbol_clients_percentage, aggregate_symbols)
 
-                # each-client requests
-                client_reqs = clients_requests.setdefault(client, {})
-                # each client, symbol appears once so no need to check for existing symbol
-                client_reqs[symbol] = num_of_locates_req
+    # common exceptions
+    except Exception as e:
+        raise_parser_error(e)
 
-                # overall symbol aggregation
-                aggregate_symbols[symbol] = aggregate_symbols.get(symbol, 0) + num_of_locates_req
+    if metrics is not None:
+        metrics.add_stage('parse', time.perf_counter() - start, rows)
+    return clients_requests, aggregate_symbols, req_by_symbol_clients_percentage, chunk_pr_symbol
 
-                # track requested locates by symbol (convert to percentages after file read)
-                symbol_clients = req_by_symbol_clients_percentage.setdefault(symbol, {})
-                symbol_clients[client] = num_of_locates_req
 
-            # convert per-symbol client requests to percentages
-            for symbol, client_requests in req_by_symbol_clients_percentage.items():
-                total_requested = aggregate_symbols[symbol]
-                # build a new dict of percentages
-                req_by_symbol_clients_percentage[symbol] = {
-                    client: req / total_requested for client, req in client_requests.items()
-                }
+def csv_parser_streaming(file_path: str | TextIO, chunk_size: int = STREAM_CHUNK_SIZE, percentages: bool = True,
+                         metrics=None, rejected: list | None = None) -> tuple[dict[str, dict[str, int]], dict[str, int], dict[str, dict[str, float]], dict[str, int]]:
+    """Streaming version of csv_parser for very large request files.
+    reads the file in big text chunks and aggregates every row straight into the result dictionaries -
+    no csv.DictReader and no dict per row (see stream_requests).
+    input:
+    - file_path: path to the CSV file, or an open text stream (e.g. stdin, opened with newline='').
+    - chunk_size: number of characters to read at once.
+    - percentages: same as csv_parser.
+    - metrics, rejected: same as csv_parser.
+    returns: the same tuple as csv_parser.
+    """
+    start = time.perf_counter()
+    clients_requests: dict[str, dict[str, int]] = {}
+    aggregate_symbols: dict[str, int] = {}
+    req_by_symbol_clients_percentage: dict[str, dict[str, float]] = {}
+    chunk_pr_symbol: dict[str, int] = {}
+
+    def add_request(client: str, symbol: str, num_of_locates_req: int, round_size: int) -> None:
+        """Aggregates a single valid request."""
+        # track chunk sizes - only the first one matters
+        if symbol not in chunk_pr_symbol:
+            chunk_pr_symbol[symbol] = round_size
+        client_reqs = clients_requests.get(client)
+        if client_reqs is None:
+            client_reqs = clients_requests[client] = {}
+        client_reqs[symbol] = num_of_locates_req
+        aggregate_symbols[symbol] = aggregate_symbols.get(symbol, 0) + num_of_locates_req
+        symbol_clients = req_by_symbol_clients_percentage.get(symbol)
+        if symbol_clients is None:
+            symbol_clients = req_by_symbol_clients_percentage[symbol] = {}
+        symbol_clients[client] = num_of_locates_req
+
+    rows = stream_requests(file_path, add_request, chunk_size, metrics, rejected)
+    # convert per-symbol client requests to percentages
+    if percentages:
+        to_percentages(req_by_symbol_clients_percentage, aggregate_symbols)
+    if metrics is not None:
+        metrics.add_stage('parse', time.perf_counter() - start, rows)
+    return clients_requests, aggregate_symbols, req_by_symbol_clients_percentage, chunk_pr_symbol
+
+
+def stream_requests(file_path: str | TextIO, add_request: Callable[[str, str, int, int], None],
+                    chunk_size: int = STREAM_CHUNK_SIZE, metrics=None, rejected: list | None = None) -> int:
+    """Reads the valid requests of a CSV file in big text chunks, with constant memory per row.
+    plain rows are split with str.split, only quoted or odd lines go through the csv module,
+    and every chunk is validated at once (see validate_rows). raises the same exceptions as csv_parser.
+    input:
+    - file_path: path to the CSV file, or an open text stream (read from its current position).
+    - add_request: called with (client_name, symbol, number_of_locates_requested, round_lot_size)
+      for every valid row, in the file order.
+    - chunk_size: number of characters to read at once.
+    - metrics: optional locates_metrics.Metrics, gets the rejected rows by reason.
+    - rejected: optional list, gets a (row_number, reason, fields) report of every invalid row.
+    returns the number of rows read (valid or not).
+    """
+    rows = 0
+    try:
+        if isinstance(file_path, io.TextIOBase):
+            csv_file_context = nullcontext(file_path)
+        else:
+            check_csv_extension(file_path)
+            csv_file_context = open(file_path, 'r', newline='')
+        with csv_file_context as csv_file:
+            header = csv_file.readline()
+            fieldnames = next(csv.reader(io.StringIO(header, newline=''), skipinitialspace=True), None)
+
+            # validate headers length
+            if fieldnames is None or len(fieldnames) != 4:
+                raise Exception("the csv file is in the wrong format")
+            positions = header_positions(fieldnames)
+
+            def add_block(block: list[list[str]]) -> None:
+                """Validates a block of rows and adds the valid ones."""
+                nonlocal rows
+                for client, symbol, num_of_locates_req, round_size in validate_rows(block, positions, rows + 1,
+                                                                                     rejected, metrics):
+                    add_request(client, symbol, num_of_locates_req, round_size)
+                rows += len(block)
+
+            # a quoted row might span a few lines - keep its lines until its quoted field is closed
+            pending: list[str] = []
+            carry = ''
+            while True:
+                chunk = csv_file.read(chunk_size)
+                if chunk:
+                    buffer = carry + chunk
+                    cut = buffer.rfind('\n')
+                    # no full line yet
+                    if cut == -1:
+                        carry = buffer
+                        continue
+                    carry = buffer[cut + 1:]
+                    text = buffer[:cut + 1]
+                    # a quoted field keeps its '\r\n' - the lines of a chunk with quotes keep their '\r'
+                    if '"' not in text:
+                        text = text.replace('\r\n', '\n')
+                    lines = text.split('\n')
+                    lines.pop()
+                else:
+                    # end of file - the last line has no new line at its end
+                    text = carry
+                    lines = [carry] if carry else []
+                    carry = ''
+
+                if not pending and '"' not in text and '\r' not in text:
+                    # fast path - plain rows only, blank lines are skipped like DictReader does.
+                    # str.split doesn't skip the spaces at the start of the fields like csv.reader does
+                    plain_text = skip_initial_spaces(text)
+                    if plain_text is not text:
+                        lines = plain_text.split('\n')
+                        if chunk:
+                            lines.pop()
+                    # small blocks - a chunk worth of row lists at once keeps the garbage collector busy
+                    for i in range(0, len(lines), VALIDATE_BLOCK_ROWS):
+                        add_block([line.split(',') for line in lines[i:i + VALIDATE_BLOCK_ROWS] if line])
+                else:
+                    block = []
+                    for line in lines:
+                        if len(block) >= VALIDATE_BLOCK_ROWS:
+                            add_block(block)
+                            block = []
+                        if pending:
+                            pending.append(line)
+                            if ends_in_quotes(line, True):
+                                continue
+                            line = '\n'.join(pending)
+                            pending = []
+                        else:
+                            plain = line[:-1] if line[-1:] == '\r' else line
+                            if not plain:
+                                continue
+                            if '"' not in plain and '\r' not in plain:
+                                block.append(skip_initial_spaces(plain).split(','))
+                                continue
+                            if ends_in_quotes(line):
+                                pending = [line]
+                                continue
+                        # slow path - let the csv module deal with quotes and bare carriage returns
+                        block += [fields for fields in csv.reader(io.StringIO(line, newline=''), skipinitialspace=True) if fields]
+                    add_block(block)
+
+                if not chunk:
+                    break
+
+            # a quoted field that is never closed - the rest of the file, like csv.reader reads it
+            if pending:
+                add_block([fields for fields in csv.reader(io.StringIO('\n'.join(pending), newline=''),
+                                                           skipinitialspace=True) if fields])
 
     # common exceptions
     except Exception as e:
-        if isinstance(e, FileNotFoundError):
-            raise FileExistsError("invalid file path - the file not found")
-        elif isinstance(e, TypeError):
-            raise TypeError("the file path is not a valid string")
-        elif isinstance(e, ValueError):
-            raise Exception("Failed to parse CSV") from e
+        raise_parser_error(e)
+    return rows
+
+
+def skip_initial_spaces(text: str) -> str:
+    """returns plain (unquoted) CSV text without the spaces at the start of its fields, so str.split gives the
+    fields csv.reader(skipinitialspace=True) does. text without such spaces is returned as is (the same object).
+    """
+    if ', ' in text:
+        text = INITIAL_SPACES.sub(',', text)
+    if text[:1] == ' ' or '\n ' in text:
+        text = LINE_INITIAL_SPACES.sub('', text)
+    return text
+
+
+def ends_in_quotes(line: str | bytes, quoted: bool = False) -> bool:
+    """returns True if a quoted field is still open at the end of a line, as csv.reader(skipinitialspace=True)
+    reads it - a quote opens a quoted field only at the start of the field, a quote anywhere else is a literal
+    character, and a doubled quote inside a quoted field is an escaped one.
+    input: line - a line without its new line (str or bytes), quoted - the line starts inside a quoted field.
+    """
+    if isinstance(line, str):
+        quote, field_start = '"', QUOTED_FIELD_START
+    else:
+        quote, field_start = b'"', QUOTED_FIELD_START_BYTES
+    position = 0
+    while True:
+        if quoted:
+            end = line.find(quote, position)
+            if end == -1:
+                return True
+            position = end + 1
+            # a doubled quote is a quote in the field
+            if line.startswith(quote, position):
+                position += 1
+            else:
+                quoted = False
         else:
-            raise Exception(f"Error: {e}")
+            match = field_start.search(line, position)
+            if match is None:
+                return False
+            position = match.end()
+            quoted = True
 
-    return clients_requests, aggregate_symbols, req_by_symbol_clients_percentage, chunk_pr_symbol
+
+def header_positions(fieldnames: list[str]) -> None | tuple[int, int, int, int]:
+    """returns the positions of the (client_name, symbol, number_of_locates_requested, round_lot_size) columns,
+    or None if one of them is missing (every row is invalid then). like DictReader the last duplicate header wins.
+    """
+    positions = {name: i for i, name in enumerate(fieldnames)}
+    columns = tuple(positions.get(name) for name in ('client_name', 'symbol', 'number_of_locates_requested',
+                                                     'round_lot_size'))
+    if None in columns:
+        return None
+    return columns
+
+
+def validate_rows(rows: list[list[str]], positions: None | tuple[int, int, int, int], first_row: int = 1,
+                  rejected: list | None = None, metrics=None) -> Iterable[tuple[str, str, int, int]]:
+    """Validates a block of split rows at once - same rules as valid_req.
+    clean blocks (almost all of them) are checked column by column with bulk int conversion, only a block
+    with an invalid row goes row by row (validate_fields) to find it.
+    input:
+    - rows: the rows' fields, as csv.reader gives them.
+    - positions: the columns positions (see header_positions), None rejects every row.
+    - first_row: number of the first row in the block, for the report.
+    - rejected: optional list, gets (row_number, reason, fields) for every invalid row - row numbers count
+      the data rows from 1 (not the file lines, a quoted row might span a few).
+    - metrics: optional locates_metrics.Metrics, counts the invalid rows by reason.
+    returns the valid rows as (client_name, symbol, number_of_locates_requested, round_lot_size), in order -
+    an iterator, go over it once.
+    """
+    if positions is not None and rows and min(map(len, rows)) > max(positions):
+        client_i, symbol_i, req_i, round_i = positions
+        # rows to columns in one go, all the work below is map over a column
+        columns = list(zip(*rows))
+        clients = list(columns[client_i])
+        symbols = list(columns[symbol_i])
+        try:
+            requested = list(map(int, columns[req_i]))
+            lots = list(map(int, columns[round_i]))
+        except ValueError:
+            # a bad number
+            pass
+        else:
+            # lots are checked before the modulo
+            if (all(map(str.strip, clients)) and all(map(str.strip, symbols)) and min(lots) > 0
+                    and min(requested) > 0 and not any(map(mod, requested, lots))):
+                return zip(clients, symbols, requested, lots)
+
+    # some row is invalid - check them one by one
+    valid = []
+    for row_number, fields in enumerate(rows, first_row):
+        result, reason = validate_fields(fields, positions)
+        if result is not None:
+            valid.append(result)
+            continue
+        if rejected is not None:
+            rejected.append((row_number, reason, fields))
+        if metrics is not None:
+            metrics.reject(reason)
+    return valid
+
+
+def validate_fields(fields: list[str], positions: None | tuple[int, int, int, int]) -> tuple[None | tuple[str, str, int, int], None | str]:
+    """Same as validate_req for a split row.
+    returns: (None, reason) on bad input, (all the valid fields, None) on success.
+    """
+    # missing fields
+    if positions is None or len(fields) <= max(positions):
+        return None, 'missing_field'
+    client_i, symbol_i, req_i, round_i = positions
+    client = fields[client_i]
+    symbol = fields[symbol_i]
+    # empty strings
+    if not client.strip() or not symbol.strip():
+        return None, 'empty_field'
+    try:
+        round_size = int(fields[round_i])
+        num_of_locates_req = int(fields[req_i])
+    except ValueError:
+        return None, reject_number_reason(fields[round_i], fields[req_i])
+    # invalid number of rounding or locates
+    if round_size <= 0 or num_of_locates_req <= 0 or num_of_locates_req % round_size != 0:
+        return None, reject_number_reason(round_size, num_of_locates_req)
+    return (client, symbol, num_of_locates_req, round_size), None
+
+
+def reject_number_reason(round_size: str | int, num_of_locates_req: str | int) -> str:
+    """returns the reason (see REJECT_REASONS) the lot size or the number of locates of a row is rejected."""
+    try:
+        round_size = int(round_size)
+    except ValueError:
+        return 'non_integer_lot'
+    if round_size <= 0:
+        return 'non_positive_lot'
+    try:
+        num_of_locates_req = int(num_of_locates_req)
+    except ValueError:
+        return 'non_integer_quantity'
+    if num_of_locates_req <= 0:
+        return 'non_positive_quantity'
+    return 'non_multiple_quantity'
+
+
+def check_csv_extension(file_path: str) -> None:
+    """Raises ValueError if the file path is not a .csv file."""
+    _, extension = os.path.splitext(file_path)
+
+    # Check if the extension is '.csv'
+    if extension.lower() != '.csv':
+        raise ValueError(f"the file is not a .csv file: {file_path}")
+
+
+def to_percentages(req_by_symbol_clients: dict[str, dict[str, int]], aggregate_symbols: dict[str, int]) -> None:
+    """Converts per-symbol client requests to percentages of the symbol total.
+    changes the req_by_symbol_clients dictionary in place."""
+    for symbol, client_requests in req_by_symbol_clients.items():
+        total_requested = aggregate_symbols[symbol]
+        # build a new dict of percentages
+        req_by_symbol_clients[symbol] = {
+            client: req / total_requested for client, req in client_requests.items()
+        }
+
+
+def raise_parser_error(e: Exception) -> None:
+    """Translates an exception raised while parsing to the parsers common exceptions."""
+    if isinstance(e, FileNotFoundError):
+        raise FileExistsError("invalid file path - the file not found")
+    elif isinstance(e, TypeError):
+        raise TypeError("the file path is not a valid string")
+    elif isinstance(e, ValueError):
+        raise Exception("Failed to parse CSV") from e
+    else:
+        raise Exception(f"Error: {e}")
+
+
+def sort_by_reminder(distribute_by_proportion: dict[str, int], round_lot_size: int,
+                     bucketed: bool | None = None) -> tuple[list[list[str | int]], int]:
+    """Filters the clients that are not on a multiple of round_lot_size and orders them by the min change
+    in order to get to a multiple of round_lot_size (highest reminder first, ties keep their order).
+    reminders are in the range [1, round_lot_size) so big symbols use a counting sort - O(n + round_lot_size)
+    instead of O(n log(n)), the crossover is measured by benchmarks/bench_rounding.py.
+    input:
+    - distribute_by_proportion: {client_name: num_of_locates_distributed}
+    - round_lot_size: the symbol's round lot size
+    - bucketed: force the counting sort (True) or the sort (False), None picks by the symbol size.
+    returns a tuple of the ordered [client_name, num_of_locates_distributed] items and the sum of their reminders.
+    """
+    clients = list(distribute_by_proportion)
+    values = list(distribute_by_proportion.values())
+    positions, total_to_distribute = order_by_reminder(values, round_lot_size, bucketed)
+    return [[clients[i], values[i]] for i in positions], total_to_distribute
+
+
+def rounding_chunks(distribute_by_proportion: dict[str, int], round_lot_size: int,
+                    bucketed: bool | None = None, metrics=None) -> None | list[list[str | int]]:
+    """Rounds the distributed locates to the nearest chunk size (round_lot_size).
+    the clients with the highest reminders are rounded up, the locates are taken from the lowest ones -
+    the loop itself is in locates_kernel (round_lots).
+    input: distribute_by_proportion - {client_name: num_of_locates_distributed}
+           bucketed - how to order the clients, see sort_by_reminder.
+           metrics - optional locates_metrics.Metrics, counts the calls and the redistribution loop iterations.
+    returns a list of tuples (client_name, rounded_num_of_locates_distributed) or None if no rounding needed.
+    """
+    clients = list(distribute_by_proportion)
+    positions, rounded, iterations = round_lots(list(distribute_by_proportion.values()), round_lot_size, bucketed)
+    if metrics is not None:
+        metrics.add_rounding(iterations)
+    if positions is None:
+        return None
+    return [[clients[i], value] for i, value in zip(positions, rounded)]
+
+
+def distribute_symbol(clients_percentage: dict[str, float], clients_requested: dict[str, int],
+                      total: int, round_lot_size: int | None, metrics=None) -> dict[str, int]:
+    """Distributes the approved locates of a single symbol among its clients proportionally -
+    locates_kernel.distribute_proportional over the symbol's clients.
+    input:
+    - clients_percentage: {client_name: percentage_of_requests} of the symbol
+    - clients_requested: {client_name: num_of_locates_requested} of the symbol
+    - total: num_of_locates_approved for the symbol
+    - round_lot_size: the symbol's round lot size (only used if rounding is needed)
+    - metrics: optional locates_metrics.Metrics, gets the rounding_chunks counts.
+    returns a dictionary of distributed locates: {client_name: num_of_locates_distributed}
+    """
+    distributed, iterations = distribute_proportional(list(clients_percentage.values()),
+                                                      [clients_requested[client] for client in clients_percentage],
+                                                      total, round_lot_size)
+    if metrics is not None and iterations >= 0:
+        metrics.add_rounding(iterations)
+    return dict(zip(clients_percentage, distributed))
 
 
 def distribute_locates(clients_requests: dict[str, dict[str, int]], approved_locates: dict[str, int],
-                       req_by_symbol_clients_percentage: dict[str, dict[str, float]], chunk_pr_symbol: dict[str, int]) -> dict[str, dict[str, int]]:
+                       req_by_symbol_clients_percentage: dict[str, dict[str, float]], chunk_pr_symbol: dict[str, int],
+                       workers: int = 1, metrics=None) -> dict[str, dict[str, int]]:
     """Distributes the approved locates among clients requests proportionally.
     input:
     - clients_requests: {client_name: {symbol: num_of_locates_requested}}
     - approved_locates: {symbol: num_of_locates_approved}
     - req_by_symbol_clients_percentage: {symbol: {client_name: percentage_of_requests}}
     - chunk_pr_symbol: {symbol: round_lot_size}
+    - workers: number of processes, above 1 the symbols are sharded between them (see locates_parallel).
+    - metrics: optional locates_metrics.Metrics, gets the 'distribute' stage, the time of every symbol and
+      the rounding_chunks counts (with workers only the stage - the rest happens in the worker processes).
     returns a dictionary of distributed locates: {client_name: {symbol: num_of_locates_distributed}}
     """
+    start = time.perf_counter()
+    if workers > 1:
+        from locates_parallel import distribute_locates_parallel
+        distributed_locates = distribute_locates_parallel(clients_requests, approved_locates,
+                                                          req_by_symbol_clients_percentage, chunk_pr_symbol, workers)
+        if metrics is not None:
+            metrics.add_stage('distribute', time.perf_counter() - start,
+                              sum(len(req_by_symbol_clients_percentage[symbol]) for symbol in approved_locates))
+        return distributed_locates
+
     # client : {symbol : num}
     distributed_locates: dict[str, dict[str, int]] = {client: {} for client in clients_requests.keys()}
 
-    def rounding_chunks(distribute_by_proportion: dict[str, int], round_lot_size: int) -> None | list[str, int]:
-        """Rounds the distributed locates to the nearest chunk size (round_lot_size).
-        input: distribute_by_proportion - {client_name: num_of_locates_distributed}
-        returns a list of tuples (client_name, rounded_num_of_locates_distributed) or None if no rounding needed.
-        """
-        # order by the min change in oreder to get to a multiple of round_lot_size
-        filtered_items = [list(item) for item in distribute_by_proportion.items() if item[VALUE_OF_ITEM] % round_lot_size != 0]
-        sorted_and_filtered = sorted(filtered_items, key=lambda item: item[VALUE_OF_ITEM] % round_lot_size, reverse=True)
-
-        # collecting all reminders to distribute
-        total_to_distribute = 0
-        for i, (_, val) in enumerate(sorted_and_filtered):
-            reminder = val % round_lot_size
-            total_to_distribute += reminder
-        times = int(total_to_distribute / round_lot_size)
-        # if sum of reminders is less than round_lot_size no need to distribute
-        if not times:
-            return None
-        
-        # figure how much we need of rounding the cloesest to it.
-        grab_for_distribution = 0
-        for i in range(times):
-            grab_for_distribution += round_lot_size - (sorted_and_filtered[i][VALUE_OF_ITEM] % round_lot_size)
-            # act like we rounded them already
-            sorted_and_filtered[i][VALUE_OF_ITEM] += round_lot_size - (sorted_and_filtered[i][VALUE_OF_ITEM] % round_lot_size)
-
-        emptied_clients = 0
-        # grab from the lowest ones to distribute to the top ones
-        while grab_for_distribution > 0:
-            size_of_relevants = len(sorted_and_filtered) - (emptied_clients + times) # of clients that can give locates
-            chunk_to_redistribute = int(grab_for_distribution / size_of_relevants) # how much to take from each client
-
-            # if we can't take a full chunk from each client - take 1 from the lowest ones
-            if not chunk_to_redistribute:
-                for i in range(grab_for_distribution):
-                    index = size_of_relevants + times - 1 - (i % size_of_relevants)
-                    sorted_and_filtered[index][VALUE_OF_ITEM] -= 1
-                grab_for_distribution = 0
-                break
-            
-            # from the lowest to the highest that gave locates
-            for i in range (size_of_relevants + times - 1, times - 1, -1): 
-                # if we can take the full amount
-                if (sorted_and_filtered[i][VALUE_OF_ITEM] % round_lot_size) - chunk_to_redistribute >= 0:
-                    sorted_and_filtered[i][VALUE_OF_ITEM] -= chunk_to_redistribute
-                    grab_for_distribution -= chunk_to_redistribute
-                    # if we emptied this client
-                    if sorted_and_filtered[i][VALUE_OF_ITEM] % round_lot_size == 0:
-                        emptied_clients += 1
-                # else if we can't take the full amount
-                else: 
-                    chunk_to_redistribute = sorted_and_filtered[i][VALUE_OF_ITEM] % round_lot_size
-                    sorted_and_filtered[i][VALUE_OF_ITEM] -= chunk_to_redistribute
-                    emptied_clients += 1
-                    grab_for_distribution -= chunk_to_redistribute
-                    break
-        return sorted_and_filtered
-
-
-    def distribute_by_symbol() -> None:
-        """Distributes approved locates by symbol among clients.
-        changes the distributed_locates dictionary in place."""
-        # go over relevent symbols only
-        for symbol, total in approved_locates.items():
-            distribute_by_proportion = {}
-            rounding = False
-            for client, proportion in req_by_symbol_clients_percentage[symbol].items():
-                # find portion by number
-                amount = proportion * total
-
-                # make sure to distribute the whole approved number
-                converted = int(amount)
-                if amount - converted > 0.5:
-                    amount = converted + 1
-                else:
-                    amount = converted
-                distribute_by_proportion[client] = amount
-
-                # client can't get more then requested
-                max_allocate = min(amount, clients_requests[client][symbol])
-                distributed_locates[client][symbol] = max_allocate
-
-                # client got by proportion - check if rounding is needed
-                if max_allocate != clients_requests[client][symbol]:
-                    rounding = True
-            # try to redistribute leftovers
-            if rounding: 
-                distribute_list = rounding_chunks(distribute_by_proportion, chunk_pr_symbol[symbol])
-                if distribute_list:
-                    for client, value in distribute_list:
-                        distributed_locates[client][symbol] = value
-            
+    rows = 0
+    # go over relevent symbols only
+    for symbol, distributed in iter_distribute_locates(clients_requests, approved_locates,
+                                                       req_by_symbol_clients_percentage, chunk_pr_symbol,
+                                                       metrics=metrics):
+        for client, value in distributed.items():
+            distributed_locates[client][symbol] = value
+        rows += len(distributed)
+
+    if metrics is not None:
+        metrics.add_stage('distribute', time.perf_counter() - start, rows)
+    return distributed_locates
+
+
+def iter_distribute_locates(clients_requests: dict[str, dict[str, int]], approved_locates: dict[str, int],
+                            req_by_symbol_clients_percentage: dict[str, dict[str, float]],
+                            chunk_pr_symbol: dict[str, int], workers: int = 1,
+                            metrics=None) -> Iterator[tuple[str, dict[str, int]]]:
+    """Same as distribute_locates, one symbol at a time - for writing every symbol as soon as it is done.
+    input: same as distribute_locates (no 'distribute' stage in metrics, only the symbols times).
+    yields (symbol, {client_name: num_of_locates_distributed}) - in the approved order, or with workers
+    in the order the worker processes finish them.
+    """
+    if workers > 1:
+        from locates_parallel import iter_distribute_parallel
+        yield from iter_distribute_parallel(clients_requests, approved_locates, req_by_symbol_clients_percentage,
+                                            chunk_pr_symbol, workers)
         return
-    
-    distribute_by_symbol()
+
+    for symbol, total in approved_locates.items():
+        symbol_start = time.perf_counter()
+        clients_percentage = req_by_symbol_clients_percentage[symbol]
+        clients_requested = {client: clients_requests[client][symbol] for client in clients_percentage}
+        distributed = distribute_symbol(clients_percentage, clients_requested, total, chunk_pr_symbol.get(symbol),
+                                        metrics)
+        if metrics is not None:
+            metrics.add_symbol(symbol, time.perf_counter() - symbol_start, len(distributed))
+        yield symbol, distributed
+
+
+def distribute_symbol_exact(clients_requested: dict[str, int], total: int, total_requested: int,
+                            round_lot_size: int, metrics=None) -> dict[str, int]:
+    """Distributes the approved locates of a single symbol with integers only (largest remainder method).
+    every client gets the floor of requested * total / total_requested, the locates left go one by one to
+    the clients with the largest remainders (the first one on ties), then rounding_chunks rounds to lots.
+    the whole approved amount is distributed exactly, never more then requested.
+    input:
+    - clients_requested: {client_name: num_of_locates_requested} of the symbol
+    - total: num_of_locates_approved for the symbol
+    - total_requested: the symbol's aggregate request
+    - round_lot_size: the symbol's round lot size
+    - metrics: optional locates_metrics.Metrics, passed to rounding_chunks.
+    returns a dictionary of distributed locates: {client_name: num_of_locates_distributed}
+    """
+    # approved everything that was requested
+    if total >= total_requested:
+        return dict(clients_requested)
+
+    distributed: dict[str, int] = {}
+    reminders: list[tuple[int, str]] = []
+    left = total
+    for client, requested in clients_requested.items():
+        amount, reminder = divmod(requested * total, total_requested)
+        distributed[client] = amount
+        left -= amount
+        if reminder:
+            reminders.append((reminder, client))
+    # the largest remainders get the locates left - sorted is stable so ties keep the clients order
+    if left > 0:
+        reminders.sort(key=lambda item: item[0], reverse=True)
+        for _, client in reminders[:left]:
+            distributed[client] += 1
+
+    distribute_list = rounding_chunks(distributed, round_lot_size, metrics=metrics)
+    if distribute_list:
+        for client, value in distribute_list:
+            distributed[client] = value
+    return distributed
+
+
+def distribute_locates_exact(clients_requests: dict[str, dict[str, int]], approved_locates: dict[str, int],
+                             req_by_symbol_clients: dict[str, dict[str, int]], aggregate_symbols: dict[str, int],
+                             chunk_pr_symbol: dict[str, int], metrics=None) -> dict[str, dict[str, int]]:
+    """Distributes the approved locates among clients requests proportionally, with integers only.
+    unlike distribute_locates there are no percentages - no float drift for big totals and no percentages
+    dictionary to parse (use csv_parser(file_path, percentages=False)).
+    input:
+    - clients_requests: {client_name: {symbol: num_of_locates_requested}}
+    - approved_locates: {symbol: num_of_locates_approved}
+    - req_by_symbol_clients: {symbol: {client_name: num_of_locates_requested}}
+    - aggregate_symbols: {symbol: total_num_of_locates_requested}
+    - chunk_pr_symbol: {symbol: round_lot_size}
+    - metrics: same as distribute_locates.
+    returns a dictionary of distributed locates: {client_name: {symbol: num_of_locates_distributed}}
+    """
+    start = time.perf_counter()
+    # client : {symbol : num}
+    distributed_locates: dict[str, dict[str, int]] = {client: {} for client in clients_requests.keys()}
+
+    rows = 0
+    # go over relevent symbols only
+    for symbol, total in approved_locates.items():
+        symbol_start = time.perf_counter()
+        distributed = distribute_symbol_exact(req_by_symbol_clients[symbol], total, aggregate_symbols[symbol],
+                                              chunk_pr_symbol.get(symbol), metrics)
+        for client, value in distributed.items():
+            distributed_locates[client][symbol] = value
+        if metrics is not None:
+            metrics.add_symbol(symbol, time.perf_counter() - symbol_start, len(distributed))
+            rows += len(distributed)
+
+    if metrics is not None:
+        metrics.add_stage('distribute', time.perf_counter() - start, rows)
     return distributed_locates
-    
-def create_results_csv(distributed_locates: dict[str, dict[str, int]], output_path: str) -> None:
+
+
+def create_results_csv(distributed_locates: dict[str, dict[str, int]], output_path: str | TextIO,
+                       output_format: str = 'csv', metrics=None) -> None:
     """Creates a CSV file with the distributed locates results.
     input:
     - distributed_locates: {client_name: {symbol: num_of_locates_distributed}}
-    - output_path: path to the output CSV file.
+    - output_path: path to the output CSV file, or an open text stream (e.g. stdout) for 'csv'.
+    - output_format: 'csv' (default) or 'npy' - output_path is then a directory with a .npy file
+      per column (see locates_writers), for loaders that don't want to parse CSV again.
+    - metrics: optional locates_metrics.Metrics, gets the 'write' stage.
     returns: None on success, raises Exception on failure.
     """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"unknown output format: {output_format}")
+    start = time.perf_counter()
     try:
-        with open(output_path, 'w', newline='') as csv_file:
-            fieldnames = ['client_name', 'symbol', 'number_of_locates_allocated']
-            writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
-
-            writer.writeheader()
-            # write each client's distributed locates
-            for client, symbols_granted in distributed_locates.items():
-                for symbol, num_of_locates in symbols_granted.items():
-                    writer.writerow({
-                        'client_name': client,
-                        'symbol': f" {symbol}",
-                        'number_of_locates_allocated': f" {num_of_locates}"
-                    })
+        if output_format == 'npy':
+            from locates_writers import write_results_npy
+            write_results_npy(distributed_locates, output_path)
+        else:
+            if isinstance(output_path, io.TextIOBase):
+                csv_file_context = nullcontext(output_path)
+            else:
+                csv_file_context = open(output_path, 'w', newline='', buffering=WRITE_BUFFER_SIZE)
+            with csv_file_context as csv_file:
+                writer = csv.writer(csv_file)
+                writer.writerow(RESULTS_FIELDNAMES)
+                # write each client's distributed locates - rows go to the csv module in bulk, no dict per row
+                writer.writerows(
+                    (client, f" {symbol}", f" {num_of_locates}")
+                    for client, symbols_granted in distributed_locates.items()
+                    for symbol, num_of_locates in symbols_granted.items()
+                )
     except Exception as e:
-        raise Exception(f"Failed to write results CSV: {e}")
+        raise Exception(f"Failed to write results CSV: {e}") from e
+    if metrics is not None:
+        metrics.add_stage('write', time.perf_counter() - start,
+                          sum(len(symbols_granted) for symbols_granted in distributed_locates.values()))
 
 
 def request_locates(requested_locates: dict[str, int]) -> dict[str, int]:
     """A black box function that approves locates
     according to some internal logic.
     This is just a way for me to simulate locate approvals instead of the API call.
+    the approvals come from locates_broker.SimulatedBroker (no latency), see locates_broker.request_approvals
+    for batched concurrent requests.
     input: requested_locates - {symbol: num_of_locates_requested}
     returns: approved_locates - {symbol: num_of_locates_approved}
     """
-    from random import random, uniform
-    approved_locates = {}
-    for symbol, requested in requested_locates.items():
-        # Simulate partial approval: randomly skip some symbols
-        if random() < 0.7:  # 70% chance to approve this symbol
-            # Simulate partial approval: approve a random portion up to min(requested, 1000)
-            max_approve = min(requested, 1000)
-            # Approve between 50% and 100% of max_approve
-            approved = int(max_approve * uniform(0.5, 1.0))
-            approved_locates[symbol] = approved
-        # else: skip this symbol (not approved)
-    return approved_locates
+    from locates_broker import SimulatedBroker
+    return SimulatedBroker(latency=0).approve(requested_locates)
 
 if __name__ == '__main__':
-    csv_path = r'.\tests\test_data\complex.csv'
-    clients_requests, aggregate_symbols, req_by_symbol_clients_percentage, chunk_pr_symbol = csv_parser(csv_path)
-    # simulate API call
-    approved = request_locates(aggregate_symbols)
-
-    # approved ={
-    #     'AAPL': 2550, # 75% of 3400 requested
-    #     'MSFT': 1740, # 60% of 2900 requested
-    #     'GOOGL': 2660, # 95% of 2800 requested
-    #     'AMZN': 2190, # 73% of 3000 requested
-    #     'TSLA': 864, # 27% of 3200 requested
-    # }
-
-    # compute distribution
-    distributed = distribute_locates(clients_requests, approved, req_by_symbol_clients_percentage, chunk_pr_symbol)
-    
-    # write results to CSV
-    output_csv_path = r'.\results.csv'
-    create_results_csv(distributed, output_csv_path)
+    # the command line lives in locates.py - python -m locates --help
+    import sys
+    from locates import main
+    sys.exit(main())
@@ -0,0 +1,282 @@
+"""Watch mode - a request file that keeps growing, parsed a piece at a time.
+
+clients add requests to the file during the day. instead of running csv_parser from the first byte on
+every refresh, a WatchedBook remembers the byte offset it parsed up to and reads only the rows appended
+since. the rows go into the csv_parser dictionaries in place, and the symbols they touch are marked dirty -
+only those get new percentages, and the next distribute() recomputes only them (and the symbols whose
+approval changed). a refresh costs the new rows, not the file size.
+
+    book = WatchedBook('requests.csv')
+    book.refresh()
+    distributed = book.distribute(approved_locates)
+    ... rows are appended ...
+    book.refresh()
+    distributed = book.distribute(approved_locates)  # only the dirty symbols are distributed again
+
+a row is read once its line is complete (ends with a new line, quotes balanced) - a row the writer is in
+the middle of waits for the next refresh. a file that got shorter (rewritten or truncated) is read again
+from the start. the structures are always the same as csv_parser over the file so far.
+
+    python locates_watch.py requests.csv --approvals approved.json --interval 1
+
+prints the changed cells (client_name, symbol, number_of_locates_allocated) after every refresh.
+"""
+import argparse
+import csv
+import io
+import os
+import sys
+import time
+from typing import Iterator
+
+from locates_task import distribute_symbol, ends_in_quotes, stream_requests
+
+# bytes read at once by a refresh
+WATCH_READ_SIZE = 1 << 22
+
+
+def complete_rows_end(data: bytes) -> int:
+    """returns the length of the complete rows at the start of data - up to the last new line, without a
+    quoted row that is still open (its closing quote is not written yet). data starts at the start of a row,
+    a quote in the middle of a field is a literal one (see ends_in_quotes)."""
+    if b'"' not in data:
+        return data.rfind(b'\n') + 1
+    # a quoted field might span lines - a row ends at the first new line outside of one
+    end = position = 0
+    quoted = False
+    for line in data.split(b'\n')[:-1]:
+        position += len(line) + 1
+        if quoted or b'"' in line:
+            quoted = ends_in_quotes(line, quoted)
+        if not quoted:
+            end = position
+    return end
+
+
+class WatchedBook:
+    """The parsed requests of a growing CSV file, see the module docs.
+    the dictionaries are the csv_parser ones (with percentages) and are changed in place by refresh().
+    """
+
+    def __init__(self, file_path: str, encoding: str = 'utf-8', metrics=None) -> None:
+        """input:
+        - file_path: path to the CSV file, it doesn't have to exist yet.
+        - encoding: the file encoding.
+        - metrics: optional locates_metrics.Metrics, gets a 'parse' stage for every refresh with new rows,
+          the rejected rows and the distributed symbols.
+        """
+        self.file_path = file_path
+        self.encoding = encoding
+        self.metrics = metrics
+        self._reset()
+
+    def _reset(self) -> None:
+        """Forgets everything parsed so far - the next refresh reads the file from the start."""
+        self.clients_requests: dict[str, dict[str, int]] = {}
+        self.aggregate_symbols: dict[str, int] = {}
+        self.req_by_symbol_clients_percentage: dict[str, dict[str, float]] = {}
+        self.chunk_pr_symbol: dict[str, int] = {}
+        # symbols with new rows since the last distribute()
+        self.dirty: set[str] = set()
+        # clients first seen since the last distribute() - they get their distributed_locates entry there
+        self.new_clients: list[str] = []
+        # the byte offset parsed up to, and the header line (text) every new piece is parsed with
+        self.offset = 0
+        self.header: str | None = None
+        self.rows = 0
+        # approvals and results of the last distribute()
+        self.approved_locates: dict[str, int] = {}
+        self.distributed_locates: dict[str, dict[str, int]] = {}
+        # cells changed since the last changes() call
+        self._changed: dict[tuple[str, str], int] = {}
+
+    def refresh(self, rejected: list | None = None) -> set[str]:
+        """Reads the rows appended since the last refresh.
+        input: rejected - optional list, gets a (row_number, reason, fields) report of every invalid new row,
+               row numbers count from the first row of the file like csv_parser.
+        returns the symbols the new rows touched (they are added to dirty).
+        raises the same exceptions as csv_parser - a missing file is not an error, nothing is read.
+        """
+        start = time.perf_counter()
+        try:
+            size = os.path.getsize(self.file_path)
+        except FileNotFoundError:
+            return set()
+        if size < self.offset:
+            # the file was rewritten - the old cells go away with the old requests
+            for client, symbols in self.distributed_locates.items():
+                for symbol in symbols:
+                    self._changed[(client, symbol)] = 0
+            changed, approved_locates = self._changed, self.approved_locates
+            self._reset()
+            self._changed, self.approved_locates = changed, approved_locates
+        if size == self.offset:
+            return set()
+
+        with open(self.file_path, 'rb') as requests_file:
+            requests_file.seek(self.offset)
+            data = requests_file.read(size - self.offset)
+        if self.header is None:
+            # the header line first - parsed with every piece that comes after it
+            header_end = data.find(b'\n') + 1
+            if not header_end:
+                return set()
+            self.header = data[:header_end].decode(self.encoding)
+            self.offset += header_end
+            data = data[header_end:]
+        end = complete_rows_end(data)
+        if not end:
+            return set()
+
+        touched: set[str] = set()
+        new_clients = self.new_clients
+        clients_requests = self.clients_requests
+        aggregate_symbols = self.aggregate_symbols
+        req_by_symbol_clients = self.req_by_symbol_clients_percentage
+        chunk_pr_symbol = self.chunk_pr_symbol
+
+        def add_request(client: str, symbol: str, num_of_locates_req: int, round_size: int) -> None:
+            """Aggregates a single valid request - same as csv_parser_streaming, the symbol's percentages
+            are recomputed after the whole piece is read."""
+            if symbol not in chunk_pr_symbol:
+                chunk_pr_symbol[symbol] = round_size
+            client_reqs = clients_requests.get(client)
+            if client_reqs is None:
+                client_reqs = clients_requests[client] = {}
+                new_clients.append(client)
+            client_reqs[symbol] = num_of_locates_req
+            aggregate_symbols[symbol] = aggregate_symbols.get(symbol, 0) + num_of_locates_req
+            symbol_clients = req_by_symbol_clients.get(symbol)
+            if symbol_clients is None:
+                symbol_clients = req_by_symbol_clients[symbol] = {}
+            symbol_clients[client] = 0.0
+            touched.add(symbol)
+
+        piece_rejected = [] if rejected is not None else None
+        text = self.header + data[:end].decode(self.encoding)
+        rows = stream_requests(io.StringIO(text, newline=''), add_request, metrics=self.metrics,
+                               rejected=piece_rejected)
+        if rejected is not None:
+            rejected.extend((self.rows + row_number, reason, fields) for row_number, reason, fields in piece_rejected)
+        self.offset += end
+        self.rows += rows
+
+        # the percentages of the touched symbols only - same as to_percentages
+        for symbol in touched:
+            total_requested = aggregate_symbols[symbol]
+            symbol_clients = req_by_symbol_clients[symbol]
+            for client in symbol_clients:
+                symbol_clients[client] = clients_requests[client][symbol] / total_requested
+        self.dirty |= touched
+        if self.metrics is not None:
+            self.metrics.add_stage('parse', time.perf_counter() - start, rows)
+        return touched
+
+    def distribute(self, approved_locates: dict[str, int]) -> dict[str, dict[str, int]]:
+        """Distributes the approved locates over the requests so far - recomputes only the dirty symbols and
+        the symbols whose approval changed, the rest keep their last distribution.
+        input: approved_locates - {symbol: num_of_locates_approved}, symbols nobody requested yet are kept
+               for when their rows arrive.
+        returns the distributed locates: {client_name: {symbol: num_of_locates_distributed}}, the same as
+        distribute_locates over the file so far (up to the order of the symbols). it is the book's own
+        dictionary, don't change it.
+        """
+        start = time.perf_counter()
+        previous = self.approved_locates
+        distributed_locates = self.distributed_locates
+        # only the new clients - the rest have their entry already
+        for client in self.new_clients:
+            distributed_locates[client] = {}
+        self.new_clients.clear()
+
+        # symbols that are not approved anymore
+        for symbol in previous.keys() - approved_locates.keys():
+            if symbol in self.req_by_symbol_clients_percentage:
+                for client in self.req_by_symbol_clients_percentage[symbol]:
+                    self._set_cell(client, symbol, None)
+
+        rows = 0
+        for symbol, total in approved_locates.items():
+            clients_percentage = self.req_by_symbol_clients_percentage.get(symbol)
+            if clients_percentage is None or (symbol not in self.dirty and previous.get(symbol) == total):
+                continue
+            symbol_start = time.perf_counter()
+            clients_requested = {client: self.clients_requests[client][symbol] for client in clients_percentage}
+            distributed = distribute_symbol(clients_percentage, clients_requested, total,
+                                            self.chunk_pr_symbol.get(symbol), self.metrics)
+            for client, value in distributed.items():
+                self._set_cell(client, symbol, value)
+            if self.metrics is not None:
+                self.metrics.add_symbol(symbol, time.perf_counter() - symbol_start, len(distributed))
+            rows += len(distributed)
+
+        self.approved_locates = dict(approved_locates)
+        self.dirty.clear()
+        if self.metrics is not None:
+            self.metrics.add_stage('distribute', time.perf_counter() - start, rows)
+        return distributed_locates
+
+    def _set_cell(self, client: str, symbol: str, value: int | None) -> None:
+        """Sets a distributed cell (None removes it - reported as 0) and tracks the change."""
+        client_locates = self.distributed_locates[client]
+        if value is None:
+            if client_locates.pop(symbol, None) is not None:
+                self._changed[(client, symbol)] = 0
+        elif client_locates.get(symbol) != value:
+            client_locates[symbol] = value
+            self._changed[(client, symbol)] = value
+
+    def changes(self) -> dict[tuple[str, str], int]:
+        """Returns the cells changed by distribute() since the last call and clears them.
+        returns {(client_name, symbol): num_of_locates_distributed}, a removed cell is 0.
+        """
+        changes = self._changed
+        self._changed = {}
+        return changes
+
+    def follow(self, approved_locates: dict[str, int], interval: float = 1.0,
+               refreshes: int | None = None) -> Iterator[dict[tuple[str, str], int]]:
+        """Refreshes every interval seconds and distributes whenever new rows arrived.
+        input: approved_locates - as distribute(), interval - seconds between refreshes,
+               refreshes - stop after this many refreshes (None - never stop).
+        yields the changed cells (see changes()) of every refresh that changed something.
+        """
+        done = 0
+        while refreshes is None or done < refreshes:
+            if done:
+                time.sleep(interval)
+            self.refresh()
+            if self.dirty or self.approved_locates != approved_locates:
+                self.distribute(approved_locates)
+            changes = self.changes()
+            if changes:
+                yield changes
+            done += 1
+
+
+def main(argv: list[str] | None = None) -> int:
+    from locates import load_approvals
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('input', help="requests CSV file")
+    parser.add_argument('--approvals', required=True, help="approved locates - a .json or .csv file")
+    parser.add_argument('--interval', type=float, default=1.0, help="seconds between refreshes (default 1)")
+    parser.add_argument('--refreshes', type=int, help="stop after this many refreshes")
+    args = parser.parse_args(argv)
+
+    try:
+        approved_locates = load_approvals(args.approvals)
+        book = WatchedBook(args.input)
+        writer = csv.writer(sys.stdout)
+        for changes in book.follow(approved_locates, args.interval, args.refreshes):
+            writer.writerows((client, f" {symbol}", f" {value}") for (client, symbol), value in changes.items())
+            sys.stdout.flush()
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        print(f"locates_watch: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""Binary outputs of the distributed locates.
+
+write_results_npy writes a directory with a NumPy .npy file per column - client_name.npy and symbol.npy
+(fixed width unicode) and number_of_locates_allocated.npy (int64), rows in the same order as the CSV.
+downstream loaders get the columns with numpy.load and skip CSV parsing; writing does not need NumPy.
+"""
+import ast
+import os
+import struct
+import sys
+from array import array
+
+from locates_task import RESULTS_FIELDNAMES, WRITE_BUFFER_SIZE
+
+NPY_MAGIC = b'\x93NUMPY\x01\x00'
+# rows encoded per write
+BATCH_ROWS = 1 << 16
+
+
+def npy_header(descr: str, rows: int) -> bytes:
+    """returns a version 1.0 .npy header of a 1-d array, padded to 64 bytes as the format asks."""
+    header = repr({'descr': descr, 'fortran_order': False, 'shape': (rows,)})
+    padding = 64 - (len(NPY_MAGIC) + 2 + len(header) + 1) % 64
+    header = (header + ' ' * padding + '\n').encode('latin1')
+    return NPY_MAGIC + struct.pack('<H', len(header)) + header
+
+
+def write_results_npy(distributed_locates: dict[str, dict[str, int]], output_dir: str) -> None:
+    """Writes the distributed locates as a .npy file per column.
+    input:
+    - distributed_locates: {client_name: {symbol: num_of_locates_distributed}}
+    - output_dir: directory for the column files, created if needed.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    rows = sum(len(symbols_granted) for symbols_granted in distributed_locates.values())
+    # fixed width strings - the longest name sets the width
+    client_width = max((len(client) for client, symbols_granted in distributed_locates.items() if symbols_granted), default=1)
+    symbol_width = max((len(symbol) for symbols_granted in distributed_locates.values() for symbol in symbols_granted),
+                       default=1)
+
+    client_path, symbol_path, allocated_path = (os.path.join(output_dir, f"{name}.npy") for name in RESULTS_FIELDNAMES)
+    with open(client_path, 'wb', buffering=WRITE_BUFFER_SIZE) as clients_file, \
+            open(symbol_path, 'wb', buffering=WRITE_BUFFER_SIZE) as symbols_file, \
+            open(allocated_path, 'wb', buffering=WRITE_BUFFER_SIZE) as allocated_file:
+        clients_file.write(npy_header(f'<U{client_width}', rows))
+        symbols_file.write(npy_header(f'<U{symbol_width}', rows))
+        allocated_file.write(npy_header('<i8', rows))
+
+        clients: list[str] = []
+        symbols: list[str] = []
+        allocated = array('q')
+
+        def flush() -> None:
+            """Encodes and writes the batch - utf-32 little endian padded to the column width."""
+            clients_file.write(''.join(client.ljust(client_width, '\0') for client in clients).encode('utf-32-le'))
+            symbols_file.write(''.join(symbol.ljust(symbol_width, '\0') for symbol in symbols).encode('utf-32-le'))
+            if sys.byteorder != 'little':
+                allocated.byteswap()
+            allocated_file.write(allocated.tobytes())
+            clients.clear()
+            symbols.clear()
+            del allocated[:]
+
+        for client, symbols_granted in distributed_locates.items():
+            for symbol, num_of_locates in symbols_granted.items():
+                clients.append(client)
+                symbols.append(symbol)
+                allocated.append(num_of_locates)
+            if len(allocated) >= BATCH_ROWS:
+                flush()
+        flush()
+
+
+def read_npy_column(file_path: str) -> list[str] | list[int]:
+    """Reads a column written by write_results_npy without NumPy.
+    returns the column values as a list.
+    """
+    with open(file_path, 'rb') as npy_file:
+        if npy_file.read(len(NPY_MAGIC)) != NPY_MAGIC:
+            raise ValueError(f"not a version 1.0 .npy file: {file_path}")
+        header_len, = struct.unpack('<H', npy_file.read(2))
+        header = ast.literal_eval(npy_file.read(header_len).decode('latin1'))
+        data = npy_file.read()
+    rows, = header['shape']
+    if header['descr'] == '<i8':
+        values = array('q')
+        values.frombytes(data)
+        if sys.byteorder != 'little':
+            values.byteswap()
+        return values.tolist()
+    width = int(header['descr'][2:])
+    text = data.decode('utf-32-le')
+    return [text[i * width:(i + 1) * width].rstrip('\0') for i in range(rows)]
+
+
+def read_results_npy(output_dir: str) -> dict[str, dict[str, int]]:
+    """Reads the columns written by write_results_npy back.
+    returns {client_name: {symbol: num_of_locates_distributed}} (clients without locates are not kept).
+    """
+    clients, symbols, allocated = (read_npy_column(os.path.join(output_dir, f"{name}.npy")) for name in RESULTS_FIELDNAMES)
+    distributed_locates: dict[str, dict[str, int]] = {}
+    for client, symbol, num_of_locates in zip(clients, symbols, allocated):
+        distributed_locates.setdefault(client, {})[symbol] = num_of_locates
+    return distributed_locates
@@ -0,0 +1,79 @@
+from sys import path as sys_path
+from os import path as os_path
+sys_path.append(os_path.abspath(os_path.join(os_path.dirname(__file__), '..', 'src')))
+
+import pytest
+from locates_task import distribute_locates
+from locates_allocator import LocatesAllocator
+
+
+@pytest.fixture
+def requests():
+    clients_requests = {
+        'ClientA': {'AAPL': 1000, 'GOOG': 800},
+        'ClientB': {'AAPL': 500, 'MSFT': 400},
+        'ClientC': {'AAPL': 300, 'GOOG': 200},
+        'ClientD': {'MSFT': 100},
+    }
+    req_by_symbol_clients_percentage = {
+        'AAPL': {'ClientA': 1000 / 1800, 'ClientB': 500 / 1800, 'ClientC': 300 / 1800},
+        'GOOG': {'ClientA': 0.8, 'ClientC': 0.2},
+        'MSFT': {'ClientB': 0.8, 'ClientD': 0.2},
+    }
+    chunk_pr_symbol = {'AAPL': 100, 'GOOG': 100, 'MSFT': 100}
+    return clients_requests, req_by_symbol_clients_percentage, chunk_pr_symbol
+
+
+def test_updates_match_full_distribution(requests):
+    clients_requests, req_by_symbol_clients_percentage, chunk_pr_symbol = requests
+    allocator = LocatesAllocator(clients_requests, req_by_symbol_clients_percentage, chunk_pr_symbol)
+    approved = {}
+    for symbol, total in [('AAPL', 1570), ('GOOG', 800), ('MSFT', 400), ('AAPL', 900)]:
+        allocator.update(symbol, total)
+        approved[symbol] = total
+        assert allocator.allocations == distribute_locates(clients_requests, approved, req_by_symbol_clients_percentage,
+                                                           chunk_pr_symbol)
+    assert allocator.approved_locates == approved
+
+
+def test_update_returns_changed_cells(requests):
+    allocator = LocatesAllocator(*requests)
+
+    assert allocator.update('GOOG', 800) == {('ClientA', 'GOOG'): 600, ('ClientC', 'GOOG'): 200}
+    # ClientC stays at 200
+    assert allocator.update('GOOG', 1000) == {('ClientA', 'GOOG'): 800}
+    assert allocator.update('GOOG', 1000) == {}
+
+
+def test_changes_since_last_call(requests):
+    allocator = LocatesAllocator(*requests)
+    allocator.update('MSFT', 400)
+    assert allocator.changes() == {('ClientB', 'MSFT'): 300, ('ClientD', 'MSFT'): 100}
+    assert allocator.changes() == {}
+
+    allocator.update('MSFT', 500)
+    allocator.update('GOOG', 800)
+    assert allocator.changes() == {('ClientB', 'MSFT'): 400, ('ClientA', 'GOOG'): 600, ('ClientC', 'GOOG'): 200}
+
+    # a cell that went back to the value downstream has is not a change
+    allocator.update('MSFT', 400)
+    allocator.update('MSFT', 500)
+    assert allocator.changes() == {}
+
+
+def test_unknown_symbol(requests):
+    allocator = LocatesAllocator(*requests)
+    with pytest.raises(KeyError):
+        allocator.update('TSLA', 100)
+
+
+def test_add_request_stores_the_validated_values(requests):
+    allocator = LocatesAllocator(*requests)
+    allocator.update('MSFT', 500)
+    # fields as they come from a request body - strings
+    allocator.add_request('ClientE', 'MSFT', '500', '100')
+    assert allocator.clients_requests['ClientE'] == {'MSFT': 500}
+    assert allocator.aggregate_symbols['MSFT'] == 1000
+    assert allocator.allocations == distribute_locates(allocator.clients_requests, {'MSFT': 500},
+                                                       allocator.req_by_symbol_clients_percentage,
+                                                       allocator.chunk_pr_symbol)
@@ -0,0 +1,87 @@
+from sys import path as sys_path
+from os import path as os_path
+sys_path.append(os_path.abspath(os_path.join(os_path.dirname(__file__), '..', 'src')))
+
+import asyncio
+import pytest
+from locates_task import distribute_locates, request_locates
+from locates_allocator import LocatesAllocator
+from locates_broker import BrokerError, SimulatedBroker, request_approvals
+
+AGGREGATE = {f"SYM{i}": 100 * (i + 1) for i in range(1000)}
+
+
+class FlakyBroker(SimulatedBroker):
+    """Fails the first few requests."""
+
+    def __init__(self, failures: int, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.failures = failures
+
+    async def request(self, requested_locates):
+        if self.failures:
+            self.failures -= 1
+            raise BrokerError("request failed")
+        return await super().request(requested_locates)
+
+
+def test_simulated_approvals():
+    approved = SimulatedBroker(seed=1).approve(AGGREGATE)
+    # ~70% of the symbols, never above the cap or the request, at least half of it
+    assert 600 < len(approved) < 800
+    assert all(min(AGGREGATE[symbol], 1000) // 2 <= total <= min(AGGREGATE[symbol], 1000)
+               for symbol, total in approved.items())
+    assert set(request_locates(AGGREGATE)) <= set(AGGREGATE)
+
+
+def test_batches_and_in_flight_limit():
+    broker = SimulatedBroker(latency=0.01, approve_probability=1.0, max_symbols=100, seed=0)
+    approved = asyncio.run(request_approvals(AGGREGATE, broker, batch_size=100, max_in_flight=3))
+
+    assert set(approved) == set(AGGREGATE)
+    assert broker.requests == 10
+    assert broker.max_in_flight == 3
+
+
+def test_oversized_batches_fail():
+    broker = SimulatedBroker(latency=0, max_symbols=100)
+    with pytest.raises(BrokerError, match="no approvals for 1000 symbols"):
+        asyncio.run(request_approvals(AGGREGATE, broker, batch_size=500, retries=1, retry_delay=0))
+
+
+def test_failed_batches_retried():
+    broker = FlakyBroker(failures=4, latency=0, approve_probability=1.0)
+    approved = asyncio.run(request_approvals(AGGREGATE, broker, batch_size=250, retries=2, retry_delay=0))
+
+    assert set(approved) == set(AGGREGATE)
+    assert broker.requests == 4
+
+
+def test_distribution_as_approvals_land():
+    clients_requests = {'Client1': {'SYM0': 300, 'SYM1': 100}, 'Client2': {'SYM0': 200, 'SYM2': 200}}
+    req_by_symbol_clients_percentage = {'SYM0': {'Client1': 0.6, 'Client2': 0.4}, 'SYM1': {'Client1': 1.0},
+                                        'SYM2': {'Client2': 1.0}}
+    chunk_pr_symbol = {'SYM0': 100, 'SYM1': 100, 'SYM2': 100}
+    allocator = LocatesAllocator(clients_requests, req_by_symbol_clients_percentage, chunk_pr_symbol)
+    landed = []
+
+    def on_approved(symbol, total):
+        landed.append(symbol)
+        allocator.update(symbol, total)
+
+    broker = SimulatedBroker(latency=0.01, seed=3)
+    approved = asyncio.run(request_approvals({'SYM0': 500, 'SYM1': 100, 'SYM2': 200}, broker, batch_size=1,
+                                             on_approved=on_approved))
+    assert sorted(landed) == sorted(approved)
+    assert allocator.allocations == distribute_locates(clients_requests, approved, req_by_symbol_clients_percentage,
+                                                       chunk_pr_symbol)
+
+
+def test_callback_errors_are_not_broker_errors():
+    broker = SimulatedBroker(latency=0, approve_probability=1.0)
+
+    def on_approved(symbol, total):
+        raise ZeroDivisionError(symbol)
+
+    with pytest.raises(ZeroDivisionError):
+        asyncio.run(request_approvals(AGGREGATE, broker, batch_size=250, on_approved=on_approved))
@@ -0,0 +1,78 @@
+from sys import path as sys_path
+from os import path as os_path
+sys_path.append(os_path.abspath(os_path.join(os_path.dirname(__file__), '..', 'src')))
+
+import random
+import pytest
+from locates_task import csv_parser, distribute_locates, create_results_csv
+from locates_by_symbol import (csv_parser_by_symbol, distribute_locates_by_symbol, distribute_symbol_requests,
+                               transpose_locates, ClientLocates)
+
+HEADER = "client_name, symbol, number_of_locates_requested, round_lot_size\n"
+
+
+@pytest.fixture
+def requests_csv(tmp_path):
+    p = tmp_path / "requests.csv"
+    p.write_text(HEADER + "Alice, AAPL, 500, 100\nBob, AAPL, 300, 100\nBob, MSFT, 200, 100\n"
+                 "Carl, MSFT, 400, 100\nCarl, MSFT, 300, 100\nDana, TSLA, 100, 100\nEve, TSLA, 150, 100\n")
+    return p
+
+
+def test_parser(requests_csv):
+    requests_by_symbol, aggregate_symbols, chunk_pr_symbol, clients = csv_parser_by_symbol(str(requests_csv))
+    # duplicates - the last request is kept, the total counts both
+    assert requests_by_symbol == {'AAPL': {'Alice': 500, 'Bob': 300}, 'MSFT': {'Bob': 200, 'Carl': 300},
+                                  'TSLA': {'Dana': 100}}
+    assert aggregate_symbols == {'AAPL': 800, 'MSFT': 900, 'TSLA': 100}
+    assert chunk_pr_symbol == {'AAPL': 100, 'MSFT': 100, 'TSLA': 100}
+    assert list(clients) == ['Alice', 'Bob', 'Carl', 'Dana']
+
+
+@pytest.mark.parametrize("clients_requested, total, expected", [
+    ({'A': 500, 'B': 300}, 800, {'A': 500, 'B': 300}),
+    ({'A': 500, 'B': 300}, 1000, {'A': 500, 'B': 300}),
+    ({'A': 500, 'B': 300}, 400, {'A': 300, 'B': 100}),
+])
+def test_distribute_symbol_requests(clients_requested, total, expected):
+    assert distribute_symbol_requests(clients_requested, total, sum(clients_requested.values()), 100) == expected
+
+
+def test_same_as_distribute_locates(tmp_path):
+    rng = random.Random(7)
+    for _ in range(50):
+        rows = [f"C{rng.randint(0, 20)}, S{rng.randint(0, 5)}, {100 * rng.randint(1, 20)}, 100\n" for _ in range(60)]
+        p = tmp_path / "requests.csv"
+        p.write_text(HEADER + ''.join(rows))
+        clients_requests, aggregate_symbols, req_by_symbol_clients_percentage, chunk_pr_symbol = csv_parser(str(p))
+        approved = {symbol: rng.randint(0, total) for symbol, total in aggregate_symbols.items()}
+        expected = distribute_locates(clients_requests, approved, req_by_symbol_clients_percentage, chunk_pr_symbol)
+
+        requests_by_symbol, aggregate_symbols, chunk_pr_symbol, clients = csv_parser_by_symbol(str(p))
+        distributed_by_symbol = distribute_locates_by_symbol(requests_by_symbol, approved, aggregate_symbols, chunk_pr_symbol)
+        transposed = transpose_locates(distributed_by_symbol, clients)
+        assert transposed == expected
+        # same order of clients and of every client's symbols
+        assert [list(symbols.items()) for symbols in transposed.values()] == [list(symbols.items()) for symbols in expected.values()]
+
+
+def test_client_locates_is_lazy(requests_csv, tmp_path):
+    approved = {'AAPL': 400, 'MSFT': 500}
+    requests_by_symbol, aggregate_symbols, chunk_pr_symbol, clients = csv_parser_by_symbol(str(requests_csv))
+    distributed_by_symbol = distribute_locates_by_symbol(requests_by_symbol, approved, aggregate_symbols, chunk_pr_symbol)
+    view = ClientLocates(distributed_by_symbol, clients)
+    assert len(view) == 4 and list(view) == ['Alice', 'Bob', 'Carl', 'Dana']
+    assert not view.transposed
+
+    parsed = csv_parser(str(requests_csv))
+    expected = distribute_locates(parsed[0], approved, parsed[2], parsed[3])
+    assert view['Alice'] == {'AAPL': 300}
+    assert view['Dana'] == {}
+    assert view.transposed
+    assert view == expected
+
+    output = tmp_path / "results.csv"
+    expected_output = tmp_path / "expected.csv"
+    create_results_csv(view, str(output))
+    create_results_csv(expected, str(expected_output))
+    assert output.read_text() == expected_output.read_text()
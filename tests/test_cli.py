@@ -0,0 +1,126 @@
+from sys import path as sys_path
+from os import path as os_path
+sys_path.append(os_path.abspath(os_path.join(os_path.dirname(__file__), '..', 'src')))
+
+import json
+import subprocess
+import sys
+import pytest
+from locates import main, load_approvals
+from locates_task import csv_parser, distribute_locates, iter_distribute_locates, create_results_csv
+
+SRC_DIR = os_path.abspath(os_path.join(os_path.dirname(__file__), '..', 'src'))
+HEADER = "client_name, symbol, number_of_locates_requested, round_lot_size\n"
+REQUESTS = HEADER + (
+    "Alice, AAPL, 500, 100\n"
+    "Bob, AAPL, 300, 100\n"
+    "Bob, MSFT, 200, 100\n"
+    "Carl, MSFT, 400, 100\n"
+    "Dana, TSLA, 100, 100\n"
+)
+APPROVED = {'AAPL': 600, 'MSFT': 400}
+
+
+@pytest.fixture
+def requests_csv(tmp_path):
+    p = tmp_path / "requests.csv"
+    p.write_text(REQUESTS)
+    return p
+
+
+@pytest.fixture
+def approvals_json(tmp_path):
+    p = tmp_path / "approved.json"
+    p.write_text(json.dumps(APPROVED))
+    return p
+
+
+@pytest.fixture
+def expected_csv(requests_csv, tmp_path):
+    parsed = csv_parser(str(requests_csv))
+    distributed = distribute_locates(parsed[0], APPROVED, parsed[2], parsed[3])
+    p = tmp_path / "expected.csv"
+    create_results_csv(distributed, str(p))
+    return p.read_text()
+
+
+def run_cli(*args, stdin=None):
+    return subprocess.run([sys.executable, '-m', 'locates', *args], cwd=SRC_DIR, input=stdin,
+                          capture_output=True, text=True)
+
+
+def test_files(requests_csv, approvals_json, expected_csv, tmp_path):
+    output = tmp_path / "results.csv"
+    assert main([str(requests_csv), str(output), '--approvals', str(approvals_json)]) == 0
+    assert output.read_text() == expected_csv
+
+
+def test_pushdown(requests_csv, approvals_json, expected_csv, tmp_path):
+    output = tmp_path / "results.csv"
+    assert main([str(requests_csv), str(output), '--approvals', str(approvals_json), '--pushdown']) == 0
+    assert output.read_text() == expected_csv
+    with pytest.raises(SystemExit):
+        main(['-', '--approvals', str(approvals_json), '--pushdown'])
+
+
+def test_stdin_stdout(approvals_json, expected_csv):
+    result = run_cli('-', '-', '--approvals', str(approvals_json), stdin=REQUESTS)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout == expected_csv
+
+
+@pytest.mark.parametrize("workers", ['1', '2'])
+def test_stream(approvals_json, expected_csv, workers):
+    result = run_cli('-', '--approvals', str(approvals_json), '--stream', '--workers', workers, stdin=REQUESTS)
+    assert result.returncode == 0, result.stderr
+    lines = result.stdout.splitlines()
+    expected = expected_csv.splitlines()
+    # symbol by symbol instead of client by client - same rows
+    assert lines[0] == expected[0]
+    assert sorted(lines[1:]) == sorted(expected[1:])
+
+
+def test_unknown_approved_symbol(requests_csv, tmp_path, capsys):
+    approvals = tmp_path / "approved.csv"
+    approvals.write_text("symbol, number_of_locates_approved\nAAPL, 600\nNOPE, 100\n")
+    output = tmp_path / "results.csv"
+    assert main([str(requests_csv), str(output), '--approvals', str(approvals)]) == 0
+    assert "NOPE" in capsys.readouterr().err
+    assert "AAPL" in output.read_text()
+
+
+@pytest.mark.parametrize("content, name", [
+    ('{"AAPL": 600, "MSFT": "400"}', "approved.json"),
+    ("symbol,number_of_locates_approved\nAAPL, 600\nMSFT,400\n", "approved.csv"),
+])
+def test_load_approvals(tmp_path, content, name):
+    p = tmp_path / name
+    p.write_text(content)
+    assert load_approvals(str(p)) == APPROVED
+
+
+@pytest.mark.parametrize("content, name", [
+    ('[1, 2]', "approved.json"),
+    ('{"AAPL": -1}', "approved.json"),
+    ("symbol,approved\nAAPL,600\n", "approved.csv"),
+    ("symbol,number_of_locates_approved\nAAPL,x\n", "approved.csv"),
+    ("AAPL 600", "approved.txt"),
+])
+def test_load_approvals_invalid(tmp_path, content, name):
+    p = tmp_path / name
+    p.write_text(content)
+    with pytest.raises(ValueError):
+        load_approvals(str(p))
+
+
+def test_errors(requests_csv, approvals_json, tmp_path):
+    with pytest.raises(SystemExit):
+        main([str(requests_csv), '--approvals', str(approvals_json), '--format', 'npy'])
+    assert main([str(tmp_path / "missing.csv"), '--approvals', str(approvals_json)]) == 1
+
+
+def test_iter_distribute_locates(requests_csv):
+    parsed = csv_parser(str(requests_csv))
+    distributed = distribute_locates(parsed[0], APPROVED, parsed[2], parsed[3])
+    for symbol, symbol_distributed in iter_distribute_locates(parsed[0], APPROVED, parsed[2], parsed[3]):
+        assert symbol_distributed == {client: symbols[symbol] for client, symbols in distributed.items() if symbol in symbols}
@@ -0,0 +1,88 @@
+from sys import path as sys_path
+from os import path as os_path
+sys_path.append(os_path.abspath(os_path.join(os_path.dirname(__file__), '..', 'src')))
+
+from locates_task import csv_parser, csv_parser_streaming
+import pytest
+
+HEADER = "client_name, symbol, number_of_locates_requested, round_lot_size\n"
+
+# Test the streaming parser gives the same result as csv_parser
+@pytest.mark.parametrize("content", [
+    HEADER + "Alice, AAPL, 500, 100\nBob, AAPL, 300, 100\nBob, MSFT, 200, 100\n",
+    # windows line endings and no new line at the end of the file
+    HEADER.replace("\n", "\r\n") + "Alice, AAPL, 500, 100\r\nBob, AAPL, 300, 100\r\nBob, MSFT, 200, 100",
+    # invalid rows - missing fields, empty strings, bad numbers, non multiples, extra fields
+    HEADER + "Alice, AAPL\n   , AAPL, 100, 100\nBob, , 100, 100\nCarl, TSLA, abc, 100\n"
+             "Dave, TSLA, 150, 100\nEve, TSLA, 100, 0\nFrank, TSLA, -100, 100\nGil, TSLA, 200, 100, extra\n",
+    # blank lines, quoted fields and a quoted field over two lines
+    HEADER + "\n\n\"Smith, John\", AAPL, 100, 100\n\"Multi\nLine\", MSFT, 200, 100\nZed, MSFT, 300, 100\n",
+    # spaces at the start of the first field are skipped too, a line of spaces is a row
+    HEADER + " Alice, AAPL, 500, 100\n  Bob,  AAPL, 300, 100\n   \n   , MSFT, 100, 100\nCarl, MSFT, 200, 100\n",
+    # a quote in the middle of a field is a literal one - it doesn't open a quoted field
+    HEADER + "Bob,A\"B,100,100\n\"Multi\nline\", MSFT, 200, 100\nZed, MSFT, 300, 100\n",
+    # doubled quotes inside a quoted field, text after the closing quote
+    HEADER + "\"Smith \"\"J\"\"\nJohn\", AAPL, 100, 100\n\"A\"B, AAPL, 200, 100\nZed, AAPL, 300, 100\n",
+    # a quoted field keeps its windows new line
+    HEADER.replace("\n", "\r\n") + "\"Multi\r\nLine\", MSFT, 200, 100\r\n\r\nZed, MSFT, 300, 100\r\n",
+    # a quoted field that is never closed takes the rest of the file
+    HEADER + "Alice, AAPL, 100, 100\nBob, \"AAPL, 200, 100\nCarl, AAPL, 300, 100\n",
+    # the first lot size of a symbol is the one that counts
+    HEADER + "Alice, AAPL, 500, 100\nBob, AAPL, 30, 10\n",
+    # columns in another order
+    "symbol,round_lot_size,client_name,number_of_locates_requested\nAAPL,100,Alice,200\nAAPL,100,Bob,300\n",
+    # missing header field - every row is invalid
+    "symbol,lot,client_name,number_of_locates_requested\nAAPL,100,Alice,200\n",
+])
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 20])
+def test_streaming_matches_csv_parser(tmp_path, content, chunk_size):
+    p = tmp_path / "requests.csv"
+    p.write_bytes(content.encode())
+
+    assert csv_parser_streaming(str(p), chunk_size) == csv_parser(str(p))
+
+
+def test_streaming_keeps_client_order(tmp_path):
+    p = tmp_path / "requests.csv"
+    p.write_text(HEADER + "".join(f"Client{i}, S{i % 7}, {100 * (i % 5 + 1)}, 100\n" for i in range(500)))
+
+    expected = csv_parser(str(p))
+    result = csv_parser_streaming(str(p), 64)
+    assert result == expected
+    assert list(result[0]) == list(expected[0])
+    assert [list(clients) for clients in result[2].values()] == [list(clients) for clients in expected[2].values()]
+
+
+def test_streaming_rows_after_a_literal_quote(tmp_path):
+    # the rows after O"Brien are plain ones, not the lines of an open quoted field
+    p = tmp_path / "requests.csv"
+    p.write_text(HEADER + 'O"Brien, AAPL, 100, 100\n' +
+                 "".join(f"Client{i}, S{i % 7}, {100 * (i % 5 + 1)}, 100\n" for i in range(20000)))
+
+    assert csv_parser_streaming(str(p), 1 << 12) == csv_parser(str(p))
+
+
+# Tests for the common exceptions
+def test_streaming_file_not_found():
+    with pytest.raises(FileExistsError, match="invalid file path - the file not found"):
+        csv_parser_streaming("path/that/does/not/exist.csv")
+
+
+def test_streaming_not_a_csv(tmp_path):
+    p = tmp_path / "invalid.txt"
+    p.write_text("This is just plain text, not a CSV file.")
+
+    with pytest.raises(Exception, match="Failed to parse CSV"):
+        csv_parser_streaming(str(p))
+
+
+@pytest.mark.parametrize("bad_csv_content", [
+    "",
+    "col1,col2\nval1,val2",
+])
+def test_streaming_wrong_column_count(tmp_path, bad_csv_content):
+    p = tmp_path / "wrong_columns.csv"
+    p.write_text(bad_csv_content)
+
+    with pytest.raises(Exception, match="the csv file is in the wrong format"):
+        csv_parser_streaming(str(p))
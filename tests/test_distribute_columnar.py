@@ -0,0 +1,74 @@
+from sys import path as sys_path
+from os import path as os_path
+sys_path.append(os_path.abspath(os_path.join(os_path.dirname(__file__), '..', 'src')))
+
+import random
+import pytest
+pytest.importorskip("numpy")
+from locates_task import distribute_locates, create_results_csv
+from locates_columnar import ColumnarRequests, distribute_locates_columnar
+import test_distribute_locates as dict_engine_cases
+
+
+def random_requests(rng, n_clients, n_symbols):
+    """Builds random csv_parser like structures and approvals (some symbols over approved, some not approved)."""
+    clients_requests, aggregate_symbols, req_by_symbol_clients_percentage, chunk_pr_symbol = {}, {}, {}, {}
+    for s in range(n_symbols):
+        chunk_pr_symbol[f"S{s}"] = rng.choice((1, 10, 100, 1000))
+    for c in range(n_clients):
+        for s in rng.sample(range(n_symbols), rng.randint(1, min(4, n_symbols))):
+            symbol = f"S{s}"
+            requested = chunk_pr_symbol[symbol] * rng.randint(1, 30)
+            clients_requests.setdefault(f"C{c}", {})[symbol] = requested
+            aggregate_symbols[symbol] = aggregate_symbols.get(symbol, 0) + requested
+            req_by_symbol_clients_percentage.setdefault(symbol, {})[f"C{c}"] = requested
+    for symbol, clients in req_by_symbol_clients_percentage.items():
+        req_by_symbol_clients_percentage[symbol] = {c: req / aggregate_symbols[symbol] for c, req in clients.items()}
+    approved_locates = {symbol: rng.randint(0, int(total * 1.2))
+                        for symbol, total in aggregate_symbols.items() if rng.random() < 0.8}
+    return clients_requests, approved_locates, req_by_symbol_clients_percentage, chunk_pr_symbol
+
+
+def assert_identical(tmp_path, clients_requests, approved_locates, req_by_symbol_clients_percentage, chunk_pr_symbol):
+    expected = distribute_locates(clients_requests, approved_locates, req_by_symbol_clients_percentage, chunk_pr_symbol)
+    result = distribute_locates_columnar(clients_requests, approved_locates, req_by_symbol_clients_percentage, chunk_pr_symbol)
+    assert result == expected
+
+    # byte-identical output - same order and same types
+    create_results_csv(expected, str(tmp_path / "expected.csv"))
+    create_results_csv(result, str(tmp_path / "result.csv"))
+    assert (tmp_path / "result.csv").read_bytes() == (tmp_path / "expected.csv").read_bytes()
+    assert all(type(value) is int for symbols in result.values() for value in symbols.values())
+
+
+# the cases of test_distribute_locates.py (with a lot size of 100)
+@pytest.mark.parametrize("case", [
+    *dict_engine_cases.test_distribute_locates.pytestmark[0].args[1],
+    *dict_engine_cases.test_distribute_locates_exceeding_approved.pytestmark[0].args[1],
+])
+def test_columnar_matches_dict_engine_cases(tmp_path, case):
+    clients_requests, approved_locates, req_by_symbol_clients_percentage, _ = case
+    chunk_pr_symbol = {symbol: 100 for symbol in req_by_symbol_clients_percentage}
+    assert_identical(tmp_path, clients_requests, approved_locates, req_by_symbol_clients_percentage, chunk_pr_symbol)
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_columnar_matches_dict_engine_random(tmp_path, seed):
+    rng = random.Random(seed)
+    requests = random_requests(rng, rng.randint(1, 400), rng.randint(1, 25))
+    assert_identical(tmp_path, *requests)
+
+
+def test_columnar_requests_reused_between_rounds():
+    rng = random.Random(7)
+    clients_requests, _, req_by_symbol_clients_percentage, chunk_pr_symbol = random_requests(rng, 300, 10)
+    requests = ColumnarRequests(clients_requests, req_by_symbol_clients_percentage, chunk_pr_symbol)
+    for _ in range(5):
+        approved_locates = {symbol: rng.randint(0, 5000) for symbol in req_by_symbol_clients_percentage}
+        assert requests.distribute(approved_locates) == distribute_locates(
+            clients_requests, approved_locates, req_by_symbol_clients_percentage, chunk_pr_symbol)
+
+
+def test_columnar_unknown_symbol():
+    with pytest.raises(KeyError):
+        distribute_locates_columnar({'Client1': {'ABC': 100}}, {'XYZ': 100}, {'ABC': {'Client1': 1.0}}, {'ABC': 100})
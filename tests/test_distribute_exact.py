@@ -0,0 +1,50 @@
+from sys import path as sys_path
+from os import path as os_path
+sys_path.append(os_path.abspath(os_path.join(os_path.dirname(__file__), '..', 'src')))
+
+import random
+import pytest
+from locates_task import csv_parser, csv_parser_streaming, distribute_locates_exact, distribute_symbol_exact
+
+HEADER = "client_name, symbol, number_of_locates_requested, round_lot_size\n"
+
+
+@pytest.mark.parametrize("clients_requested, total, expected", [
+    # exact proportion
+    ({'Client1': 300, 'Client2': 200}, 400, {'Client1': 200, 'Client2': 200}),
+    # approved more then requested
+    ({'Client1': 200, 'Client2': 300}, 600, {'Client1': 200, 'Client2': 300}),
+    # nothing approved
+    ({'Client1': 200, 'Client2': 300}, 0, {'Client1': 0, 'Client2': 0}),
+    # largest remainder - 1570 of 1800: 872.2, 436.1, 261.6 -> 872, 436, 262 then rounded to lots
+    ({'ClientA': 1000, 'ClientB': 500, 'ClientC': 300}, 1570, {'ClientA': 900, 'ClientB': 422, 'ClientC': 248}),
+])
+def test_distribute_symbol_exact(clients_requested, total, expected):
+    assert distribute_symbol_exact(clients_requested, total, sum(clients_requested.values()), 100) == expected
+
+
+# the whole approved amount is distributed exactly, never more then requested - even for big totals
+@pytest.mark.parametrize("seed", range(30))
+def test_exact_conserves_total(seed):
+    rng = random.Random(seed)
+    round_lot_size = rng.choice((1, 100, 1000))
+    clients_requested = {f"Client{i}": round_lot_size * rng.randint(1, 10 ** rng.randint(1, 9))
+                         for i in range(rng.randint(1, 500))}
+    total_requested = sum(clients_requested.values())
+    total = rng.randint(0, total_requested)
+
+    distributed = distribute_symbol_exact(clients_requested, total, total_requested, round_lot_size)
+    assert sum(distributed.values()) == total
+    assert all(0 <= distributed[client] <= requested for client, requested in clients_requested.items())
+
+
+@pytest.mark.parametrize("parser", [csv_parser, csv_parser_streaming])
+def test_parser_without_percentages(tmp_path, parser):
+    p = tmp_path / "requests.csv"
+    p.write_text(HEADER + "Client1, ABC, 300, 100\nClient2, QQQ, 100, 100\nClient2, ABC, 200, 100\n")
+
+    clients_requests, aggregate_symbols, req_by_symbol_clients, chunk_pr_symbol = parser(str(p), percentages=False)
+    assert req_by_symbol_clients == {'ABC': {'Client1': 300, 'Client2': 200}, 'QQQ': {'Client2': 100}}
+    assert distribute_locates_exact(clients_requests, {'ABC': 450, 'QQQ': 90}, req_by_symbol_clients,
+                                    aggregate_symbols, chunk_pr_symbol) == {
+        'Client1': {'ABC': 250}, 'Client2': {'ABC': 200, 'QQQ': 90}}
@@ -0,0 +1,61 @@
+from sys import path as sys_path
+from os import path as os_path
+sys_path.append(os_path.abspath(os_path.join(os_path.dirname(__file__), '..', 'src')))
+
+import random
+import pytest
+from locates_task import distribute_locates
+from locates_parallel import make_shards
+
+
+def random_requests(rng, n_clients, n_symbols):
+    """Builds random csv_parser like structures, the first symbol is requested by every client."""
+    clients_requests, aggregate_symbols, req_by_symbol_clients_percentage = {}, {}, {}
+    chunk_pr_symbol = {f"S{s}": 100 for s in range(n_symbols)}
+    for c in range(n_clients):
+        for s in {0, rng.randrange(n_symbols)}:
+            requested = 100 * rng.randint(1, 20)
+            clients_requests.setdefault(f"C{c}", {})[f"S{s}"] = requested
+            aggregate_symbols[f"S{s}"] = aggregate_symbols.get(f"S{s}", 0) + requested
+            req_by_symbol_clients_percentage.setdefault(f"S{s}", {})[f"C{c}"] = requested
+    for symbol, clients in req_by_symbol_clients_percentage.items():
+        req_by_symbol_clients_percentage[symbol] = {c: req / aggregate_symbols[symbol] for c, req in clients.items()}
+    approved_locates = {symbol: int(total * rng.uniform(0.3, 1.1)) for symbol, total in aggregate_symbols.items()}
+    return clients_requests, approved_locates, req_by_symbol_clients_percentage, chunk_pr_symbol
+
+
+@pytest.mark.parametrize("workers", [2, 3])
+def test_parallel_matches_single_process(workers):
+    clients_requests, approved_locates, req_by_symbol_clients_percentage, chunk_pr_symbol = \
+        random_requests(random.Random(workers), 2000, 30)
+
+    expected = distribute_locates(clients_requests, approved_locates, req_by_symbol_clients_percentage, chunk_pr_symbol)
+    result = distribute_locates(clients_requests, approved_locates, req_by_symbol_clients_percentage, chunk_pr_symbol,
+                                workers=workers)
+    assert result == expected
+    # same order of clients and of their symbols
+    assert [(client, list(symbols)) for client, symbols in result.items()] == \
+           [(client, list(symbols)) for client, symbols in expected.items()]
+
+
+def test_shards_balanced_by_clients():
+    clients_requests, approved_locates, req_by_symbol_clients_percentage, chunk_pr_symbol = \
+        random_requests(random.Random(0), 1000, 50)
+
+    shards = make_shards(clients_requests, approved_locates, req_by_symbol_clients_percentage, chunk_pr_symbol, 4)
+    loads = [sum(len(clients) for _, _, _, clients, _, _ in shard) for shard in shards]
+    # the symbol everyone requested gets a shard of its own
+    assert [symbol for symbol, *_ in shards[0]] == ['S0']
+    assert max(loads[1:]) - min(loads[1:]) <= max(len(clients) for shard in shards[1:] for _, _, _, clients, _, _ in shard)
+    # every approved symbol once
+    assert sorted(symbol for shard in shards for symbol, *_ in shard) == sorted(approved_locates)
+
+
+def test_more_workers_than_symbols():
+    clients_requests = {'Client1': {'ABC': 300}, 'Client2': {'ABC': 200}}
+    req_by_symbol_clients_percentage = {'ABC': {'Client1': 0.6, 'Client2': 0.4}}
+
+    shards = make_shards(clients_requests, {'ABC': 400}, req_by_symbol_clients_percentage, {'ABC': 100}, 8)
+    assert len(shards) == 1
+    assert distribute_locates(clients_requests, {'ABC': 400}, req_by_symbol_clients_percentage, {'ABC': 100},
+                              workers=8) == {'Client1': {'ABC': 200}, 'Client2': {'ABC': 200}}
@@ -0,0 +1,81 @@
+from sys import path as sys_path
+from os import path as os_path
+sys_path.append(os_path.abspath(os_path.join(os_path.dirname(__file__), '..', 'src')))
+
+import random
+import pytest
+from locates_harness import (ENGINES, Book, register_engine, random_rows, check_invariants, fairness, differences,
+                             run_engines, failures)
+
+ROWS = [('Alice', 'AAPL', 500, 100), ('Bob', 'AAPL', 300, 100), ('Carl', 'MSFT', 200, 100)]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_engines_keep_their_promises(seed):
+    rng = random.Random(seed)
+    # the process pool is slow to start - a few books are enough for it
+    engines = [name for name in ENGINES if name != 'parallel']
+    for _ in range(40):
+        book = Book.from_rows(random_rows(rng, clients=rng.randint(1, 40), symbols=rng.randint(1, 15),
+                                          requests=rng.randint(1, 150)), rng=rng)
+        report = run_engines(book, engines)
+        assert failures(report) == []
+
+
+def test_parallel_engine():
+    book = Book.from_rows(random_rows(random.Random(3), requests=300), rng=random.Random(3))
+    assert failures(run_engines(book, ['parallel'])) == []
+
+
+def test_legacy_drift_is_reported():
+    # 2.67 and 2.29 round up - 9 locates out of 8
+    book = Book.from_rows([('A', 'X', 70, 10), ('B', 'X', 40, 10), ('C', 'X', 20, 10), ('D', 'X', 80, 10)], {'X': 8})
+    report = run_engines(book, ['legacy', 'exact'])
+    assert report['legacy']['over_approved'] == 1 and report['legacy']['drift'] == 1
+    assert report['exact']['drift'] == 0
+    # legacy doesn't promise conservation
+    assert failures(report) == []
+
+
+@pytest.mark.parametrize("distributed, expected", [
+    ({'Alice': {'AAPL': 300}, 'Bob': {'AAPL': 100}, 'Carl': {}}, {}),
+    ({'Alice': {'AAPL': 600}, 'Bob': {'AAPL': 0}, 'Carl': {}}, {'over_requested': 1, 'over_approved': 1,
+                                                                'drift_symbols': 1, 'drift': 200}),
+    ({'Alice': {'AAPL': 350}, 'Bob': {'AAPL': 50}, 'Carl': {}}, {'lot_violations': 1}),
+    ({'Alice': {'AAPL': 250}, 'Bob': {'AAPL': 100}, 'Carl': {}}, {'drift_symbols': 1, 'drift': 50}),
+    ({'Alice': {'AAPL': 300}, 'Bob': {'AAPL': 100}, 'Carl': {'MSFT': 100}}, {'unexpected_cells': 1}),
+])
+def test_check_invariants(distributed, expected):
+    book = Book.from_rows(ROWS, {'AAPL': 400})
+    report = check_invariants(book, distributed)
+    assert {check: count for check, count in report.items() if count} == expected
+
+
+def test_fairness():
+    book = Book.from_rows(ROWS, {'AAPL': 400, 'MSFT': 1000})
+    # deserved 250 and 150 for AAPL, all 200 for Carl
+    assert fairness(book, {'Alice': {'AAPL': 300}, 'Bob': {'AAPL': 100}, 'Carl': {'MSFT': 200}}) == 100
+    assert fairness(book, {'Alice': {'AAPL': 200}, 'Bob': {'AAPL': 200}, 'Carl': {'MSFT': 100}}) == 200
+
+
+def test_differences():
+    assert differences({'A': {'X': 1}, 'B': {}}, {'A': {'X': 1}, 'B': {}}) == 0
+    assert differences({'A': {'X': 1}, 'B': {'X': 2}}, {'A': {'X': 2}, 'B': {}}) == 2
+
+
+def test_register_engine():
+    @register_engine('halves', reference='legacy')
+    def halves(book):
+        return {client: {symbol: requested // 2 for symbol, requested in symbols.items()
+                         if symbol in book.approved_locates}
+                for client, symbols in book.clients_requests.items()}
+
+    try:
+        book = Book.from_rows(ROWS, {'AAPL': 400, 'MSFT': 200})
+        report = run_engines(book, ['halves'])
+        messages = failures(report)
+        assert report['halves']['differences'] == 3
+        assert any(message.startswith('halves: differences') for message in messages)
+        assert any(message.startswith('halves: drift') for message in messages)
+    finally:
+        del ENGINES['halves']
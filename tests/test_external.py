@@ -0,0 +1,105 @@
+from sys import path as sys_path
+from os import path as os_path
+sys_path.append(os_path.abspath(os_path.join(os_path.dirname(__file__), '..', 'src')))
+
+import csv
+import os
+import random
+import pytest
+from locates import main
+from locates_task import csv_parser, distribute_locates, create_results_csv
+from locates_external import PartitionedBook, distribute_external, iter_distribute_external, symbol_partition
+
+HEADER = "client_name, symbol, number_of_locates_requested, round_lot_size\n"
+
+
+def read_rows(file_path):
+    with open(file_path, newline='') as csv_file:
+        return list(csv.reader(csv_file))
+
+
+def random_book(tmp_path, rng, rows=300):
+    lines = [f"C{rng.randint(0, 40)}, S{rng.randint(0, 30)}, {100 * rng.randint(1, 20)}, 100\n" for _ in range(rows)]
+    # a few duplicates and rejected rows
+    lines += ["C1, S1, 200, 100\n", "C2, S2, -100, 100\n", "\n", "C3, S3, 300, 100\n"]
+    p = tmp_path / "requests.csv"
+    p.write_text(HEADER + ''.join(lines))
+    return p
+
+
+@pytest.mark.parametrize("memory_budget, partitions", [
+    (1 << 30, 1),
+    # a spill every few rows
+    (1000, 4),
+    (1000, None),
+])
+def test_same_as_distribute_locates(tmp_path, memory_budget, partitions):
+    rng = random.Random(11)
+    for _ in range(10):
+        p = random_book(tmp_path, rng)
+        clients_requests, aggregate_symbols, req_by_symbol_clients_percentage, chunk_pr_symbol = csv_parser(str(p))
+        approved = {symbol: rng.randint(0, total) for symbol, total in aggregate_symbols.items()}
+        expected = distribute_locates(clients_requests, approved, req_by_symbol_clients_percentage, chunk_pr_symbol)
+        create_results_csv(expected, str(tmp_path / "expected.csv"))
+
+        rejected = []
+        with PartitionedBook.from_csv(str(p), memory_budget=memory_budget, partitions=partitions, rejected=rejected) as book:
+            assert book.aggregate_symbols == aggregate_symbols
+            assert book.chunk_pr_symbol == chunk_pr_symbol
+            assert len(rejected) == 1
+            rows = distribute_external(book, approved, str(tmp_path / "results.csv"))
+            directory = book.directory
+        assert not os.path.exists(directory)
+
+        expected_rows = read_rows(tmp_path / "expected.csv")
+        results = read_rows(tmp_path / "results.csv")
+        assert results[0] == expected_rows[0]
+        assert rows == len(results) - 1
+        # the same rows - ordered by symbol instead of client
+        assert sorted(results[1:]) == sorted(expected_rows[1:])
+
+
+def test_spills_and_partitions(tmp_path):
+    p = random_book(tmp_path, random.Random(3), rows=1000)
+    with PartitionedBook.from_csv(str(p), memory_budget=10_000, partitions=8) as book:
+        assert book.spills > 1
+        for partition in range(book.partitions):
+            assert all(symbol_partition(symbol, 8) == partition for symbol in book.load_partition(partition))
+        approved = {symbol: total // 2 for symbol, total in book.aggregate_symbols.items()}
+        symbols = [symbol for symbol, _ in iter_distribute_external(book, approved)]
+        assert sorted(symbols) == sorted(approved)
+        # partition by partition
+        partitions = [symbol_partition(symbol, 8) for symbol in symbols]
+        assert partitions == sorted(partitions)
+
+
+def test_duplicates_across_spills(tmp_path):
+    p = tmp_path / "requests.csv"
+    p.write_text(HEADER + "Alice, AAPL, 500, 100\nBob, AAPL, 300, 100\n" + "Carl, MSFT, 100, 100\n" * 20
+                 + "Alice, AAPL, 200, 100\n")
+    # the last request wins even when the first one was spilled long before
+    with PartitionedBook.from_csv(str(p), memory_budget=500, partitions=2) as book:
+        assert book.load_partition(symbol_partition('AAPL', 2))['AAPL'] == {'Alice': 200, 'Bob': 300}
+        assert book.aggregate_symbols == {'AAPL': 1000, 'MSFT': 2000}
+
+
+def test_errors_remove_the_files(tmp_path):
+    p = tmp_path / "requests.csv"
+    p.write_text("client_name, symbol\nAlice, AAPL\n")
+    (tmp_path / "spill").mkdir()
+    with pytest.raises(Exception):
+        PartitionedBook.from_csv(str(p), spill_dir=str(tmp_path / "spill"))
+    assert os.listdir(tmp_path / "spill") == []
+
+
+def test_cli_memory_budget(tmp_path):
+    p = random_book(tmp_path, random.Random(5))
+    approvals = tmp_path / "approved.csv"
+    approvals.write_text("symbol,number_of_locates_approved\nS1,1000\nS2,500\nS3,0\n")
+    assert main([str(p), str(tmp_path / "expected.csv"), '--approvals', str(approvals)]) == 0
+    assert main([str(p), str(tmp_path / "results.csv"), '--approvals', str(approvals), '--memory-budget', '1',
+                 '--spill-dir', str(tmp_path)]) == 0
+    assert sorted(read_rows(tmp_path / "results.csv")) == sorted(read_rows(tmp_path / "expected.csv"))
+    # a stream has no size to budget the partitions by
+    with pytest.raises(SystemExit):
+        main(['-', '--approvals', str(approvals), '--memory-budget', '1'])
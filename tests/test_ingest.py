@@ -0,0 +1,69 @@
+from sys import path as sys_path
+from os import path as os_path
+sys_path.append(os_path.abspath(os_path.join(os_path.dirname(__file__), '..', 'src')))
+
+import pytest
+from locates_task import csv_parser
+from locates_ingest import parse_many, resolve_paths
+
+HEADER = "client_name, symbol, number_of_locates_requested, round_lot_size\n"
+
+
+@pytest.fixture
+def desk_files(tmp_path):
+    (tmp_path / "desk_a_09.csv").write_text(HEADER + "Alice, AAPL, 500, 100\nBob, MSFT, 400, 100\n")
+    (tmp_path / "desk_a_10.csv").write_text(HEADER + "Alice, AAPL, 300, 100\nCarl, TSLA, 30, 10\n")
+    (tmp_path / "desk_b_09.csv").write_text(HEADER + "Dave, TSLA, 200, 100\nBob, GOOGL, 100, 100\n")
+    (tmp_path / "notes.txt").write_text("not a request file")
+    return tmp_path
+
+
+def test_resolve_paths(desk_files):
+    names = ['desk_a_09.csv', 'desk_a_10.csv', 'desk_b_09.csv']
+    assert [os_path.basename(path) for path in resolve_paths(str(desk_files))] == names
+    assert [os_path.basename(path) for path in resolve_paths(str(desk_files / "desk_a_*.csv"))] == names[:2]
+    assert resolve_paths(['b.csv', 'a.csv']) == ['b.csv', 'a.csv']
+    with pytest.raises(FileExistsError, match="no request files found"):
+        resolve_paths(str(desk_files / "*.json"))
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_merge_sums_duplicates(desk_files, workers):
+    clients_requests, aggregate_symbols, req_by_symbol_clients_percentage, chunk_pr_symbol = \
+        parse_many(str(desk_files), workers=workers)
+
+    assert clients_requests == {'Alice': {'AAPL': 800}, 'Bob': {'MSFT': 400, 'GOOGL': 100},
+                                'Carl': {'TSLA': 30}, 'Dave': {'TSLA': 200}}
+    assert aggregate_symbols == {'AAPL': 800, 'MSFT': 400, 'TSLA': 230, 'GOOGL': 100}
+    assert req_by_symbol_clients_percentage['TSLA'] == {'Carl': 30 / 230, 'Dave': 200 / 230}
+    # first lot size seen
+    assert chunk_pr_symbol == {'AAPL': 100, 'MSFT': 100, 'TSLA': 10, 'GOOGL': 100}
+
+
+def test_merge_last_replaces(desk_files):
+    clients_requests, aggregate_symbols, _, _ = parse_many(str(desk_files), duplicates='last')
+    assert clients_requests['Alice'] == {'AAPL': 300}
+    assert aggregate_symbols['AAPL'] == 300
+
+
+def test_merge_error_on_duplicates(desk_files):
+    with pytest.raises(ValueError, match="Alice requested AAPL again"):
+        parse_many(str(desk_files), duplicates='error')
+
+
+def test_single_file_same_as_csv_parser(desk_files):
+    path = str(desk_files / "desk_a_09.csv")
+    assert parse_many([path]) == csv_parser(path)
+
+
+def test_clients_in_the_file_order(tmp_path):
+    # the symbols order (MSFT first) is not the clients order (Alice first)
+    (tmp_path / "desk_a.csv").write_text(HEADER + "Bob, MSFT, 100, 100\nAlice, AAPL, 100, 100\nBob, AAPL, 100, 100\n"
+                                                  "Alice, MSFT, 100, 100\n")
+    (tmp_path / "desk_b.csv").write_text(HEADER + "Carl, AAPL, 100, 100\nAlice, TSLA, 100, 100\n")
+    clients_requests = parse_many(str(tmp_path))[0]
+    assert [(client, list(symbols)) for client, symbols in clients_requests.items()] == [
+        ('Bob', ['MSFT', 'AAPL']), ('Alice', ['AAPL', 'MSFT', 'TSLA']), ('Carl', ['AAPL'])]
+    single = csv_parser(str(tmp_path / "desk_a.csv"))[0]
+    assert [list(symbols) for symbols in parse_many([str(tmp_path / "desk_a.csv")])[0].values()] == \
+        [list(symbols) for symbols in single.values()]
@@ -0,0 +1,109 @@
+from sys import path as sys_path
+from os import path as os_path
+sys_path.append(os_path.abspath(os_path.join(os_path.dirname(__file__), '..', 'src')))
+
+import random
+import pytest
+from locates import main
+from locates_task import csv_parser, distribute_locates, create_results_csv
+from locates_journal import Journal, JournalError, run_checkpointed, write_journal_results
+
+HEADER = "client_name, symbol, number_of_locates_requested, round_lot_size\n"
+
+
+class Crash(Exception):
+    pass
+
+
+class CrashingMetrics:
+    """Metrics stand-in that keeps the distributed symbols and crashes the run after a few of them."""
+
+    def __init__(self, crash_after=None):
+        self.crash_after = crash_after
+        self.symbols = []
+
+    def add_stage(self, name, seconds, rows):
+        pass
+
+    def add_symbol(self, symbol, seconds, rows):
+        self.symbols.append(symbol)
+        if len(self.symbols) == self.crash_after:
+            raise Crash()
+
+    def add_rounding(self, iterations):
+        pass
+
+    def reject(self, reason):
+        pass
+
+
+@pytest.fixture
+def book(tmp_path):
+    rng = random.Random(9)
+    p = tmp_path / "requests.csv"
+    p.write_text(HEADER + ''.join(f"C{rng.randint(0, 30)}, S{rng.randint(0, 20)}, {100 * rng.randint(1, 15)}, 100\n"
+                                  for _ in range(300)))
+    parsed = csv_parser(str(p))
+    approved = {symbol: 100 * rng.randint(0, 40) for symbol in parsed[1] if rng.random() < 0.7}
+    return p, approved, distribute_locates(parsed[0], approved, parsed[2], parsed[3])
+
+
+def test_same_as_distribute_locates(tmp_path, book):
+    p, approved, expected = book
+    distributed = run_checkpointed(str(p), str(tmp_path / "run.journal"), approved)
+    assert distributed.to_dict() == expected
+    create_results_csv(expected, str(tmp_path / "expected.csv"))
+    create_results_csv(distributed, str(tmp_path / "results.csv"))
+    assert (tmp_path / "results.csv").read_text() == (tmp_path / "expected.csv").read_text()
+    # straight from the journal
+    write_journal_results(str(tmp_path / "run.journal"), str(tmp_path / "journal.csv"))
+    assert (tmp_path / "journal.csv").read_text() == (tmp_path / "expected.csv").read_text()
+
+
+def test_resume_after_crash(tmp_path, book):
+    p, approved, expected = book
+    journal_path = str(tmp_path / "run.journal")
+    metrics = CrashingMetrics(crash_after=5)
+    with pytest.raises(Crash):
+        run_checkpointed(str(p), journal_path, approved, metrics=metrics)
+    with pytest.raises(JournalError, match="not complete"):
+        write_journal_results(journal_path, str(tmp_path / "results.csv"))
+    # a record cut in the middle
+    with open(journal_path, 'ab') as journal_file:
+        journal_file.write(b'S\x40\x00\x00')
+
+    # the approvals come from the journal, and the requests - the file can go away
+    p.rename(tmp_path / "moved.csv")
+    metrics = CrashingMetrics()
+    distributed = run_checkpointed(str(p), journal_path, lambda aggregate_symbols: {}, metrics=metrics)
+    assert distributed.to_dict() == expected
+    # only the symbols the crashed run didn't finish
+    assert len(metrics.symbols) == len(approved) - 4
+    with Journal(journal_path) as journal:
+        assert journal.complete and len(journal.done) == len(approved)
+
+
+def test_other_run(tmp_path, book):
+    p, approved, _ = book
+    journal_path = str(tmp_path / "run.journal")
+    run_checkpointed(str(p), journal_path, approved)
+    with pytest.raises(JournalError, match="other approvals"):
+        run_checkpointed(str(p), journal_path, {**approved, 'S1': 12300})
+    p.write_text(HEADER + "Alice, AAPL, 100, 100\n")
+    with pytest.raises(JournalError, match="requests file changed"):
+        run_checkpointed(str(p), journal_path, approved)
+    not_journal = tmp_path / "other.journal"
+    not_journal.write_bytes(b'nope')
+    with pytest.raises(JournalError, match="not a locates journal"):
+        Journal(str(not_journal))
+
+
+def test_cli(tmp_path, book):
+    p, approved, expected = book
+    approvals = tmp_path / "approved.csv"
+    approvals.write_text("symbol,number_of_locates_approved\n" + ''.join(f"{s},{n}\n" for s, n in approved.items()))
+    create_results_csv(expected, str(tmp_path / "expected.csv"))
+    for _ in range(2):
+        assert main([str(p), str(tmp_path / "results.csv"), '--approvals', str(approvals),
+                     '--journal', str(tmp_path / "run.journal")]) == 0
+        assert (tmp_path / "results.csv").read_text() == (tmp_path / "expected.csv").read_text()
@@ -0,0 +1,72 @@
+from sys import path as sys_path
+from os import path as os_path
+sys_path.append(os_path.abspath(os_path.join(os_path.dirname(__file__), '..', 'src')))
+
+import random
+import subprocess
+import sys
+import pytest
+from locates_kernel import order_by_reminder, round_lots, distribute_proportional
+from locates_task import KERNEL_COMPILED, distribute_symbol
+from locates_metrics import Metrics
+
+SRC_DIR = os_path.abspath(os_path.join(os_path.dirname(__file__), '..', 'src'))
+
+
+@pytest.mark.parametrize("values, round_lot_size, expected", [
+    ([150, 200, 30], 100, ([0, 2], 80)),
+    # ties keep their order
+    ([60, 180, 60, 0], 100, ([1, 0, 2], 200)),
+    ([100, 200], 100, ([], 0)),
+])
+@pytest.mark.parametrize("bucketed", [None, False, True])
+def test_order_by_reminder(values, round_lot_size, expected, bucketed):
+    assert order_by_reminder(values, round_lot_size, bucketed) == expected
+
+
+@pytest.mark.parametrize("values, round_lot_size, expected", [
+    ([150, 200, 30], 100, (None, [150, 30], 0)),
+    ([180, 60, 60], 100, ([0, 1, 2], [200, 100, 0], 1)),
+])
+def test_round_lots(values, round_lot_size, expected):
+    assert round_lots(values, round_lot_size) == expected
+
+
+@pytest.mark.parametrize("percentages, requested, total, expected", [
+    # everything approved - no rounding
+    ([0.625, 0.375], [500, 300], 800, ([500, 300], -1)),
+    ([0.625, 0.375], [500, 300], 400, ([300, 100], 1)),
+    # reminders less then a lot - rounding runs without redistributing
+    ([0.5, 0.5], [200, 200], 260, ([130, 130], 0)),
+])
+def test_distribute_proportional(percentages, requested, total, expected):
+    assert distribute_proportional(percentages, requested, total, 100) == expected
+
+
+def test_distribute_symbol_is_the_kernel():
+    rng = random.Random(2)
+    for _ in range(200):
+        requested = {f"Client{i}": 100 * rng.randint(1, 30) for i in range(rng.randint(1, 50))}
+        total_requested = sum(requested.values())
+        percentages = {client: num / total_requested for client, num in requested.items()}
+        total = rng.randint(0, total_requested)
+        metrics = Metrics()
+        distributed = distribute_symbol(percentages, requested, total, 100, metrics)
+        values, iterations = distribute_proportional(list(percentages.values()), list(requested.values()), total, 100)
+        assert list(distributed) == list(requested)
+        assert list(distributed.values()) == values
+        assert metrics.rounding_calls == (iterations >= 0)
+        assert metrics.rounding_iterations == max(iterations, 0)
+
+
+def test_kernel_compiled_flag():
+    assert isinstance(KERNEL_COMPILED, bool)
+
+
+def test_cli_imports_stay_lazy():
+    # a simulated approval round shouldn't load the engines, asyncio or json
+    code = ("import sys, locates, locates_task; locates_task.request_locates({'AAPL': 100}); "
+            "print(sorted(name for name in ('asyncio', 'json', 'numpy', 'concurrent.futures', 'locates_parallel', "
+            "'locates_columnar', 'locates_metrics', 'locates_external') if name in sys.modules))")
+    result = subprocess.run([sys.executable, '-c', code], cwd=SRC_DIR, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == '[]'
@@ -0,0 +1,125 @@
+from sys import path as sys_path
+from os import path as os_path
+sys_path.append(os_path.abspath(os_path.join(os_path.dirname(__file__), '..', 'src')))
+
+import io
+import json
+import logging
+import pytest
+from locates_task import (csv_parser, csv_parser_streaming, validate_req, distribute_locates, distribute_locates_exact,
+                          create_results_csv, REJECT_REASONS)
+from locates_metrics import Metrics, LogSink, JsonSink, PrometheusSink, render_prometheus
+
+HEADER = "client_name, symbol, number_of_locates_requested, round_lot_size\n"
+ROWS = (
+    "Alice, AAPL, 500, 100\n"
+    "Bob, AAPL, 300, 100\n"
+    "Carol, AAPL, 200, 100\n"
+    "Bob, MSFT, 200, 100\n"
+    "Dan, , 100, 100\n"        # empty symbol
+    "Eve, MSFT, 150, 100\n"    # not a multiple of the lot
+    "Fay, MSFT, 100, 0\n"      # non-positive lot
+    "Gus, MSFT, abc, 100\n"    # non-integer quantity
+    "Hal, MSFT, -100, 100\n"   # non-positive quantity
+    "Ivy, MSFT\n"              # missing fields
+)
+EXPECTED_REJECTED = {'empty_field': 1, 'non_multiple_quantity': 1, 'non_positive_lot': 1,
+                     'non_integer_quantity': 1, 'non_positive_quantity': 1, 'missing_field': 1}
+
+
+@pytest.fixture
+def requests_csv(tmp_path):
+    p = tmp_path / "requests.csv"
+    p.write_text(HEADER + ROWS)
+    return p
+
+
+@pytest.mark.parametrize("row, expected", [
+    ({'client_name': 'A', 'symbol': 'AAPL', 'number_of_locates_requested': '200', 'round_lot_size': '100'},
+     (('A', 'AAPL', 200, 100), None)),
+    ({'client_name': 'A', 'symbol': 'AAPL', 'number_of_locates_requested': '200'}, (None, 'missing_field')),
+    ({'client_name': ' ', 'symbol': 'AAPL', 'number_of_locates_requested': '200', 'round_lot_size': '100'},
+     (None, 'empty_field')),
+    ({'client_name': 'A', 'symbol': 'AAPL', 'number_of_locates_requested': '200', 'round_lot_size': 'x'},
+     (None, 'non_integer_lot')),
+    ({'client_name': 'A', 'symbol': 'AAPL', 'number_of_locates_requested': '200', 'round_lot_size': '-1'},
+     (None, 'non_positive_lot')),
+    ({'client_name': 'A', 'symbol': 'AAPL', 'number_of_locates_requested': '2.5', 'round_lot_size': '1'},
+     (None, 'non_integer_quantity')),
+    ({'client_name': 'A', 'symbol': 'AAPL', 'number_of_locates_requested': '0', 'round_lot_size': '100'},
+     (None, 'non_positive_quantity')),
+    ({'client_name': 'A', 'symbol': 'AAPL', 'number_of_locates_requested': '250', 'round_lot_size': '100'},
+     (None, 'non_multiple_quantity')),
+    (None, (None, 'invalid_row')),
+])
+def test_validate_req_reasons(row, expected):
+    assert validate_req(row) == expected
+    assert expected[1] is None or expected[1] in REJECT_REASONS
+
+
+@pytest.mark.parametrize("parser", [csv_parser, csv_parser_streaming])
+def test_parsers_count_rejected_rows(requests_csv, parser):
+    metrics = Metrics()
+    parsed = parser(str(requests_csv), metrics=metrics)
+    assert parsed == parser(str(requests_csv))
+    assert dict(metrics.rejected) == EXPECTED_REJECTED
+    assert metrics.stages['parse'][1] == 10
+
+
+@pytest.mark.parametrize("distribute", ['percentages', 'exact'])
+def test_distribute_metrics(requests_csv, distribute):
+    metrics = Metrics()
+    approved = {'AAPL': 700, 'MSFT': 200}
+    if distribute == 'percentages':
+        parsed = csv_parser(str(requests_csv))
+        distributed = distribute_locates(parsed[0], approved, parsed[2], parsed[3], metrics=metrics)
+        assert distributed == distribute_locates(parsed[0], approved, parsed[2], parsed[3])
+    else:
+        clients_requests, aggregate_symbols, req_by_symbol_clients, chunk_pr_symbol = csv_parser(str(requests_csv), percentages=False)
+        distributed = distribute_locates_exact(clients_requests, approved, req_by_symbol_clients, aggregate_symbols,
+                                               chunk_pr_symbol, metrics=metrics)
+    assert set(metrics.symbols) == {'AAPL', 'MSFT'}
+    assert metrics.symbols['AAPL'][1] == 3
+    assert metrics.stages['distribute'][1] == 4
+    # AAPL has leftovers to round, MSFT is fully approved
+    assert metrics.rounding_calls == 1
+    assert metrics.rounding_iterations >= 1
+    assert sum(sum(symbols.values()) for symbols in distributed.values()) == 900
+
+
+def test_write_and_stage_timer(tmp_path):
+    metrics = Metrics()
+    create_results_csv({'A': {'AAPL': 100, 'MSFT': 200}, 'B': {}}, str(tmp_path / "out.csv"), metrics=metrics)
+    assert metrics.stages['write'][1] == 2
+    with metrics.stage('approvals') as stage:
+        stage.rows = 5
+    with metrics.stage('approvals') as stage:
+        stage.rows = 2
+    assert metrics.stages['approvals'][1] == 7
+    assert metrics.snapshot()['stages']['approvals']['rows_per_second'] > 0
+
+
+def test_sinks(requests_csv, tmp_path, caplog):
+    stream = io.StringIO()
+    json_path = tmp_path / "metrics.json"
+    prom_path = tmp_path / "metrics.prom"
+    metrics = Metrics(sinks=[LogSink(), JsonSink(str(json_path)), PrometheusSink(str(prom_path)), PrometheusSink(stream)])
+    parsed = csv_parser(str(requests_csv), metrics=metrics)
+    distribute_locates(parsed[0], {'AAPL': 700, 'MSFT': 200}, parsed[2], parsed[3], metrics=metrics)
+    metrics.add_symbol('we"ird\\', 0.5, 1)
+    with caplog.at_level(logging.INFO, logger='locates'):
+        metrics.flush()
+
+    assert "stage parse" in caplog.text and "slow symbol" in caplog.text
+    snapshot = json.loads(json_path.read_text())
+    assert snapshot['rejected'] == EXPECTED_REJECTED
+    assert snapshot['rounding_chunks']['calls'] == 1
+    text = prom_path.read_text()
+    assert text == stream.getvalue() == render_prometheus(metrics)
+    assert '# TYPE locates_rejected_rows_total counter' in text
+    assert 'locates_rejected_rows_total{reason="missing_field"} 1' in text
+    assert 'locates_stage_rows{stage="parse"} 10' in text
+    assert 'locates_symbol_distribute_seconds{symbol="we\\"ird\\\\"} 0.5' in text
+
+    metrics.reset()
+    assert metrics.snapshot()['stages'] == {} and len(metrics.sinks) == 4
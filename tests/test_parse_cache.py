@@ -0,0 +1,91 @@
+from sys import path as sys_path
+from os import path as os_path
+sys_path.append(os_path.abspath(os_path.join(os_path.dirname(__file__), '..', 'src')))
+
+import os
+import pytest
+from locates_task import csv_parser, csv_parser_streaming
+from locates_cache import ParseCache
+
+HEADER = "client_name, symbol, number_of_locates_requested, round_lot_size\n"
+
+
+class CountingParser:
+    """csv_parser_streaming that counts its calls."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, file_path, percentages=True):
+        self.calls += 1
+        return csv_parser_streaming(file_path, percentages=percentages)
+
+
+@pytest.fixture
+def requests_csv(tmp_path):
+    p = tmp_path / "requests.csv"
+    p.write_text(HEADER + "Alice, AAPL, 500, 100\nBob, AAPL, 300, 100\nBob, MSFT, 200, 100\n")
+    return p
+
+
+def test_hit_skips_parsing(tmp_path, requests_csv):
+    cache = ParseCache(str(tmp_path / "cache"))
+    parser = CountingParser()
+
+    assert cache.parse(str(requests_csv), parser=parser) == csv_parser(str(requests_csv))
+    assert cache.parse(str(requests_csv), parser=parser) == csv_parser(str(requests_csv))
+    assert parser.calls == 1
+    # without percentages is another entry
+    cache.parse(str(requests_csv), percentages=False, parser=parser)
+    cache.parse(str(requests_csv), parser=parser)
+    assert parser.calls == 2
+    assert len(cache.entries()) == 2
+
+
+def test_changed_file_is_parsed_again(tmp_path, requests_csv):
+    cache = ParseCache(str(tmp_path / "cache"))
+    parser = CountingParser()
+    cache.parse(str(requests_csv), parser=parser)
+
+    requests_csv.write_text(HEADER + "Alice, AAPL, 700, 100\n")
+    assert cache.parse(str(requests_csv), parser=parser)[0] == {'Alice': {'AAPL': 700}}
+    assert parser.calls == 2
+    # the old entry was replaced
+    assert len(cache.entries()) == 1
+
+
+def test_lru_eviction(tmp_path):
+    files = []
+    for i in range(3):
+        p = tmp_path / f"requests_{i}.csv"
+        p.write_text(HEADER + "".join(f"Client{j}, S{i}, 100, 100\n" for j in range(50)))
+        files.append(str(p))
+    cache = ParseCache(str(tmp_path / "cache"))
+    cache.parse(files[0])
+    entry_size = cache.entries()[0][1]
+    cache.max_bytes = 2 * entry_size + entry_size // 2
+
+    cache.parse(files[1])
+    # files[0] is used again, so files[1] is the least recently used
+    os.utime(cache.entry_path(files[1]), (0, 0))
+    cache.parse(files[0])
+    cache.parse(files[2])
+    assert sorted(path for path, _, _ in cache.entries()) == sorted([cache.entry_path(files[0]), cache.entry_path(files[2])])
+
+
+def test_invalidate(tmp_path, requests_csv):
+    other = tmp_path / "other.csv"
+    other.write_text(HEADER + "Carl, TSLA, 100, 100\n")
+    cache = ParseCache(str(tmp_path / "cache"))
+    cache.parse(str(requests_csv))
+    cache.parse(str(other))
+
+    cache.invalidate(str(requests_csv))
+    assert [path for path, _, _ in cache.entries()] == [cache.entry_path(str(other))]
+    cache.invalidate()
+    assert cache.entries() == []
+
+
+def test_missing_file(tmp_path):
+    with pytest.raises(FileExistsError, match="invalid file path - the file not found"):
+        ParseCache(str(tmp_path / "cache")).parse(str(tmp_path / "missing.csv"))
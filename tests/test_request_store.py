@@ -0,0 +1,92 @@
+from sys import path as sys_path
+from os import path as os_path
+sys_path.append(os_path.abspath(os_path.join(os_path.dirname(__file__), '..', 'src')))
+
+import random
+from bisect import bisect_left
+import pytest
+import locates_store
+from locates_task import csv_parser, distribute_locates
+from locates_store import RequestStore, memory_report
+
+HEADER = "client_name, symbol, number_of_locates_requested, round_lot_size\n"
+
+
+@pytest.fixture
+def requests_csv(tmp_path):
+    rng = random.Random(0)
+    rows = [f"Client{rng.randrange(300)}, S{rng.randrange(40)}, {100 * rng.randint(1, 20)}, 100\n" for _ in range(2000)]
+    # invalid rows and a client requesting the same symbol twice
+    rows += ["Client1, S1, 150, 100\n", ", S2, 100, 100\n", "Client1, S1, 700, 100\n", "Client1, S1, 900, 100\n"]
+    p = tmp_path / "requests.csv"
+    p.write_text(HEADER + "".join(rows))
+    return str(p)
+
+
+@pytest.mark.parametrize("build", [
+    lambda path: RequestStore.from_csv(path),
+    lambda path: RequestStore.from_parsed(*csv_parser(path)),
+])
+def test_views_match_csv_parser(requests_csv, build):
+    store = build(requests_csv)
+    expected = csv_parser(requests_csv)
+
+    assert store.as_parsed() == expected
+    assert store.to_dicts() == expected
+    # same order of clients, symbols and their entries
+    for view, parsed in zip(store.to_dicts(), expected):
+        assert list(view) == list(parsed)
+        assert [list(value) for value in view.values() if isinstance(value, dict)] == \
+               [list(value) for value in parsed.values() if isinstance(value, dict)]
+
+
+def test_distribute_with_views(requests_csv):
+    clients_requests, aggregate_symbols, req_by_symbol_clients_percentage, chunk_pr_symbol = csv_parser(requests_csv)
+    store = RequestStore.from_csv(requests_csv)
+    views = store.as_parsed()
+    approved = {symbol: int(total * 0.63) for symbol, total in aggregate_symbols.items()}
+
+    assert distribute_locates(views[0], approved, views[2], views[3]) == \
+           distribute_locates(clients_requests, approved, req_by_symbol_clients_percentage, chunk_pr_symbol)
+
+
+def test_view_lookups_are_one_bisect(requests_csv, monkeypatch):
+    # every clients_requests[client][symbol] of the distribution is a single bisect, not a scan of the rows
+    ranges = []
+
+    def counting_bisect_left(a, x, lo, hi):
+        ranges.append(hi - lo)
+        return bisect_left(a, x, lo, hi)
+
+    monkeypatch.setattr(locates_store, 'bisect_left', counting_bisect_left)
+    clients_requests, aggregate_symbols, req_by_symbol_clients_percentage, chunk_pr_symbol = \
+        RequestStore.from_csv(requests_csv).as_parsed()
+    approved = {symbol: int(total * 0.63) for symbol, total in aggregate_symbols.items()}
+    distribute_locates(clients_requests, approved, req_by_symbol_clients_percentage, chunk_pr_symbol)
+
+    assert len(ranges) == sum(len(req_by_symbol_clients_percentage[symbol]) for symbol in approved)
+    # within a single client's symbols
+    assert max(ranges) <= len(aggregate_symbols)
+
+
+def test_view_lookups(requests_csv):
+    clients_requests, aggregate_symbols, req_by_symbol_clients_percentage, chunk_pr_symbol = \
+        RequestStore.from_csv(requests_csv).as_parsed()
+
+    assert clients_requests['Client1']['S1'] == 900
+    assert req_by_symbol_clients_percentage['S1']['Client1'] == 900 / aggregate_symbols['S1']
+    assert chunk_pr_symbol['S1'] == 100
+    with pytest.raises(KeyError):
+        clients_requests['Client1']['nope']
+    with pytest.raises(KeyError):
+        req_by_symbol_clients_percentage['nope']
+
+
+def test_memory_report(requests_csv):
+    report = memory_report(RequestStore.from_csv(requests_csv))
+    assert 0 < report['store'] < report['dicts']
+
+
+def test_store_parser_errors():
+    with pytest.raises(FileExistsError, match="invalid file path - the file not found"):
+        RequestStore.from_csv("path/that/does/not/exist.csv")
@@ -0,0 +1,56 @@
+from sys import path as sys_path
+from os import path as os_path
+sys_path.append(os_path.abspath(os_path.join(os_path.dirname(__file__), '..', 'src')))
+
+import csv
+import pytest
+from locates_task import create_results_csv
+from locates_writers import read_results_npy
+
+DISTRIBUTED = {
+    'Alice': {'AAPL': 400, 'GOOGL': 300},
+    'Bob': {},
+    'Smith, John': {'MSFT': 220},
+    'Zoë': {'"QUOTED"': 7},
+}
+
+
+def dict_writer_csv(distributed_locates, output_path):
+    """The original DictWriter based writer - the format the fast writer has to keep."""
+    with open(output_path, 'w', newline='') as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=['client_name', 'symbol', 'number_of_locates_allocated'])
+        writer.writeheader()
+        for client, symbols_granted in distributed_locates.items():
+            for symbol, num_of_locates in symbols_granted.items():
+                writer.writerow({'client_name': client, 'symbol': f" {symbol}",
+                                 'number_of_locates_allocated': f" {num_of_locates}"})
+
+
+def test_csv_format_unchanged(tmp_path):
+    create_results_csv(DISTRIBUTED, str(tmp_path / "results.csv"))
+    dict_writer_csv(DISTRIBUTED, str(tmp_path / "expected.csv"))
+
+    assert (tmp_path / "results.csv").read_bytes() == (tmp_path / "expected.csv").read_bytes()
+
+
+def test_npy_columns(tmp_path):
+    create_results_csv(DISTRIBUTED, str(tmp_path / "results"), output_format='npy')
+
+    assert sorted(p.name for p in (tmp_path / "results").iterdir()) == [
+        'client_name.npy', 'number_of_locates_allocated.npy', 'symbol.npy']
+    assert read_results_npy(str(tmp_path / "results")) == {client: symbols for client, symbols in DISTRIBUTED.items() if symbols}
+
+
+def test_npy_loads_with_numpy(tmp_path):
+    np = pytest.importorskip("numpy")
+    create_results_csv(DISTRIBUTED, str(tmp_path / "results"), output_format='npy')
+
+    assert np.load(tmp_path / "results" / "client_name.npy").tolist() == ['Alice', 'Alice', 'Smith, John', 'Zoë']
+    assert np.load(tmp_path / "results" / "symbol.npy").tolist() == ['AAPL', 'GOOGL', 'MSFT', '"QUOTED"']
+    allocated = np.load(tmp_path / "results" / "number_of_locates_allocated.npy")
+    assert allocated.dtype == np.int64 and allocated.tolist() == [400, 300, 220, 7]
+
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError, match="unknown output format"):
+        create_results_csv(DISTRIBUTED, str(tmp_path / "results.parquet"), output_format='parquet')
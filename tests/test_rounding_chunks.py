@@ -0,0 +1,45 @@
+from sys import path as sys_path
+from os import path as os_path
+sys_path.append(os_path.abspath(os_path.join(os_path.dirname(__file__), '..', 'src')))
+
+import random
+import pytest
+from locates_task import rounding_chunks, sort_by_reminder, bucket_sort_picked, BUCKET_SORT_MIN_CLIENTS
+
+# Tests for rounding_chunks
+@pytest.mark.parametrize("distribute_by_proportion, round_lot_size, expected", [
+    # sum of reminders is less than a lot - nothing to do
+    ({'Client1': 150, 'Client2': 200, 'Client3': 30}, 100, None),
+    # the closest to a full lot is rounded up, the rest is taken from the lowest
+    ({'Client1': 180, 'Client2': 60, 'Client3': 60}, 100, [['Client1', 200], ['Client2', 100], ['Client3', 0]]),
+    ({'Client1': 90, 'Client2': 40, 'Client3': 20}, 100, [['Client1', 100], ['Client2', 35], ['Client3', 15]]),
+])
+@pytest.mark.parametrize("bucketed", [False, True])
+def test_rounding_chunks(distribute_by_proportion, round_lot_size, expected, bucketed):
+    assert rounding_chunks(distribute_by_proportion, round_lot_size, bucketed) == expected
+
+
+# the counting sort keeps the order of the sort - ties included
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("round_lot_size", [1, 7, 100, 1000])
+def test_bucketed_matches_sort(seed, round_lot_size):
+    rng = random.Random(seed)
+    amounts = {f"Client{i}": rng.randrange(0, 30 * round_lot_size) for i in range(rng.randint(1, 3000))}
+
+    assert sort_by_reminder(amounts, round_lot_size, True) == sort_by_reminder(amounts, round_lot_size, False)
+    assert rounding_chunks(amounts, round_lot_size, True) == rounding_chunks(amounts, round_lot_size, False)
+
+
+def test_bucketed_picked_by_symbol_size():
+    small = {f"Client{i}": 150 for i in range(10)}
+    big = {f"Client{i}": 150 for i in range(BUCKET_SORT_MIN_CLIENTS)}
+
+    # the path picked by the symbol size - the counting sort for big symbols only
+    assert not bucket_sort_picked(len(small), 100)
+    assert bucket_sort_picked(len(big), 100)
+    assert not bucket_sort_picked(BUCKET_SORT_MIN_CLIENTS - 1, 100)
+    # more buckets than clients - the sort
+    assert not bucket_sort_picked(len(big), len(big) + 1)
+    # same results either way
+    assert rounding_chunks(small, 100) == rounding_chunks(small, 100, True)
+    assert rounding_chunks(big, 100) == rounding_chunks(big, 100, False)
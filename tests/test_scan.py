@@ -0,0 +1,131 @@
+from sys import path as sys_path
+from os import path as os_path
+sys_path.append(os_path.abspath(os_path.join(os_path.dirname(__file__), '..', 'src')))
+
+import random
+import pytest
+from locates_task import csv_parser, csv_parser_streaming, distribute_locates, create_results_csv
+from locates_scan import scan_requests
+
+HEADER = "client_name, symbol, number_of_locates_requested, round_lot_size\n"
+
+
+def random_book(tmp_path, rng, rows=300, newline="\n"):
+    lines = [f"C{rng.randint(0, 40)}, S{rng.randint(0, 30)}, {100 * rng.randint(1, 20)}, 100" for _ in range(rows)]
+    # duplicates, rejected, blank and quoted rows
+    lines += ["C1, S1, 200, 100", "C2, S2, -100, 100", "", 'C3, "S3", 300, 100', '"C\n4", S4, 100, 100',
+              "C5, S5, 100", " C6, S6, 100, 100", "  C1,  S6, 200, 100"]
+    p = tmp_path / "requests.csv"
+    p.write_bytes((HEADER + newline.join(lines) + newline).replace("\n", newline).encode())
+    return p
+
+
+def random_field(rng, value):
+    """A field as a writer might put it - with leading spaces, quoted (commas, new lines, doubled quotes,
+    text after the closing quote) or with a literal quote in the middle."""
+    kind = rng.random()
+    if kind < 0.15:
+        return ' ' * rng.randint(1, 2) + value
+    if kind < 0.3:
+        return '"' + value + rng.choice(['', ',x', '\nx', '""x', '\r\nx']) + '"' + rng.choice(['', '', 'x'])
+    if kind < 0.4:
+        return value[:1] + '"' + value[1:]
+    return value
+
+
+@pytest.mark.parametrize("chunk_size", [1 << 20, 64, 97])
+def test_fuzz_quotes_and_spaces(tmp_path, chunk_size):
+    rng = random.Random(chunk_size)
+    p = tmp_path / "requests.csv"
+    for _ in range(20):
+        lines = [rng.choice([', ', ',']).join(random_field(rng, value) for value in (
+            f"C{rng.randint(0, 20)}", f"S{rng.randint(0, 10)}", str(100 * rng.randint(1, 9)), "100"))
+            for _ in range(rng.randint(1, 60))]
+        lines += [''] * rng.randint(0, 2)
+        rng.shuffle(lines)
+        p.write_bytes((HEADER + '\n'.join(lines) + rng.choice(['', '\n'])).encode())
+
+        parsed_rejected, streamed_rejected, scan_rejected = [], [], []
+        parsed = csv_parser(str(p), rejected=parsed_rejected)
+        assert csv_parser_streaming(str(p), chunk_size, rejected=streamed_rejected) == parsed
+        assert streamed_rejected == parsed_rejected
+        index = scan_requests(str(p), chunk_size=chunk_size, rejected=scan_rejected)
+        assert scan_rejected == parsed_rejected
+        assert (index.aggregate_symbols, index.chunk_pr_symbol) == (parsed[1], parsed[3])
+        scanned = index.materialize({symbol: 100 for symbol in parsed[1]})
+        assert scanned == parsed
+        assert list(scanned[0]) == list(parsed[0])
+
+
+@pytest.mark.parametrize("newline, chunk_size", [("\n", 1 << 20), ("\n", 64), ("\r\n", 1 << 20), ("\r\n", 97)])
+def test_same_as_csv_parser_for_approved_symbols(tmp_path, newline, chunk_size):
+    rng = random.Random(3)
+    for _ in range(5):
+        p = random_book(tmp_path, rng, newline=newline)
+        parsed_rejected, scan_rejected = [], []
+        clients_requests, aggregate_symbols, req_by_symbol_clients_percentage, chunk_pr_symbol = csv_parser(
+            str(p), rejected=parsed_rejected)
+        index = scan_requests(str(p), chunk_size=chunk_size, rejected=scan_rejected)
+        assert index.aggregate_symbols == aggregate_symbols and index.chunk_pr_symbol == chunk_pr_symbol
+        assert list(index.clients) == list(clients_requests)
+        assert [reason for _, reason, _ in scan_rejected] == [reason for _, reason, _ in parsed_rejected]
+
+        # about a third of the symbols is not approved
+        approved = {symbol: 100 * rng.randint(0, 40) for symbol in aggregate_symbols if rng.random() < 0.7}
+        scanned = index.materialize(approved)
+        assert set(scanned[2]) == set(approved)
+        for symbol in approved:
+            assert scanned[2][symbol] == req_by_symbol_clients_percentage[symbol]
+        expected = distribute_locates(clients_requests, approved, req_by_symbol_clients_percentage, chunk_pr_symbol)
+        assert distribute_locates(scanned[0], approved, scanned[2], scanned[3]) == expected
+
+        create_results_csv(expected, str(tmp_path / "expected.csv"))
+        create_results_csv(distribute_locates(scanned[0], approved, scanned[2], scanned[3]),
+                           str(tmp_path / "results.csv"))
+        assert (tmp_path / "results.csv").read_text() == (tmp_path / "expected.csv").read_text()
+
+
+def test_only_approved_rows_are_read(tmp_path):
+    p = tmp_path / "requests.csv"
+    p.write_text(HEADER + "Alice, AAPL, 500, 100\nBob, MSFT, 200, 100\nCarl, AAPL, 300, 100\n")
+    index = scan_requests(str(p))
+    assert list(index.offsets['AAPL']) == [len(HEADER), len(HEADER) + 42]
+    clients_requests, _, req_by_symbol_clients_percentage, _ = index.materialize({'AAPL': 400})
+    assert clients_requests == {'Alice': {'AAPL': 500}, 'Bob': {}, 'Carl': {'AAPL': 300}}
+    assert req_by_symbol_clients_percentage == {'AAPL': {'Alice': 500 / 800, 'Carl': 300 / 800}}
+    # nothing approved - the file is not read again
+    assert index.materialize({})[0] == {'Alice': {}, 'Bob': {}, 'Carl': {}}
+
+
+@pytest.mark.parametrize("rows", [
+    "B,X,-100,10\rA,X,100,100\n",
+    "B,X\rA,X,100,100\n",
+    "A,X,100,100\rB,Y,200,100\rC,X,300,100\nD,X,100,100\n",
+])
+def test_bare_carriage_return(tmp_path, rows):
+    p = tmp_path / "requests.csv"
+    p.write_bytes((HEADER + rows).encode())
+    clients_requests, aggregate_symbols, req_by_symbol_clients_percentage, chunk_pr_symbol = csv_parser(str(p))
+    index = scan_requests(str(p))
+    assert index.aggregate_symbols == aggregate_symbols
+    scanned = index.materialize(dict.fromkeys(aggregate_symbols, 100))
+    assert {client: symbols for client, symbols in scanned[0].items() if symbols} == clients_requests
+    assert scanned[2] == req_by_symbol_clients_percentage
+
+
+def test_changed_file(tmp_path):
+    p = tmp_path / "requests.csv"
+    p.write_text(HEADER + "Alice, AAPL, 500, 100\n")
+    index = scan_requests(str(p))
+    p.write_text(HEADER + "Alice, AAPL, 500, 100\nBob, AAPL, 100, 100\n")
+    with pytest.raises(ValueError, match="changed since it was scanned"):
+        index.materialize({'AAPL': 100})
+
+
+def test_parser_errors(tmp_path):
+    with pytest.raises(FileExistsError):
+        scan_requests(str(tmp_path / "missing.csv"))
+    p = tmp_path / "requests.csv"
+    p.write_text("a,b,c\n1,2,3\n")
+    with pytest.raises(Exception, match="wrong format"):
+        scan_requests(str(p))
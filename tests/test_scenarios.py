@@ -0,0 +1,76 @@
+from sys import path as sys_path
+from os import path as os_path
+sys_path.append(os_path.abspath(os_path.join(os_path.dirname(__file__), '..', 'src')))
+
+import random
+import pytest
+from locates_task import csv_parser, distribute_locates
+from locates_scenarios import ScenarioBook, portion_scenarios, capped_scenario
+
+HEADER = "client_name, symbol, number_of_locates_requested, round_lot_size\n"
+
+
+@pytest.fixture
+def requests_csv(tmp_path):
+    p = tmp_path / "requests.csv"
+    p.write_text(HEADER + "Alice, AAPL, 500, 100\nBob, AAPL, 300, 100\nBob, MSFT, 200, 100\n"
+                 "Carl, MSFT, 400, 100\nDana, TSLA, 1500, 100\n")
+    return p
+
+
+def test_scenario_helpers():
+    aggregate_symbols = {'AAPL': 800, 'TSLA': 1500}
+    assert portion_scenarios(aggregate_symbols, [0.5, 0.75]) == {'50%': {'AAPL': 400, 'TSLA': 750},
+                                                                 '75%': {'AAPL': 600, 'TSLA': 1125}}
+    assert capped_scenario(aggregate_symbols, 1000) == {'AAPL': 800, 'TSLA': 1000}
+
+
+def test_same_as_distribute_locates(tmp_path):
+    rng = random.Random(4)
+    for _ in range(30):
+        # duplicates included - the aggregate counts them, the percentages don't add up to 1
+        rows = [f"C{rng.randint(0, 20)}, S{rng.randint(0, 6)}, {100 * rng.randint(1, 20)}, 100\n" for _ in range(60)]
+        p = tmp_path / "requests.csv"
+        p.write_text(HEADER + ''.join(rows))
+        parsed = csv_parser(str(p))
+        book = ScenarioBook(*parsed)
+        scenarios = {f"scenario{k}": {symbol: rng.choice([0, total, total + 100, rng.randint(0, total), 1000])
+                                      for symbol, total in parsed[1].items() if rng.random() < 0.8}
+                     for k in range(6)}
+        results = book.evaluate(scenarios)
+        assert list(results) == list(scenarios)
+        for name, approved_locates in scenarios.items():
+            expected = distribute_locates(parsed[0], approved_locates, parsed[2], parsed[3])
+            distributed = results[name].to_dict()
+            assert distributed == expected
+            # same order of clients and of every client's symbols
+            assert [list(symbols.items()) for symbols in distributed.values()] == \
+                   [list(symbols.items()) for symbols in expected.values()]
+
+
+def test_same_approvals_share_results(requests_csv):
+    book = ScenarioBook.from_csv(str(requests_csv))
+    results = book.evaluate({'a': {'AAPL': 400, 'MSFT': 300}, 'b': {'AAPL': 400, 'MSFT': 600}})
+    assert results['a'].distributed_by_symbol['AAPL'] is results['b'].distributed_by_symbol['AAPL']
+    assert results['a'].distributed_by_symbol['MSFT'] is not results['b'].distributed_by_symbol['MSFT']
+
+
+def test_statistics(requests_csv):
+    book = ScenarioBook.from_csv(str(requests_csv))
+    scenarios = {'half': {'AAPL': 400, 'MSFT': 300}, 'capped': capped_scenario(book.aggregate_symbols, 1000)}
+    stats = book.statistics(scenarios)
+    assert stats['half'] == {'approved': 700, 'allocated': 700, 'requested': 2900, 'fill_rate': 700 / 2900,
+                             'clients': {'Alice': 0.6, 'Bob': 0.4, 'Carl': 0.5, 'Dana': 0.0}}
+    assert stats['capped']['allocated'] == 800 + 600 + 1000
+    assert stats['capped']['clients'] == {'Alice': 1.0, 'Bob': 1.0, 'Carl': 1.0, 'Dana': 1000 / 1500}
+
+    # the totals only
+    totals = book.statistics(scenarios, per_client=False)
+    assert totals == {name: {key: value for key, value in result.items() if key != 'clients'}
+                      for name, result in stats.items()}
+
+
+def test_unknown_symbol(requests_csv):
+    book = ScenarioBook.from_csv(str(requests_csv))
+    with pytest.raises(ValueError, match='NVDA'):
+        book.evaluate({'a': {'AAPL': 400, 'NVDA': 100}})
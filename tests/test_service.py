@@ -0,0 +1,148 @@
+from sys import path as sys_path
+from os import path as os_path
+sys_path.append(os_path.abspath(os_path.join(os_path.dirname(__file__), '..', 'src')))
+
+import http.client
+import json
+import socket
+import threading
+import pytest
+from locates_task import csv_parser, distribute_locates
+from locates_allocator import LocatesAllocator
+from locates_service import LocatesService, LocatesHTTPServer, LocatesUnixServer
+
+HEADER = "client_name, symbol, number_of_locates_requested, round_lot_size\n"
+REQUESTS = HEADER + (
+    "Alice, AAPL, 500, 100\n"
+    "Bob, AAPL, 300, 100\n"
+    "Bob, MSFT, 200, 100\n"
+    "Carl, MSFT, 400, 100\n"
+)
+
+
+@pytest.fixture
+def requests_csv(tmp_path):
+    p = tmp_path / "requests.csv"
+    p.write_text(REQUESTS)
+    return p
+
+
+class UnixConnection(http.client.HTTPConnection):
+    """HTTP over a Unix socket."""
+
+    def __init__(self, socket_path):
+        super().__init__('localhost')
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.socket_path)
+
+
+def call(connection, method, path, body=None):
+    connection.request(method, path, body=None if body is None else json.dumps(body),
+                       headers={'Content-Type': 'application/json'})
+    response = connection.getresponse()
+    return response.status, json.loads(response.read())
+
+
+@pytest.fixture
+def server(requests_csv):
+    server = LocatesHTTPServer(LocatesService.from_csv(str(requests_csv)))
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_allocator_add_and_cancel(requests_csv):
+    clients_requests, aggregate_symbols, req_by_symbol_clients_percentage, chunk_pr_symbol = csv_parser(str(requests_csv))
+    allocator = LocatesAllocator(clients_requests, req_by_symbol_clients_percentage, chunk_pr_symbol, aggregate_symbols)
+    allocator.update('AAPL', 600)
+    allocator.changes()
+
+    changed = allocator.add_request('Dana', 'AAPL', 400)
+    assert aggregate_symbols['AAPL'] == 1200
+    assert set(changed) <= {('Alice', 'AAPL'), ('Bob', 'AAPL'), ('Dana', 'AAPL')} and ('Dana', 'AAPL') in changed
+    assert allocator.add_request('Dana', 'TSLA', 100, 100) == {}
+    assert allocator.cancel_request('Bob', 'AAPL')[('Bob', 'AAPL')] == 0
+    assert allocator.cancel_request('Dana', 'TSLA') == {}
+    assert 'TSLA' not in aggregate_symbols
+
+    # same as distributing the changed book from scratch
+    expected = {'Alice': 500, 'Dana': 400}
+    assert {client: requests['AAPL'] for client, requests in clients_requests.items() if 'AAPL' in requests} == expected
+    assert req_by_symbol_clients_percentage['AAPL'] == {'Alice': 500 / 900, 'Dana': 400 / 900}
+    assert allocator.allocations == distribute_locates(clients_requests, {'AAPL': 600}, req_by_symbol_clients_percentage,
+                                                       chunk_pr_symbol)
+    with pytest.raises(ValueError):
+        allocator.add_request('Eve', 'AAPL', 150)
+    with pytest.raises(KeyError):
+        allocator.cancel_request('Eve', 'AAPL')
+
+
+def test_http_round(server, requests_csv):
+    connection = http.client.HTTPConnection(*server.server_address)
+    assert call(connection, 'GET', '/health') == (200, {'clients': 3, 'symbols': 2, 'approved': 0})
+
+    status, body = call(connection, 'POST', '/approvals', {'AAPL': 600, 'MSFT': 600, 'NOPE': 100})
+    assert status == 200
+    parsed = csv_parser(str(requests_csv))
+    expected = distribute_locates(parsed[0], {'AAPL': 600, 'MSFT': 600}, parsed[2], parsed[3])
+    assert body['allocations'] == {'AAPL': {'Alice': expected['Alice']['AAPL'], 'Bob': expected['Bob']['AAPL']},
+                                   'MSFT': {'Bob': expected['Bob']['MSFT'], 'Carl': expected['Carl']['MSFT']}}
+    assert body['skipped'] == ['NOPE']
+    assert len(body['changed']) == 4
+    assert call(connection, 'GET', '/allocations') == (200, expected)
+    assert call(connection, 'GET', '/allocations?client=Bob') == (200, expected['Bob'])
+    assert call(connection, 'GET', '/changes')[1] == body['changed']
+    assert call(connection, 'GET', '/changes') == (200, [])
+
+    status, body = call(connection, 'POST', '/requests', {'client_name': 'Dana', 'symbol': 'MSFT',
+                                                          'number_of_locates_requested': 600})
+    assert status == 200 and {'client_name': 'Dana', 'symbol': 'MSFT', 'number_of_locates_allocated': 300} in body['changed']
+    status, body = call(connection, 'POST', '/requests/cancel', {'client_name': 'Alice', 'symbol': 'AAPL'})
+    assert status == 200
+    assert {'client_name': 'Alice', 'symbol': 'AAPL', 'number_of_locates_allocated': 0} in body['changed']
+    assert call(connection, 'GET', '/allocations?symbol=AAPL') == (200, {'Bob': 300})
+
+
+@pytest.mark.parametrize("method, path, body, status", [
+    ('POST', '/approvals', ['AAPL'], 400),
+    ('POST', '/approvals', {'AAPL': -1}, 400),
+    ('POST', '/requests', {'client_name': 'Eve', 'symbol': 'AAPL', 'number_of_locates_requested': 150}, 400),
+    ('POST', '/requests', {'client_name': 'Eve', 'symbol': 'NEW', 'number_of_locates_requested': 100}, 400),
+    ('POST', '/requests/cancel', {'client_name': 'Eve', 'symbol': 'AAPL'}, 404),
+    ('GET', '/allocations?client=Eve', None, 404),
+    ('GET', '/nope', None, 404),
+])
+def test_http_errors(server, method, path, body, status):
+    connection = http.client.HTTPConnection(*server.server_address)
+    result = call(connection, method, path, body)
+    assert result[0] == status and 'error' in result[1]
+
+
+@pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason="no Unix sockets")
+def test_unix_socket(requests_csv, tmp_path):
+    socket_path = str(tmp_path / "locates.sock")
+    server = LocatesUnixServer(LocatesService.from_csv(str(requests_csv)), socket_path)
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    try:
+        connection = UnixConnection(socket_path)
+        assert call(connection, 'POST', '/approvals', {'MSFT': 600})[0] == 200
+        assert call(connection, 'GET', '/allocations?symbol=MSFT')[1] == {'Bob': 200, 'Carl': 400}
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert not os_path.exists(socket_path)
+
+
+@pytest.mark.parametrize("length, status", [('abc', 400), ('-1', 400), (str(1 << 30), 413)])
+def test_bad_content_length(server, length, status):
+    connection = http.client.HTTPConnection(*server.server_address)
+    connection.putrequest('POST', '/approvals')
+    connection.putheader('Content-Length', length)
+    connection.endheaders()
+    response = connection.getresponse()
+    assert response.status == status and 'error' in json.loads(response.read())
@@ -0,0 +1,92 @@
+from sys import path as sys_path
+from os import path as os_path
+sys_path.append(os_path.abspath(os_path.join(os_path.dirname(__file__), '..', 'src')))
+
+import pytest
+from locates_task import validate_rows, validate_fields, header_positions, csv_parser, csv_parser_streaming
+from locates_metrics import Metrics
+
+HEADER = "client_name, symbol, number_of_locates_requested, round_lot_size\n"
+POSITIONS = (0, 1, 2, 3)
+
+
+@pytest.mark.parametrize("fieldnames, expected", [
+    (['client_name', 'symbol', 'number_of_locates_requested', 'round_lot_size'], (0, 1, 2, 3)),
+    (['round_lot_size', 'symbol', 'client_name', 'number_of_locates_requested'], (2, 1, 3, 0)),
+    (['client_name', 'symbol', 'symbol', 'round_lot_size'], None), # missing column
+])
+def test_header_positions(fieldnames, expected):
+    assert header_positions(fieldnames) == expected
+
+
+def test_clean_block():
+    rows = [['A', 'AAPL', '200', '100'], ['B', 'MSFT', ' 300', '100', 'extra']]
+    rejected = []
+    assert list(validate_rows(rows, POSITIONS, rejected=rejected)) == [('A', 'AAPL', 200, 100), ('B', 'MSFT', 300, 100)]
+    assert rejected == []
+
+
+def test_block_with_invalid_rows():
+    rows = [
+        ['A', 'AAPL', '200', '100'],
+        ['B', 'AAPL', '250', '100'],
+        ['C', ' '],
+        ['D', 'AAPL', '100', '0'],
+        ['E', 'MSFT', '100', '100'],
+        ['\t', 'MSFT', '100', '100'],
+    ]
+    rejected = []
+    metrics = Metrics()
+    valid = list(validate_rows(rows, POSITIONS, first_row=11, rejected=rejected, metrics=metrics))
+    assert valid == [('A', 'AAPL', 200, 100), ('E', 'MSFT', 100, 100)]
+    assert [(row_number, reason) for row_number, reason, _ in rejected] == [
+        (12, 'non_multiple_quantity'), (13, 'missing_field'), (14, 'non_positive_lot'), (16, 'empty_field')]
+    assert rejected[1][2] == ['C', ' ']
+    assert sum(metrics.rejected.values()) == 4
+
+
+def test_missing_column_rejects_every_row():
+    rejected = []
+    assert list(validate_rows([['A', 'AAPL', '100', '100']], None, rejected=rejected)) == []
+    assert rejected == [(1, 'missing_field', ['A', 'AAPL', '100', '100'])]
+
+
+@pytest.mark.parametrize("fields, expected", [
+    # the fields are as csv.reader gives them - a space left in a field is part of it
+    (['A', ' AAPL', '200', '100'], (('A', ' AAPL', 200, 100), None)),
+    (['A', 'AAPL', 'x', '100'], (None, 'non_integer_quantity')),
+    (['A', 'AAPL', '100', 'x'], (None, 'non_integer_lot')),
+    (['A', 'AAPL', '-100', '100'], (None, 'non_positive_quantity')),
+])
+def test_validate_fields(fields, expected):
+    assert validate_fields(fields, POSITIONS) == expected
+
+
+@pytest.mark.parametrize("parser", [csv_parser, csv_parser_streaming])
+def test_parsers_report_rejected_rows(tmp_path, parser):
+    p = tmp_path / "requests.csv"
+    p.write_text(HEADER + "A, AAPL, 200, 100\n\nB, AAPL, 150, 100\nC, MSFT, 100, 100\nD, MSFT, abc, 100\n")
+    rejected = []
+    clients_requests, _, _, _ = parser(str(p), rejected=rejected)
+    assert clients_requests == {'A': {'AAPL': 200}, 'C': {'MSFT': 100}}
+    # blank lines are not rows
+    assert [(row_number, reason, [field.strip() for field in fields]) for row_number, reason, fields in rejected] == [
+        (2, 'non_multiple_quantity', ['B', 'AAPL', '150', '100']),
+        (4, 'non_integer_quantity', ['D', 'MSFT', 'abc', '100'])]
+
+
+@pytest.mark.parametrize("parser", [csv_parser, csv_parser_streaming])
+def test_parsers_skip_initial_spaces_only(tmp_path, parser):
+    p = tmp_path / "requests.csv"
+    # a quoted field keeps its spaces, like skipinitialspace in csv.reader
+    p.write_text(HEADER + 'A,  AAPL, 200, 100\nB, " J", 100, 100\n')
+    clients_requests, _, _, _ = parser(str(p))
+    assert clients_requests == {'A': {'AAPL': 200}, 'B': {' J': 100}}
+
+
+@pytest.mark.parametrize("parser", [csv_parser, csv_parser_streaming])
+def test_blank_line_before_header(tmp_path, parser):
+    p = tmp_path / "requests.csv"
+    p.write_text("\n" + HEADER + "A, AAPL, 200, 100\n")
+    with pytest.raises(Exception, match="wrong format"):
+        parser(str(p))
@@ -0,0 +1,143 @@
+from sys import path as sys_path
+from os import path as os_path
+sys_path.append(os_path.abspath(os_path.join(os_path.dirname(__file__), '..', 'src')))
+
+import random
+import pytest
+from locates_task import csv_parser, distribute_locates
+from locates_watch import WatchedBook, complete_rows_end
+
+HEADER = "client_name, symbol, number_of_locates_requested, round_lot_size\n"
+
+
+def append(p, text):
+    with open(p, 'a', newline='') as f:
+        f.write(text)
+
+
+class CountingMetrics:
+    """Metrics stand-in that keeps the distributed symbols."""
+
+    def __init__(self):
+        self.symbols = []
+
+    def add_stage(self, name, seconds, rows):
+        pass
+
+    def add_symbol(self, symbol, seconds, rows):
+        self.symbols.append(symbol)
+
+    def add_rounding(self, iterations):
+        pass
+
+    def reject(self, reason):
+        pass
+
+
+def test_same_as_csv_parser_while_growing(tmp_path):
+    rng = random.Random(5)
+    p = tmp_path / "requests.csv"
+    p.write_text(HEADER)
+    book = WatchedBook(str(p))
+    approved = {f"S{i}": 100 * rng.randint(0, 30) for i in range(12)}
+    for _ in range(8):
+        append(p, ''.join(f"C{rng.randint(0, 20)}, S{rng.randint(0, 11)}, {100 * rng.randint(1, 9)}, 100\n"
+                          for _ in range(rng.randint(0, 40))) + "C1, S1, -100, 100\n")
+        book.refresh()
+        parsed = csv_parser(str(p))
+        assert (book.clients_requests, book.aggregate_symbols, book.req_by_symbol_clients_percentage,
+                book.chunk_pr_symbol) == parsed
+        known = {symbol: total for symbol, total in approved.items() if symbol in parsed[1]}
+        assert book.distribute(approved) == distribute_locates(parsed[0], known, parsed[2], parsed[3])
+        # every client has its entry, in the clients order - added as they showed up
+        assert list(book.distributed_locates) == list(parsed[0]) and book.new_clients == []
+
+
+def test_only_dirty_symbols_are_distributed(tmp_path):
+    p = tmp_path / "requests.csv"
+    p.write_text(HEADER + "Alice, AAPL, 500, 100\nBob, AAPL, 300, 100\nBob, MSFT, 200, 100\n")
+    metrics = CountingMetrics()
+    book = WatchedBook(str(p), metrics=metrics)
+    assert book.refresh() == {'AAPL', 'MSFT'}
+    book.distribute({'AAPL': 400, 'MSFT': 100, 'TSLA': 100})
+    assert sorted(metrics.symbols) == ['AAPL', 'MSFT']
+    book.changes()
+
+    # half a row - not read yet
+    append(p, "Carl, MSFT, 400, 100\nDana, TS")
+    assert book.refresh() == {'MSFT'}
+    metrics.symbols.clear()
+    book.distribute({'AAPL': 400, 'MSFT': 100, 'TSLA': 100})
+    assert metrics.symbols == ['MSFT']
+    assert book.changes() == {('Carl', 'MSFT'): 100, ('Bob', 'MSFT'): 0}
+
+    # the approved symbol nobody asked for gets its rows
+    append(p, "LA, 200, 100\n")
+    assert book.refresh() == {'TSLA'}
+    metrics.symbols.clear()
+    book.distribute({'AAPL': 400, 'MSFT': 100, 'TSLA': 100})
+    assert metrics.symbols == ['TSLA']
+    assert book.changes() == {('Dana', 'TSLA'): 100}
+    # nothing new
+    assert book.refresh() == set()
+    metrics.symbols.clear()
+    book.distribute({'AAPL': 400, 'MSFT': 100, 'TSLA': 100})
+    assert metrics.symbols == [] and book.changes() == {}
+
+
+def test_rewritten_file_is_read_again(tmp_path):
+    p = tmp_path / "requests.csv"
+    p.write_text(HEADER + "Alice, AAPL, 500, 100\nBob, MSFT, 200, 100\n")
+    book = WatchedBook(str(p))
+    book.refresh()
+    book.distribute({'AAPL': 500, 'MSFT': 200})
+    book.changes()
+
+    p.write_text(HEADER + "Carl, AAPL, 300, 100\n")
+    book.refresh()
+    assert book.clients_requests == {'Carl': {'AAPL': 300}}
+    assert book.distribute({'AAPL': 500, 'MSFT': 200}) == {'Carl': {'AAPL': 300}}
+    assert book.changes() == {('Alice', 'AAPL'): 0, ('Bob', 'MSFT'): 0, ('Carl', 'AAPL'): 300}
+
+
+def test_rejected_rows_are_numbered_from_the_file_start(tmp_path):
+    p = tmp_path / "requests.csv"
+    p.write_text(HEADER + "Alice, AAPL, 500, 100\n")
+    book = WatchedBook(str(p))
+    rejected = []
+    book.refresh(rejected)
+    append(p, "Bob, AAPL, 150, 100\n")
+    book.refresh(rejected)
+    assert rejected == [(2, 'non_multiple_quantity', ['Bob', 'AAPL', '150', '100'])]
+
+
+def test_rows_after_a_literal_quote(tmp_path):
+    p = tmp_path / "requests.csv"
+    p.write_text(HEADER + 'O"Brien, AAPL, 100, 100\n')
+    book = WatchedBook(str(p))
+    book.refresh()
+    append(p, "Bob, AAPL, 200, 100\n")
+    assert book.refresh() == {'AAPL'}
+    assert book.clients_requests == csv_parser(str(p))[0] == {'O"Brien': {'AAPL': 100}, 'Bob': {'AAPL': 200}}
+    assert book.offset == os_path.getsize(p)
+
+
+@pytest.mark.parametrize("data, end", [
+    (b"", 0),
+    (b"a,b,1,1", 0),
+    (b"a,b,1,1\nc,d", 8),
+    (b"a,b,1,1\n\"c\nd\",e,1,1\n", 20),
+    (b"a,b,1,1\n\"c\nd", 8),
+    # a quote in the middle of a field doesn't open a quoted field
+    (b"O\"Brien,b,1,1\nc,d,1,1\n", 22),
+    (b"O\"Brien,b,1,1\n\"c\nd", 14),
+    (b"a,\"b\"\"\nc\",1,1\nd", 14),
+])
+def test_complete_rows_end(data, end):
+    assert complete_rows_end(data) == end
+
+
+def test_missing_file(tmp_path):
+    book = WatchedBook(str(tmp_path / "later.csv"))
+    assert book.refresh() == set()
+    assert book.distribute({'AAPL': 100}) == {}